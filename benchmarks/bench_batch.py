@@ -0,0 +1,117 @@
+"""
+bench_batch.py
+
+Per-operation cost of sending room operations one message at a time vs
+in one BATCH. A player in a room of four repeatedly (a) releases a group
+and locks the next one, and (b) moves the eight groups it holds. The
+server's message handling runs in-process with connections that count the
+frames queued for them (each frame is one send on the writer thread).
+
+    python benchmarks/bench_batch.py [--rounds 5000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from server import Server
+from protocol import *
+
+PLAYERS = 4
+HELD_GROUPS = 8
+
+class CountingConnection:
+    def __init__(self, address):
+        self.address = address
+        self.frames = 0
+        self.udp_address = None
+
+    def send(self, data):
+        self.frames += 1
+
+    def send_datagram(self, udp_socket, body):
+        return False
+
+def release_and_lock(round_index):
+    """Release the group held last round and lock the next one."""
+    held = f'piece_{round_index % 40}'
+    following = f'piece_{(round_index + 1) % 40}'
+    return [
+        {'type': MSG_RELEASE_GROUP, 'payload': {'object_id': held, 'position': {'x': 10 * round_index % 700, 'y': 5}}},
+        {'type': MSG_LOCK_GROUP, 'payload': {'object_id': following}}
+    ]
+
+def move_held(round_index):
+    """Move every held group a little."""
+    return [{'type': MSG_MOVE_GROUP, 'payload': {'object_id': f'piece_{40 + i}',
+                                                 'position': {'x': round_index % 500, 'y': 60 * i}}}
+            for i in range(HELD_GROUPS)]
+
+SCENARIOS = [('release + lock next', release_and_lock), (f'move {HELD_GROUPS} held groups', move_held)]
+
+def setup(server):
+    connections = []
+    for i in range(PLAYERS):
+        connection = CountingConnection(('10.0.0.1', 100 + i))
+        server.clients[connection.address] = connection
+        connections.append(connection)
+    server.process_message({'type': MSG_HOST_GAME, 'payload': {
+        'game_name': 'bench', 'max_players': PLAYERS, 'image_url': '', 'difficulty': 'hard'}}, connections[0])
+    game_id = server.client_rooms[connections[0].address]
+    for connection in connections[1:]:
+        server.process_message({'type': MSG_JOIN_GAME, 'payload': {'game_id': game_id}}, connection)
+
+    # The player holds piece_0 (released and re-locked in turn) and 8 groups it moves
+    for object_id in ['piece_0'] + [f'piece_{40 + i}' for i in range(HELD_GROUPS)]:
+        server.process_message({'type': MSG_LOCK_GROUP, 'payload': {'object_id': object_id}}, connections[0])
+    return connections
+
+def run(server, connections, make_operations, rounds):
+    """
+    Alternate rounds sent one message at a time and as a BATCH (so both see
+    the same room and machine state). Returns {batched: (server microseconds
+    per operation, frames queued per operation, client sends per operation)}.
+    """
+    sender = connections[0]
+    totals = {False: [0.0, 0, 0, 0], True: [0.0, 0, 0, 0]}    # seconds, frames, sends, operations
+    for round_index in range(rounds * 2):
+        batched = round_index % 2 == 1
+        batch = make_operations(round_index)
+        messages = [{'type': MSG_BATCH, 'payload': {'operations': batch}}] if batched else batch
+        frames_before = sum(connection.frames for connection in connections)
+        start = time.perf_counter()
+        for message in messages:
+            server.process_message(message, sender)
+        total = totals[batched]
+        total[0] += time.perf_counter() - start
+        total[1] += sum(connection.frames for connection in connections) - frames_before
+        total[2] += len(messages)
+        total[3] += len(batch)
+    return {batched: (seconds / operations * 1e6, frames / operations, sends / operations)
+            for batched, (seconds, frames, sends, operations) in totals.items()}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rounds', type=int, default=5000)
+    args = parser.parse_args()
+
+    # The server logs every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    print(f"{PLAYERS} players, {args.rounds} rounds of each kind per scenario", file=output)
+    print(f"{'scenario':>22} | {'sent as':>8} | {'server per op':>13} | {'frames per op':>13} | {'client sends per op':>19}",
+          file=output)
+    for name, make_operations in SCENARIOS:
+        server = Server(host='127.0.0.1', port=0)
+        results = run(server, setup(server), make_operations, args.rounds)
+        server.server_socket.close()
+        server.udp_socket.close()
+        for batched, (per_op, frames, sends) in results.items():
+            print(f"{name:>22} | {'BATCH' if batched else 'singles':>8} | {per_op:>10.1f} us | {frames:>13.2f} | "
+                  f"{sends:>19.2f}", file=output)
+
+if __name__ == '__main__':
+    main()
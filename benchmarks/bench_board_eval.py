@@ -0,0 +1,102 @@
+"""
+bench_board_eval.py
+
+Cost of evaluating the board (correct count, misplaced pieces, distance of
+every piece to its target) at 1k and 10k pieces: the old per-piece loop
+(parse the piece id, compute its target, one distance at a time) against
+BoardEvaluator with NumPy and with its pure-Python fallback. Each round
+moves one piece, then evaluates; 'cached' is a frame where nothing moved.
+
+    python benchmarks/bench_board_eval.py [--sizes 1000,10000] [--rounds 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+import board_eval
+from board_eval import BoardEvaluator
+from constants import SNAP_TOLERANCE
+
+PIECE_SIZE = 40
+
+def make_board(count, rng):
+    """Targets on a square-ish grid, about half the pieces in place."""
+    cols = int(count ** 0.5)
+    targets = [((i % cols) * PIECE_SIZE, (i // cols) * PIECE_SIZE) for i in range(count)]
+    positions = [target if rng.random() < 0.5 else (rng.uniform(0, 4000), rng.uniform(0, 4000))
+                 for target in targets]
+    return cols, targets, positions
+
+def loop_evaluate(positions, cols):
+    """The per-piece evaluation ClientEngine did before BoardEvaluator."""
+    def correct_position(piece_id):
+        row, col = divmod(int(piece_id.rsplit('_', 1)[1]), cols)
+        return (col * PIECE_SIZE, row * PIECE_SIZE)
+
+    def distance(pos_a, pos_b):
+        return ((pos_a[0] - pos_b[0]) ** 2 + (pos_a[1] - pos_b[1]) ** 2) ** 0.5
+
+    distances = {piece_id: distance(position, correct_position(piece_id)) for piece_id, position in positions.items()}
+    misplaced = {piece_id for piece_id, d in distances.items() if d > SNAP_TOLERANCE}
+    return len(positions) - len(misplaced), misplaced, distances
+
+def time_loop(count, rounds, seed):
+    rng = random.Random(seed)
+    cols, targets, positions = make_board(count, rng)
+    positions = {f'piece_{i}': position for i, position in enumerate(positions)}
+    elapsed = 0.0
+    for _ in range(rounds):
+        index = rng.randrange(count)
+        positions[f'piece_{index}'] = (rng.uniform(0, 4000), rng.uniform(0, 4000))
+        start = time.perf_counter()
+        correct, _, _ = loop_evaluate(positions, cols)
+        elapsed += time.perf_counter() - start
+    return elapsed / rounds, None, correct
+
+def time_evaluator(count, rounds, seed, use_numpy):
+    rng = random.Random(seed)
+    cols, targets, positions = make_board(count, rng)
+    evaluator = BoardEvaluator(targets, SNAP_TOLERANCE, use_numpy=use_numpy)
+    evaluator.set_positions(positions)
+    elapsed = 0.0
+    cached = 0.0
+    for _ in range(rounds):
+        evaluator.set_position(rng.randrange(count), rng.uniform(0, 4000), rng.uniform(0, 4000))
+        start = time.perf_counter()
+        correct = evaluator.get_correct_count()
+        evaluator.get_misplaced()
+        evaluator.get_distances()
+        middle = time.perf_counter()
+        evaluator.get_correct_count()
+        cached += time.perf_counter() - middle
+        elapsed += middle - start
+    return elapsed / rounds, cached / rounds, correct
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help='Piece counts, comma separated')
+    parser.add_argument('--rounds', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    variants = [('per-piece loop', lambda count: time_loop(count, args.rounds, args.seed)),
+                ('evaluator, Python', lambda count: time_evaluator(count, args.rounds, args.seed, False))]
+    if board_eval.np is not None:
+        variants.append(('evaluator, NumPy', lambda count: time_evaluator(count, args.rounds, args.seed, True)))
+    else:
+        print("NumPy not installed: only the pure-Python evaluator is measured")
+
+    print(f"{'pieces':>7} {'variant':<18} {'evaluate':>11} {'cached':>9} {'correct':>8}")
+    for count in [int(size) for size in args.sizes.split(',')]:
+        for name, measure in variants:
+            evaluate, cached, correct = measure(count)
+            cached = f'{cached * 1e6:.2f} us' if cached is not None else '-'
+            print(f"{count:>7} {name:<18} {evaluate * 1000:>8.3f} ms {cached:>9} {correct:>8}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+"""
+bench_client_engine.py
+
+Per-frame cost of the client's game logic without a window. Headless bots
+(NetworkManager + ClientEngine, no pygame) connect to an in-process server
+and replay scripted drags (press on a piece, drag it over a number of
+frames, release): first the pieces lying on the board area are moved
+aside, then every piece is dragged to where it belongs. Every frame the
+engine syncs with the network manager and sends throttled moves, exactly
+as under GameGUI; only the drawing is missing.
+
+    python benchmarks/bench_client_engine.py [--bots 4] [--drag-frames 30] [--fps 60]
+"""
+
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from server import Server
+from network_manager import NetworkManager
+from engine import ClientEngine
+from constants import DIFFICULTY_SETTINGS, WINDOW_WIDTH, WINDOW_HEIGHT, RATE_LIMITS
+
+# Where on a piece the scripted hand tries to grab it (fractions of its size)
+GRAB_POINTS = [(0.5, 0.5)] + [(fx, fy) for fy in (0.1, 0.5, 0.9) for fx in (0.1, 0.5, 0.9) if (fx, fy) != (0.5, 0.5)]
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise TimeoutError("timed out")
+        time.sleep(0.01)
+
+def grab_point(engine, piece_id):
+    """
+    A point where piece_id's group is on top and free to take, or None.
+    """
+    network_manager = engine.network_manager
+    members = network_manager.get_group_members(piece_id)
+    if any(network_manager.is_piece_locked_by_others(member_id) for member_id in members):
+        return None
+    x, y = engine.piece_positions[piece_id]
+    for fraction_x, fraction_y in GRAB_POINTS:
+        point = (round(x + engine.piece_width * fraction_x), round(y + engine.piece_height * fraction_y))
+        if engine.get_piece_at(point) in members:
+            return point
+    return None
+
+def drag(engine, piece_id, grab, position, drag_frames, rng):
+    """
+    Inputs for dragging piece_id (held at grab) so it ends up at position.
+    """
+    x, y = engine.piece_positions[piece_id]
+    target = (grab[0] + position[0] - x, grab[1] + position[1] - y)
+    yield ('press', grab)
+    for step in range(1, drag_frames + 1):
+        t = step / drag_frames
+        jitter = 0 if step == drag_frames else rng.randint(-3, 3)
+        yield ('drag', (round(grab[0] + (target[0] - grab[0]) * t) + jitter,
+                        round(grab[1] + (target[1] - grab[1]) * t) + jitter))
+    yield ('release', None)
+
+def drag_script(engine, piece_ids, choose_target, drag_frames, rng):
+    """
+    Yield one input per frame: ('press', pos), ('drag', pos), ('release', None)
+    or None (idle). Each turn drags the first of piece_ids that
+    choose_target(piece_id) gives a position for and that can be grabbed,
+    until none is left or nothing could be grabbed for a second.
+    """
+    idle_frames = 0
+    while idle_frames < 60:
+        targets = [(piece_id, choose_target(piece_id)) for piece_id in piece_ids]
+        targets = [(piece_id, position) for piece_id, position in targets if position]
+        if not targets:
+            return
+        for piece_id, position in targets:
+            grab = grab_point(engine, piece_id)
+            if grab:
+                idle_frames = 0
+                yield from drag(engine, piece_id, grab, position, drag_frames, rng)
+                break
+        else:
+            idle_frames += 1
+            yield None
+
+def clear_board_script(engine, piece_ids, drag_frames, rng):
+    """
+    Move the pieces lying on the board area to the free strips left and
+    right of it, so pieces put in place later never bury one.
+    """
+    board_x, board_y, board_width, board_height = engine.board_rect
+
+    def choose_target(piece_id):
+        x, y = engine.piece_positions[piece_id]
+        if engine.is_piece_correctly_placed(piece_id) or not (
+                board_x - engine.piece_width < x < board_x + board_width and
+                board_y - engine.piece_height < y < board_y + board_height):
+            return None
+        if rng.random() < 0.5:
+            x = rng.randint(0, board_x - engine.piece_width)
+        else:
+            x = rng.randint(board_x + board_width, WINDOW_WIDTH - engine.piece_width)
+        return (x, rng.randint(0, WINDOW_HEIGHT - engine.piece_height))
+
+    return drag_script(engine, piece_ids, choose_target, drag_frames, rng)
+
+def solve_script(engine, piece_ids, drag_frames, rng):
+    """
+    Drag every piece that is not in place yet to where it belongs.
+    """
+    def choose_target(piece_id):
+        if engine.is_piece_correctly_placed(piece_id):
+            return None
+        return engine.get_correct_position(piece_id)
+
+    return drag_script(engine, piece_ids, choose_target, drag_frames, rng)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+def run(server, difficulty, bots, drag_frames, fps, seed):
+    """
+    Solve one puzzle with scripted bots. Returns (per-frame seconds, frames, solved).
+    """
+    rng = random.Random(seed)
+    managers = []
+    host = NetworkManager()
+    host.connect('127.0.0.1', server.port)
+    host.host_game('bench', bots, '', difficulty)
+    wait_for(lambda: host.game_id)
+    managers.append(host)
+    for _ in range(bots - 1):
+        manager = NetworkManager()
+        manager.connect('127.0.0.1', server.port)
+        manager.join_game(host.game_id)
+        wait_for(lambda: manager.game_id)
+        managers.append(manager)
+
+    engines = [ClientEngine(manager) for manager in managers]
+    piece_ids = engines[0].piece_order[:]
+
+    # Everyone clears the board area first, then everyone solves
+    frame_times = []
+    frame_interval = 1 / fps if fps else 0
+    next_frame = time.perf_counter()
+    for make_script in (clear_board_script, solve_script):
+        scripts = {i: make_script(engine, piece_ids[i::bots], drag_frames, rng) for i, engine in enumerate(engines)}
+        while scripts and not engines[0].game_won:
+            for i in list(scripts):
+                engine = engines[i]
+                start = time.perf_counter()
+                action = next(scripts[i], 'done')
+                if action == 'done':
+                    del scripts[i]
+                elif action:
+                    kind, position = action
+                    if kind == 'press':
+                        engine.press(position)
+                    elif kind == 'drag':
+                        engine.drag_to(position)
+                    else:
+                        engine.release()
+                engine.update()
+                engine.report_viewport(0, 0, WINDOW_WIDTH, WINDOW_HEIGHT)
+                frame_times.append(time.perf_counter() - start)
+
+            if frame_interval:
+                next_frame += frame_interval
+                time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    # Let the last release (and the server's solved broadcast) arrive
+    try:
+        wait_for(lambda: all(manager.puzzle_completed for manager in managers), timeout=2.0)
+    except TimeoutError:
+        pass
+    solved = all(manager.puzzle_completed for manager in managers)
+    for manager in managers:
+        manager.leave_game()
+        manager.disconnect()
+    return frame_times, len(frame_times) // bots, solved
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--bots', type=int, default=4)
+    parser.add_argument('--drag-frames', type=int, default=30, help="frames per drag")
+    parser.add_argument('--fps', type=float, default=60, help="0 runs frames back to back")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # The server and clients log every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    # Bots running frames back to back lock and release faster than people can
+    server = Server(host='127.0.0.1', port=0, rate_limits={name: (0, 1) for name in RATE_LIMITS})
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+
+    pace = f"{args.fps:.0f} fps" if args.fps else "frames back to back"
+    print(f"{args.bots} headless bots, {args.drag_frames} frames per drag, {pace}", file=output)
+    print(f"{'difficulty':>10} | {'frames':>6} | {'logic per frame p50':>19} {'p99':>8} {'max':>8} | solved",
+          file=output)
+    for difficulty in DIFFICULTY_SETTINGS:
+        frame_times, frames, solved = run(server, difficulty, args.bots, args.drag_frames, args.fps, args.seed)
+        print(f"{difficulty:>10} | {frames:>6} | {percentile(frame_times, 0.5) * 1e6:>16.0f} us "
+              f"{percentile(frame_times, 0.99) * 1e6:>5.0f} us {max(frame_times) * 1e6:>5.0f} us | {solved}",
+              file=output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_compression.py
+
+Bytes saved vs CPU time of frame compression for JOIN_GAME_ACK (the full
+room state) at each difficulty, plus synthetic custom puzzles with many
+more pieces, at several deflate levels with and without the preset
+dictionary. Also shows that hot-path messages stay below the threshold.
+
+    python benchmarks/bench_compression.py
+"""
+
+import os
+import random
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from game_room import GameRoom
+from protocol import *
+from constants import DIFFICULTY_SETTINGS
+
+LEVELS = (1, 6, 9)
+CUSTOM_PIECES = (1000, 5000)
+
+def join_ack(state):
+    return serialize(MSG_JOIN_GAME_ACK, {'success': True, **state, 'message': f"Successfully joined game: {state['game_name']}"})
+
+def room_frames():
+    """
+    Yield (name, JOIN_GAME_ACK frame) for every difficulty and the custom sizes.
+    """
+    players = [('192.168.1.%d' % i, 50000 + i) for i in range(4)]
+    for difficulty in DIFFICULTY_SETTINGS:
+        room = GameRoom('Cat Puzzle', 4, players[0], 'https://example.com/cat.jpg', difficulty)
+        room.players = list(players)
+        yield difficulty, join_ack(room.get_game_room_state())
+
+    rng = random.Random(1)
+    state = GameRoom('Cat Puzzle', 4, players[0], 'https://example.com/cat.jpg', 'hard').get_game_room_state()
+    for pieces in CUSTOM_PIECES:
+        state['piece_positions'] = {f'piece_{i}': {'x': rng.randint(0, 3000), 'y': rng.randint(0, 3000)}
+                                    for i in range(pieces)}
+        state['groups'] = [[f'piece_{i}', f'piece_{i + 1}'] for i in range(0, pieces // 4, 2)]
+        yield f'custom {pieces}', join_ack(state)
+
+def plain_compress(frame, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(frame[FRAME_HEADER.size:]) + compressor.flush()
+
+def timed(function, *args):
+    """
+    Return (result, seconds per call) averaged over enough calls for ~50 ms.
+    """
+    result = function(*args)
+    calls = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < 0.05:
+        function(*args)
+        calls += 1
+    return result, (time.perf_counter() - start) / calls
+
+def main():
+    move = serialize(MSG_MOVE_GROUP_BROD, {'object_id': 'piece_12', 'position': {'x': 412, 'y': 377},
+                                           'player': {'ip': '192.168.1.10', 'port': 50512}, 'sent_at': 12345.678})
+    print(f"MOVE_GROUP_BROD: {len(move)} bytes, threshold {COMPRESSION_THRESHOLD} (never compressed)")
+    print()
+    print(f"{'JOIN_GAME_ACK':<14} {'raw':>8} | " +
+          " | ".join(f"{'level ' + str(level):>26}" for level in LEVELS))
+    print(f"{'':<14} {'':>8} | " + " | ".join(f"{'dict':>8} {'no dict':>8} {'cpu':>8}" for _ in LEVELS))
+    for name, frame in room_frames():
+        columns = []
+        for level in LEVELS:
+            compressed, compress_time = timed(compress_frame, frame, level)
+            plain = plain_compress(frame, level)
+            _, decompress_time = timed(decompress_body, compressed[FRAME_HEADER.size:])
+            columns.append(f"{len(compressed):>8} {len(plain) + FRAME_HEADER.size:>8} "
+                           f"{(compress_time + decompress_time) * 1e6:>6.0f}us")
+        print(f"{name:<14} {len(frame):>8} | " + " | ".join(columns))
+    print()
+    print("sizes in bytes incl. the 4-byte header; cpu = compress + decompress per message")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+bench_hud.py
+
+Per-frame cost of drawing the HUD (the seven info labels, the title and
+the win overlay with its two lines) when nothing on it changes: rendering
+every string and building the overlay every frame, as GameGUI did before,
+against the Hud surface cache. Also shows a frame where the correct count
+changes. Runs pygame without a window (SDL dummy video driver).
+
+    python benchmarks/bench_hud.py [--frames 2000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+import pygame
+from hud import Hud
+from constants import WINDOW_WIDTH, WINDOW_HEIGHT, COLOR_WHITE, COLOR_GREY, COLOR_GREEN, COLOR_BLACK
+
+def lines(correct):
+    """(text, font index, color, anchor, position) of every HUD line."""
+    return [("Multiplayer Jigsaw Puzzle", 0, COLOR_WHITE, 'center', (WINDOW_WIDTH // 2, 25)),
+            ("Game: ABC123", 1, COLOR_GREY, 'topleft', (10, 10)),
+            ("Room: Cat Puzzle", 1, COLOR_GREY, 'topleft', (10, 30)),
+            ("Players: 3/4", 1, COLOR_GREY, 'topleft', (10, 50)),
+            ("Host: 127.0.0.1:40000", 1, COLOR_GREY, 'topleft', (10, 70)),
+            (f"Correct: {correct}/48", 1, COLOR_GREY, 'topright', (WINDOW_WIDTH - 10, 10)),
+            (f"Progress: {correct * 100 // 48}%", 1, COLOR_GREY, 'topright', (WINDOW_WIDTH - 10, 30)),
+            ("Difficulty: Hard", 1, COLOR_GREY, 'topright', (WINDOW_WIDTH - 10, 50)),
+            ("PUZZLE COMPLETED!", 0, COLOR_GREEN, 'center', (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)),
+            ("Solved by: 127.0.0.1:40000", 1, COLOR_WHITE, 'center', (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40))]
+
+def draw_uncached(screen, fonts, correct):
+    overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
+    overlay.set_alpha(128)
+    overlay.fill(COLOR_BLACK)
+    screen.blit(overlay, (0, 0))
+    for text, font, color, anchor, position in lines(correct):
+        surface = fonts[font].render(text, True, color)
+        screen.blit(surface, surface.get_rect(**{anchor: position}))
+    return 11
+
+def draw_cached(screen, fonts, correct, hud):
+    renders = hud.renders
+    screen.blit(hud.overlay((WINDOW_WIDTH, WINDOW_HEIGHT), COLOR_BLACK, 128), (0, 0))
+    for slot, (text, font, color, anchor, position) in enumerate(lines(correct)):
+        hud.draw_label(screen, slot, text, fonts[font], color, position, anchor)
+    return hud.renders - renders
+
+def measure(draw, frames, change_every):
+    elapsed = 0.0
+    surfaces = 0
+    for frame in range(frames):
+        correct = frame // change_every if change_every else 0
+        start = time.perf_counter()
+        surfaces += draw(correct)
+        elapsed += time.perf_counter() - start
+    return elapsed / frames, surfaces / frames
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=2000)
+    args = parser.parse_args()
+
+    pygame.init()
+    screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+    fonts = (pygame.font.Font(None, 36), pygame.font.Font(None, 24))
+
+    print(f"{'variant':<10} {'values':<24} {'per frame':>10} {'surfaces/frame':>15}")
+    for values, change_every in (('unchanged', 0), ('count changes 1 in 60', 60), ('count changes per frame', 1)):
+        hud = Hud()
+        for name, draw in (('uncached', lambda correct: draw_uncached(screen, fonts, correct)),
+                           ('Hud', lambda correct: draw_cached(screen, fonts, correct, hud))):
+            per_frame, surfaces = measure(draw, args.frames, change_every)
+            print(f"{name:<10} {values:<24} {per_frame * 1e6:>7.1f} us {surfaces:>15.2f}")
+    pygame.quit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+bench_interest.py
+
+Outbound move traffic in a large room with and without interest
+management. N players each look at their own part of a 5000-piece board
+and drag a piece around inside it; with SET_VIEWPORT reported, a move only
+goes to the players whose viewport (plus the client's margin) it touches.
+Runs the server's message handling in-process with connections that only
+count what is queued for them.
+
+    python benchmarks/bench_interest.py [--players 8] [--rounds 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from server import Server
+from game_room import GameRoom
+from protocol import *
+from constants import WINDOW_WIDTH, WINDOW_HEIGHT, VIEWPORT_MARGIN, MOVE_SEND_INTERVAL
+
+PIECES = 5000
+WORLD = (7500, 3750)     # a 100 x 50 board of 75 px pieces
+STEP = 20               # px per move of the random walk
+ZOOMS = (None, 1.0, 0.5, 0.25)
+
+class CountingConnection:
+    def __init__(self, address):
+        self.address = address
+        self.bytes_sent = 0
+        self.udp_address = None
+
+    def send(self, data):
+        self.bytes_sent += len(data)
+
+    def send_datagram(self, udp_socket, body):
+        return False
+
+def make_room(rng, max_players):
+    positions = {f'piece_{i}': {'x': rng.randint(0, WORLD[0]), 'y': rng.randint(0, WORLD[1])}
+                 for i in range(PIECES)}
+    room = GameRoom('bench', max_players, None, '', 'hard', positions)
+    room.players = []       # like a restored room: the first to join hosts
+    return room
+
+def run(server, players, zoom, rounds, seed):
+    """
+    Return (player bytes per second, microseconds per move, fraction of sends filtered).
+    zoom None means nobody reports a viewport (every move goes to everyone).
+    """
+    rng = random.Random(seed)
+    room = make_room(rng, players)
+    server.game_rooms[room.game_id] = room
+    filtered_before = server.metrics.snapshot().get('moves_filtered', 0)
+
+    # Each player looks at a random part of the board and drags the piece
+    # nearest the middle of its screen around inside it
+    visible_width = WINDOW_WIDTH / (zoom or 1.0)
+    visible_height = WINDOW_HEIGHT / (zoom or 1.0)
+    connections = []
+    drags = []
+    for i in range(players):
+        connection = CountingConnection(('10.0.0.1', 100 + i))
+        server.clients[connection.address] = connection
+        server.process_message({'type': MSG_JOIN_GAME, 'payload': {'game_id': room.game_id}}, connection)
+        left = rng.randint(0, int(WORLD[0] - visible_width))
+        top = rng.randint(0, int(WORLD[1] - visible_height))
+        screen = (left, top, left + visible_width, top + visible_height)
+        if zoom is not None:
+            margin_x, margin_y = VIEWPORT_MARGIN * visible_width, VIEWPORT_MARGIN * visible_height
+            server.process_message({'type': MSG_SET_VIEWPORT, 'payload': {
+                'left': left - margin_x, 'top': top - margin_y,
+                'right': screen[2] + margin_x, 'bottom': screen[3] + margin_y}}, connection)
+
+        center = (left + visible_width / 2, top + visible_height / 2)
+        piece_id = min((piece_id for piece_id, position in room.piece_positions.items()
+                        if piece_id not in room.locked_objects),
+                       key=lambda piece_id: (room.piece_positions[piece_id]['x'] - center[0]) ** 2 +
+                                            (room.piece_positions[piece_id]['y'] - center[1]) ** 2)
+        server.process_message({'type': MSG_LOCK_GROUP, 'payload': {'object_id': piece_id}}, connection)
+        connections.append(connection)
+        drags.append((connection, piece_id, screen))
+
+    for connection in connections:
+        connection.bytes_sent = 0
+    elapsed = 0.0
+    for _ in range(rounds):
+        for connection, piece_id, (left, top, right, bottom) in drags:
+            position = room.piece_positions[piece_id]
+            x = min(max(position['x'] + rng.randint(-STEP, STEP), left), right)
+            y = min(max(position['y'] + rng.randint(-STEP, STEP), top), bottom)
+            message = {'type': MSG_MOVE_GROUP, 'payload': {'object_id': piece_id, 'position': {'x': x, 'y': y}}}
+            start = time.perf_counter()
+            server.process_message(message, connection)
+            elapsed += time.perf_counter() - start
+
+    player_bytes = sum(connection.bytes_sent for connection in connections)
+    filtered = server.metrics.snapshot().get('moves_filtered', 0) - filtered_before
+    for connection in connections:
+        server.process_message({'type': MSG_LEAVE_GAME, 'payload': {}}, connection)
+        del server.clients[connection.address]
+
+    moves = rounds * players
+    seconds = rounds * MOVE_SEND_INTERVAL    # every player sends a move each interval
+    return player_bytes / seconds, elapsed / moves * 1e6, filtered / (moves * (players - 1))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--rounds', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    # The server logs every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+    server = Server(host='127.0.0.1', port=0)
+
+    print(f"{args.players} players each dragging at {1 / MOVE_SEND_INTERVAL:.0f} moves/s, "
+          f"{PIECES} pieces over {WORLD[0]}x{WORLD[1]}", file=output)
+    print(f"{'viewport':>18} | {'to players':>10} | {'per move':>9} | {'filtered':>8}", file=output)
+    for zoom in ZOOMS:
+        rate, per_move, filtered = run(server, args.players, zoom, args.rounds, args.seed)
+        name = 'not reported' if zoom is None else f'zoom {zoom} + margin'
+        print(f"{name:>18} | {rate / 1024:>6.1f} KB/s | {per_move:>6.1f} us | {filtered:>7.0%}", file=output)
+
+if __name__ == '__main__':
+    main()
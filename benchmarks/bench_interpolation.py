@@ -0,0 +1,85 @@
+"""
+bench_interpolation.py
+
+Smoothness of a remote drag as seen by another player, with and without
+client-side interpolation, at several move send rates. A piece moves
+around a circle at constant speed; moves reach the receiver with a fixed
+latency plus random jitter and are drawn at 60 FPS.
+
+"step error" is the RMS difference (px) between how far the piece moves
+on screen in a frame and how far it really moved (0 = perfectly smooth).
+"lag error" is the RMS distance (px) of the interpolated piece from
+where it really was INTERPOLATION_DELAY (plus latency) ago, i.e. how
+much the shown path deviates from the real one.
+
+    python benchmarks/bench_interpolation.py [--latency 0.03] [--jitter 0.02]
+"""
+
+import argparse
+import math
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from interpolation import MotionInterpolator
+from constants import INTERPOLATION_DELAY
+
+FPS = 60
+DURATION = 10.0
+RADIUS = 200
+SPEED = math.pi         # radians per second
+
+def true_position(t):
+    return (RADIUS * math.cos(SPEED * t), RADIUS * math.sin(SPEED * t))
+
+def rms(values):
+    return math.sqrt(sum(v * v for v in values) / max(len(values), 1))
+
+def simulate(rate, latency, jitter, rng):
+    """
+    Return (raw step error, interpolated step error, interpolated lag error).
+    """
+    sends = [i / rate for i in range(int(DURATION * rate))]
+    arrivals = sorted((sent_at + latency + rng.expovariate(1 / jitter), sent_at) for sent_at in sends)
+
+    interpolator = MotionInterpolator()
+    raw = None
+    raw_frames = []
+    interpolated_frames = []
+    expected = []
+    next_arrival = 0
+    for frame in range(int(1.0 * FPS), int(DURATION * FPS)):
+        now = frame / FPS
+        while next_arrival < len(arrivals) and arrivals[next_arrival][0] <= now:
+            received_at, sent_at = arrivals[next_arrival]
+            x, y = true_position(sent_at)
+            interpolator.add_sample('piece', {'x': x, 'y': y}, received_at, sent_at)
+            raw = (x, y)
+            next_arrival += 1
+        raw_frames.append(raw)
+        interpolated_frames.append(interpolator.get_positions(now)['piece'])
+        expected.append(true_position(now - INTERPOLATION_DELAY - latency))
+
+    def step_error(shown):
+        ideal_step = RADIUS * SPEED / FPS
+        return rms([math.dist(a, b) - ideal_step for a, b in zip(shown, shown[1:])])
+
+    lag = [math.dist(position, real) for position, real in zip(interpolated_frames, expected)]
+    return step_error(raw_frames), step_error(interpolated_frames), rms(lag)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.03, help="one-way latency (s)")
+    parser.add_argument('--jitter', type=float, default=0.02, help="mean extra random delay (s)")
+    args = parser.parse_args()
+
+    print(f"latency {args.latency * 1000:.0f} ms + jitter {args.jitter * 1000:.0f} ms, "
+          f"drawn at {FPS} FPS, interpolation delay {INTERPOLATION_DELAY * 1000:.0f} ms")
+    print(f"{'moves/s':>8} | {'raw step':>9} | {'interp step':>11} {'interp lag':>10}")
+    for rate in (60, 30, 20, 10):
+        raw_step, interp_step, interp_lag = simulate(rate, args.latency, args.jitter, random.Random(rate))
+        print(f"{rate:>8} | {raw_step:>9.2f} | {interp_step:>11.2f} {interp_lag:>10.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+bench_lobby.py
+
+LIST_GAMES with N live rooms (default 100,000): index update cost, page
+latency for a few filters, a full cursor walk (checked against a brute
+force scan), and the naive "scan every room state" listing for comparison.
+
+    python benchmarks/bench_lobby.py [--rooms N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from game_room import GameRoom
+from lobby import LobbyIndex
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=100000)
+    args = parser.parse_args()
+
+    random.seed(1)
+    game_rooms = {}
+    lobby = LobbyIndex()
+
+    print(f"Building {args.rooms} rooms...")
+    for i in range(args.rooms):
+        room = GameRoom(f'room {i}', random.choice((2, 4)), ('10.0.0.1', i % 60000),
+                        'http://example.com/x.jpg', random.choice(('easy', 'medium', 'hard')))
+        game_rooms[room.game_id] = room
+
+    # Index updates: host, then a join, then a solve for some rooms
+    start = time.perf_counter()
+    updates = 0
+    for room in game_rooms.values():
+        lobby.update(room)
+        updates += 1
+        if random.random() < 0.5:
+            room.add_player(('10.0.0.2', random.randint(1, 60000)))
+            lobby.update(room)
+            updates += 1
+        if random.random() < 0.1:
+            room.puzzle_solved_flag = True
+            lobby.update(room)
+            updates += 1
+    elapsed = time.perf_counter() - start
+    print(f"index updates:         {updates} in {elapsed * 1000:.0f} ms ({elapsed / updates * 1e6:.2f} us each)")
+
+    # One page with different filters
+    filters = [
+        {},
+        {'not_full': True, 'not_solved': True},
+        {'difficulty': 'hard', 'not_full': True, 'not_solved': True},
+    ]
+    for options in filters:
+        start = time.perf_counter()
+        for _ in range(100):
+            games, _ = lobby.list_games(game_rooms, limit=20, **options)
+        elapsed = (time.perf_counter() - start) / 100
+        print(f"page of {len(games)} {str(options):<60} {elapsed * 1e6:.0f} us")
+
+    # Walk every page of one filter and compare with a brute force scan
+    options = {'difficulty': 'hard', 'not_full': True, 'not_solved': True}
+    start = time.perf_counter()
+    seen = []
+    cursor = 0
+    while cursor is not None:
+        games, cursor = lobby.list_games(game_rooms, cursor=cursor, limit=100, **options)
+        seen.extend(game['game_id'] for game in games)
+    elapsed = time.perf_counter() - start
+    expected = {room.game_id for room in game_rooms.values()
+                if room.difficulty == 'hard' and not room.is_full() and not room.puzzle_solved_flag}
+    assert len(seen) == len(set(seen)) and set(seen) == expected
+    print(f"full cursor walk:      {len(seen)} rooms in {elapsed * 1000:.0f} ms (matches brute force)")
+
+    # The naive alternative: build every room's state and filter
+    start = time.perf_counter()
+    states = [room.get_game_room_state() for room in game_rooms.values()]
+    page = [state for state in states if not state['is_full'] and not state['puzzle_solved']][:20]
+    elapsed = time.perf_counter() - start
+    print(f"naive page of {len(page)} (full state scan): {elapsed * 1000:.0f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+bench_profiler.py
+
+Cost of the runtime profiler (ADMIN_PROFILE) on the move hot path. A
+player drags a group in a room of four while the profiler is off, in
+'timing' mode and in 'sample' mode; the server's message handling runs
+in-process with connections that only count what is queued for them.
+
+    python benchmarks/bench_profiler.py [--moves 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from server import Server
+from protocol import *
+
+PLAYERS = 4
+
+class CountingConnection:
+    def __init__(self, address):
+        self.address = address
+        self.bytes_sent = 0
+        self.udp_address = None
+
+    def send(self, data):
+        self.bytes_sent += len(data)
+
+    def send_datagram(self, udp_socket, body):
+        return False
+
+def run(server, connections, moves):
+    """
+    Return microseconds per MOVE_GROUP, best of three runs.
+    """
+    mover = connections[0]
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(moves):
+            message = {'type': MSG_MOVE_GROUP, 'payload': {'object_id': 'piece_0',
+                                                           'position': {'x': i % 500, 'y': i % 300}}}
+            server.process_message(message, mover)
+        best = min(best, (time.perf_counter() - start) / moves * 1e6)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--moves', type=int, default=20000)
+    args = parser.parse_args()
+
+    # The server logs every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+    server = Server(host='127.0.0.1', port=0, admin_token='bench', profile_dir=tempfile.mkdtemp())
+
+    connections = []
+    for i in range(PLAYERS):
+        connection = CountingConnection(('10.0.0.1', 100 + i))
+        server.clients[connection.address] = connection
+        connections.append(connection)
+    server.process_message({'type': MSG_HOST_GAME, 'payload': {
+        'game_name': 'bench', 'max_players': PLAYERS, 'image_url': '', 'difficulty': 'hard'}}, connections[0])
+    game_id = server.client_rooms[connections[0].address]
+    for connection in connections[1:]:
+        server.process_message({'type': MSG_JOIN_GAME, 'payload': {'game_id': game_id}}, connection)
+    server.process_message({'type': MSG_LOCK_GROUP, 'payload': {'object_id': 'piece_0'}}, connections[0])
+
+    print(f"MOVE_GROUP to {PLAYERS - 1} players, {args.moves} moves, best of 3", file=output)
+    print(f"{'profiler':>10} | {'per move':>9} | {'overhead':>8}", file=output)
+    baseline = run(server, connections, args.moves)
+    print(f"{'off':>10} | {baseline:>6.1f} us | {'':>8}", file=output)
+    for mode in ('timing', 'sample'):
+        server.profiler.start(mode, 600)
+        per_move = run(server, connections, args.moves)
+        server.profiler.stop()
+        print(f"{mode:>10} | {per_move:>6.1f} us | {per_move / baseline - 1:>7.0%}", file=output)
+    after = run(server, connections, args.moves)
+    print(f"{'off again':>10} | {after:>6.1f} us | {after / baseline - 1:>7.0%}", file=output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+bench_rate_limit.py
+
+A modified client floods MOVE_GROUP at --flood moves per second into a
+room where the other players drag normally (20 moves/s each). Compares the
+server with rate limits off and with the default limits: frames the server
+had to send, the other players' move latency, and when the flooder was cut
+off. Runs a real server and clients over loopback TCP.
+
+    python benchmarks/bench_rate_limit.py [--players 4] [--flood 5000] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from server import Server
+from network_manager import NetworkManager
+from protocol import MSG_MOVE_GROUP_BROD
+from constants import MOVE_SEND_INTERVAL, RATE_LIMITS
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise TimeoutError("timed out")
+        time.sleep(0.01)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+def drag(manager, object_id, rate, seconds, stop):
+    """Send moves of object_id at rate per second, in chunks of up to 1 ms worth."""
+    interval = 1 / rate
+    start = time.perf_counter()
+    sent = 0
+    while not stop.is_set() and manager.connected:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        while sent < elapsed / interval:
+            manager.move_group(object_id, {'x': 100 + sent % 400, 'y': 100}, reliable=True)
+            sent += 1
+        time.sleep(min(interval, 0.001))
+
+def run(players, flood, seconds, rate_limits):
+    """
+    Return (server frames sent per second, latencies of honest players' moves
+    in seconds, seconds until the flooder was disconnected or None).
+    """
+    server = Server(host='127.0.0.1', port=0, rate_limits=rate_limits)
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+
+    latencies = []
+    managers = []
+    for i in range(players):
+        manager = NetworkManager()
+        manager.connect('127.0.0.1', server.port, compression=False)
+        if i == 0:
+            manager.host_game('bench', players, '', 'hard')
+        else:
+            manager.join_game(managers[0].game_id)
+        wait_for(lambda: manager.game_id)
+
+        def record(message, handle=manager._handle_received_message, honest=i > 0):
+            payload = message.get('payload', {})
+            # Only moves of honest players (the flooder drags piece_0)
+            if message.get('type') == MSG_MOVE_GROUP_BROD and payload.get('object_id') != 'piece_0':
+                latencies.append(time.perf_counter() - payload['sent_at'])
+            handle(message)
+        manager._handle_received_message = record
+        manager.lock_group(f'piece_{i}')
+        managers.append(manager)
+    time.sleep(0.5)
+    latencies.clear()
+
+    flooder = managers[0]
+    stop = threading.Event()
+    before = server.metrics.snapshot()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=drag, args=(flooder, 'piece_0', flood, seconds, stop))]
+    threads += [threading.Thread(target=drag, args=(manager, f'piece_{i}', 1 / MOVE_SEND_INTERVAL, seconds, stop))
+                for i, manager in enumerate(managers) if i > 0]
+    for thread in threads:
+        thread.start()
+
+    cut_off = None
+    while any(thread.is_alive() for thread in threads):
+        if cut_off is None and not flooder.connected:
+            cut_off = time.perf_counter() - start
+        time.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    time.sleep(0.5)
+    after = server.metrics.snapshot()
+
+    for manager in managers:
+        manager.disconnect()
+    server.is_running = False
+    server.server_socket.close()
+
+    frames = after.get('frames_sent', 0) - before.get('frames_sent', 0)
+    counters = {name: after.get(name, 0) - before.get(name, 0)
+                for name in ('rate_limited_moves', 'rate_limited_messages', 'rate_limit_disconnects')}
+    return frames / elapsed, latencies, cut_off, counters
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=4)
+    parser.add_argument('--flood', type=float, default=5000, help="flooder's moves per second")
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    # The server and clients log every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    print(f"1 flooder at {args.flood:.0f} moves/s, {args.players - 1} players at {1 / MOVE_SEND_INTERVAL:.0f} moves/s, "
+          f"{args.seconds:.0f} s", file=output)
+    print(f"{'limits':>8} | {'server frames/s':>15} | {'honest move latency p50':>23} {'p99':>8} | "
+          f"{'flooder cut off':>15} | counters", file=output)
+    for name, limits in (('off', {name: (0, 1) for name in RATE_LIMITS}), ('default', None)):
+        frames_per_second, latencies, cut_off, counters = run(args.players, args.flood, args.seconds, limits)
+        cut = f"after {cut_off:.2f} s" if cut_off is not None else 'no'
+        print(f"{name:>8} | {frames_per_second:>15.0f} | {percentile(latencies, 0.5) * 1000:>20.2f} ms "
+              f"{percentile(latencies, 0.99) * 1000:>5.2f} ms | {cut:>15} | {counters}", file=output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+bench_recovery.py
+
+Measures server startup recovery time for N rooms (default 10,000):
+  1. journal only (no snapshot yet)
+  2. snapshot + a journal tail of 10% more releases
+
+    python benchmarks/bench_recovery.py [--rooms N] [--difficulty hard]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from game_room import GameRoom
+from journal import RoomJournal
+
+RELEASES_PER_ROOM = 5
+
+def play_rooms(journal, rooms, releases_per_room):
+    """
+    Log joins and releases for every room, the way the server would.
+    """
+    for room in rooms:
+        guest = ('10.0.0.2', random.randint(1024, 65535))
+        room.add_player(guest)
+        journal.log_join(room.game_id, guest)
+        for _ in range(releases_per_room):
+            piece_id = random.choice(list(room.piece_positions))
+            room.lock_group(piece_id, guest)
+            position = {'x': random.randint(0, 700), 'y': random.randint(0, 700)}
+            _, info = room.release_group(piece_id, guest, position)
+            journal.log_release(room, piece_id, info['merged'])
+
+def timed_recover(data_dir):
+    start = time.perf_counter()
+    journal = RoomJournal(data_dir, snapshot_every=10 ** 9)
+    restored = 0
+    for state in journal.recover():
+        GameRoom.from_state(state)
+        restored += 1
+    elapsed = time.perf_counter() - start
+    return journal, restored, elapsed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=10000)
+    parser.add_argument('--difficulty', default='hard')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='jigsaw-journal-')
+    try:
+        # Build the journal
+        journal = RoomJournal(data_dir, snapshot_every=10 ** 9)
+        journal.recover()
+        rooms = []
+        for i in range(args.rooms):
+            room = GameRoom(f'room {i}', 4, ('10.0.0.1', 1000 + i % 60000), 'http://example.com/x.jpg', args.difficulty)
+            rooms.append(room)
+            journal.log_host(room)
+        play_rooms(journal, rooms, RELEASES_PER_ROOM)
+        journal.close()
+
+        journal_size = os.path.getsize(os.path.join(data_dir, 'rooms.journal'))
+        print(f"{args.rooms} rooms, {RELEASES_PER_ROOM} releases each, journal {journal_size / 1024:.0f} KiB")
+
+        # 1. Journal replay only (recover() also writes the compacted snapshot)
+        journal, restored, elapsed = timed_recover(data_dir)
+        print(f"journal replay:          {restored} rooms in {elapsed * 1000:.0f} ms")
+
+        # 2. Snapshot + journal tail
+        tail_rooms = rooms[:max(1, args.rooms // 10)]
+        for room in tail_rooms:
+            room.players = []
+        play_rooms(journal, tail_rooms, RELEASES_PER_ROOM)
+        journal.close()
+
+        snapshot_size = os.path.getsize(os.path.join(data_dir, 'rooms.snapshot'))
+        journal, restored, elapsed = timed_recover(data_dir)
+        journal.close()
+        print(f"snapshot ({snapshot_size / 1024:.0f} KiB) + tail: {restored} rooms in {elapsed * 1000:.0f} ms")
+    finally:
+        shutil.rmtree(data_dir)
+
+if __name__ == '__main__':
+    main()
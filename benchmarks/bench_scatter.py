@@ -0,0 +1,83 @@
+"""
+bench_scatter.py
+
+Initial piece scatter at 1k and 10k pieces: the old uniform random points
+(one random.randint pair per piece) against the jittered grid of
+server/scatter.py, with NumPy and with its pure-Python fallback. The play
+area is sized so the pieces would cover --coverage of it. Reports the time
+to generate the positions and how much the pieces overlap: the share of
+pieces that overlap another one, and how many others a piece overlaps on
+average and at most.
+
+    python benchmarks/bench_scatter.py [--sizes 1000,10000] [--piece-size 40] [--coverage 0.5]
+"""
+
+import argparse
+import collections
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+import scatter
+from scatter import jittered_grid
+
+def uniform(count, width, height, piece_size, margin, seed):
+    """The scatter GameRoom used before the jittered grid."""
+    rng = random.Random(seed)
+    max_x = max(margin, width - piece_size - margin)
+    max_y = max(margin, height - piece_size - margin)
+    return [(rng.randint(margin, max_x), rng.randint(margin, max_y)) for _ in range(count)]
+
+def overlaps(positions, piece_size):
+    """Number of other pieces every piece overlaps (grid hash of piece_size cells)."""
+    cells = collections.defaultdict(list)
+    for i, (x, y) in enumerate(positions):
+        cells[(x // piece_size, y // piece_size)].append(i)
+    counts = []
+    for i, (x, y) in enumerate(positions):
+        cell_x, cell_y = x // piece_size, y // piece_size
+        count = 0
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for j in cells.get((cell_x + dx, cell_y + dy), ()):
+                    other_x, other_y = positions[j]
+                    if j != i and abs(other_x - x) < piece_size and abs(other_y - y) < piece_size:
+                        count += 1
+        counts.append(count)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000', help='Piece counts, comma separated')
+    parser.add_argument('--piece-size', type=int, default=40)
+    parser.add_argument('--coverage', type=float, default=0.5, help='Piece area / play area')
+    parser.add_argument('--margin', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    variants = [('uniform', uniform),
+                ('jittered, Python', lambda *a: jittered_grid(*a, use_numpy=False))]
+    if scatter.np is not None:
+        variants.append(('jittered, NumPy', lambda *a: jittered_grid(*a, use_numpy=True)))
+    else:
+        print("NumPy not installed: only the pure-Python jittered grid is measured")
+
+    print(f"{'pieces':>7} {'area':>11} {'variant':<17} {'generate':>11} {'overlapping':>12} {'mean':>6} {'max':>5}")
+    for count in [int(size) for size in args.sizes.split(',')]:
+        side = round((count * args.piece_size ** 2 / args.coverage) ** 0.5) + 2 * args.margin
+        for name, generate in variants:
+            best = float('inf')
+            for repeat in range(args.repeat):
+                start = time.perf_counter()
+                positions = generate(count, side, side, args.piece_size, args.margin, args.seed + repeat)
+                best = min(best, time.perf_counter() - start)
+            counts = overlaps(positions, args.piece_size)
+            overlapping = sum(1 for count_ in counts if count_) / count
+            print(f"{count:>7} {f'{side}x{side}':>11} {name:<17} {best * 1000:>8.2f} ms {overlapping:>11.1%} "
+                  f"{sum(counts) / count:>6.2f} {max(counts):>5}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+bench_slicing.py
+
+Times piece slicing + surface conversion for serial, thread pool and
+process pool slicing at 48, 1,000 and 5,000 pieces.
+
+    python benchmarks/bench_slicing.py [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from PIL import Image
+from puzzle import build_pieces
+
+# (pieces, grid_cols, grid_rows, piece_px)
+CASES = [
+    (48, 6, 8, 75),
+    (1000, 40, 25, 40),
+    (5000, 100, 50, 30),
+]
+
+POOLS = ['serial', 'thread', 'process']
+
+def outline(pil_piece, row, col):
+    """
+    Stand-in for the per-piece work we want to add later (edge masks, outlines)
+    """
+    pil_piece = pil_piece.copy()
+    width, height = pil_piece.size
+    for x in range(width):
+        pil_piece.putpixel((x, 0), (0, 0, 0))
+        pil_piece.putpixel((x, height - 1), (0, 0, 0))
+    return pil_piece
+
+def run_case(image, cols, rows, pool, processors, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pieces = build_pieces(image, cols, rows, processors, pool=pool)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert len(pieces) == cols * rows
+    assert pieces[-1]['grid_position'] == (cols - 1, rows - 1)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"CPUs: {os.cpu_count()}")
+    print(f"{'pieces':>7} {'processors':>11} " + " ".join(f"{pool:>10}" for pool in POOLS))
+
+    for total, cols, rows, piece_px in CASES:
+        image = Image.effect_noise((cols * piece_px, rows * piece_px), 60).convert('RGB')
+        for label, processors in (('none', ()), ('outline', (outline,))):
+            timings = [run_case(image, cols, rows, pool, processors, args.repeat) for pool in POOLS]
+            print(f"{total:>7} {label:>11} " + " ".join(f"{t * 1000:>8.1f}ms" for t in timings))
+
+if __name__ == '__main__':
+    main()
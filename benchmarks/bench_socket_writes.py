@@ -0,0 +1,135 @@
+"""
+bench_socket_writes.py
+
+Server send syscalls and move latency over real loopback TCP, with the
+connection writers' gathered writes and TCP_NODELAY vs one write per frame
+with Nagle's algorithm left on (the old behaviour). Every player drags its
+own group, sending reliable MOVE_GROUPs at --rate per second; latency is
+from the sender's send call to the other players' handling of the
+broadcast (all clients share this process's clock).
+
+    python benchmarks/bench_socket_writes.py [--players 8] [--rate 60] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from server import Server
+from network_manager import NetworkManager
+from protocol import MSG_MOVE_GROUP_BROD
+import protocol
+import connection
+import network_manager
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise TimeoutError("timed out")
+        time.sleep(0.01)
+
+def use_gathered_writes(enabled):
+    """
+    Switch between gathered writes with TCP_NODELAY and one write per frame
+    with Nagle on, for connections made from now on.
+    """
+    configure = protocol.configure_stream_socket if enabled else (lambda sock: None)
+    connection.configure_stream_socket = configure
+    network_manager.configure_stream_socket = configure
+    protocol.SEND_GATHER_MAX_FRAMES = 256 if enabled else 1
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+def run(players, rate, seconds):
+    """
+    Return (server send syscalls per second, frames per syscall, latencies in seconds).
+    """
+    server = Server(host='127.0.0.1', port=0)
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+
+    latencies = []
+    managers = []
+    for i in range(players):
+        manager = NetworkManager()
+        manager.connect('127.0.0.1', server.port, compression=False)
+        if i == 0:
+            manager.host_game('bench', players, '', 'hard')
+            wait_for(lambda: manager.game_id)
+        else:
+            manager.join_game(managers[0].game_id)
+            wait_for(lambda: manager.game_id)
+
+        def record(message, handle=manager._handle_received_message):
+            if message.get('type') == MSG_MOVE_GROUP_BROD:
+                latencies.append(time.perf_counter() - message['payload']['sent_at'])
+            handle(message)
+        manager._handle_received_message = record
+        manager.lock_group(f'piece_{i}')
+        managers.append(manager)
+    time.sleep(0.5)
+    latencies.clear()
+
+    def drag(manager, object_id):
+        interval = 1 / rate
+        next_send = time.perf_counter()
+        end = next_send + seconds
+        step = 0
+        while next_send < end:
+            manager.move_group(object_id, {'x': 100 + step % 400, 'y': 100}, reliable=True)
+            step += 1
+            next_send += interval
+            time.sleep(max(0.0, next_send - time.perf_counter()))
+
+    before = server.metrics.snapshot()
+    start = time.perf_counter()
+    threads = [threading.Thread(target=drag, args=(manager, f'piece_{i}')) for i, manager in enumerate(managers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    time.sleep(0.5)
+    elapsed = time.perf_counter() - start
+    after = server.metrics.snapshot()
+
+    for manager in managers:
+        manager.disconnect()
+    server.is_running = False
+    server.server_socket.close()
+
+    calls = after.get('send_calls', 0) - before.get('send_calls', 0)
+    frames = after.get('frames_sent', 0) - before.get('frames_sent', 0)
+    return calls / elapsed, frames / calls if calls else 0.0, latencies
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--players', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=60, help="moves per second per player")
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    # The server and clients log every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    print(f"{args.players} players each sending {args.rate:.0f} moves/s for {args.seconds:.0f} s", file=output)
+    print(f"{'writes':>24} | {'server sends/s':>14} | {'frames/send':>11} | "
+          f"{'move latency p50':>16} {'p99':>8} {'max':>8}", file=output)
+    for enabled in (False, True):
+        use_gathered_writes(enabled)
+        calls_per_second, frames_per_call, latencies = run(args.players, args.rate, args.seconds)
+        name = 'gathered + TCP_NODELAY' if enabled else 'one per frame + Nagle'
+        print(f"{name:>24} | {calls_per_second:>14.0f} | {frames_per_call:>11.2f} | "
+              f"{percentile(latencies, 0.5) * 1000:>13.2f} ms {percentile(latencies, 0.99) * 1000:>5.2f} ms "
+              f"{max(latencies) * 1000:>5.2f} ms", file=output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""
+bench_spectators.py
+
+Cost of a player's MOVE_GROUP on the server with N viewers in the room,
+as spectators vs as ordinary members that get every move, plus the bytes
+the viewers receive. Runs the server's message handling in-process with
+connections that only count what is queued for them.
+
+    python benchmarks/bench_spectators.py [--viewers 200] [--moves 3000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from server import Server
+from protocol import *
+
+MOVE_RATE = 60          # moves/s the dragging player sends
+
+class CountingConnection:
+    def __init__(self, address):
+        self.address = address
+        self.bytes_sent = 0
+        self.udp_address = None
+
+    def send(self, data):
+        self.bytes_sent += len(data)
+
+    def send_datagram(self, udp_socket, body):
+        return False
+
+def connect(server, port):
+    connection = CountingConnection(('10.0.0.1', port))
+    server.clients[connection.address] = connection
+    return connection
+
+def run(server, viewers, as_spectators, moves):
+    """
+    Return (microseconds per move, viewer bytes per second of dragging).
+    """
+    host = connect(server, 1)
+    server.process_message({'type': MSG_HOST_GAME, 'payload': {
+        'game_name': 'bench', 'max_players': viewers + 1, 'image_url': '', 'difficulty': 'hard'}}, host)
+    game_id = server.client_rooms[host.address]
+
+    watchers = [connect(server, 100 + i) for i in range(viewers)]
+    join_type = MSG_SPECTATE_GAME if as_spectators else MSG_JOIN_GAME
+    for watcher in watchers:
+        server.process_message({'type': join_type, 'payload': {'game_id': game_id}}, watcher)
+    server.process_message({'type': MSG_LOCK_GROUP, 'payload': {'object_id': 'piece_0'}}, host)
+    for watcher in watchers:
+        watcher.bytes_sent = 0
+
+    # Spectator updates are sent every 1/spectator_rate s of dragging
+    moves_per_update = MOVE_RATE / server.spectator_rate
+    elapsed = 0.0
+    for i in range(moves):
+        message = {'type': MSG_MOVE_GROUP, 'payload': {'object_id': 'piece_0', 'position': {'x': i % 500, 'y': 5}}}
+        start = time.perf_counter()
+        server.process_message(message, host)
+        elapsed += time.perf_counter() - start
+        if as_spectators and (i + 1) % moves_per_update < 1:
+            server.send_spectator_updates()
+
+    viewer_bytes = sum(watcher.bytes_sent for watcher in watchers)
+    for connection in [host] + watchers:
+        server.process_message({'type': MSG_LEAVE_GAME, 'payload': {}}, connection)
+    return elapsed / moves * 1e6, viewer_bytes / (moves / MOVE_RATE)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--viewers', type=int, default=200)
+    parser.add_argument('--moves', type=int, default=3000)
+    args = parser.parse_args()
+
+    # The server logs every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+    server = Server(host='127.0.0.1', port=0)
+
+    print(f"player moves at {MOVE_RATE}/s, spectators updated {server.spectator_rate:.0f}/s", file=output)
+    print(f"{'viewers':>8} {'as':>10} | {'per move':>9} | {'to viewers':>11}", file=output)
+    for viewers in (0, 50, args.viewers):
+        for as_spectators in ((False, True) if viewers else (False,)):
+            per_move, viewer_rate = run(server, viewers, as_spectators, args.moves)
+            kind = 'spectators' if as_spectators else 'members'
+            print(f"{viewers:>8} {kind:>10} | {per_move:>6.1f} us | {viewer_rate / 1024:>7.0f} KB/s", file=output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+bench_timing_wheel.py
+
+Heartbeat bookkeeping for N connections (default 100,000): scheduling,
+deadline resets (one per received message) and the per-tick expiry cost
+when only a few connections are actually dead.
+
+    python benchmarks/bench_timing_wheel.py [--connections N]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from timing_wheel import TimingWheel
+
+TICK = 0.01
+TIMEOUT = 2.0
+STRIDE = 50          # each loop resets 1/STRIDE of the live connections
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--connections', type=int, default=100000)
+    args = parser.parse_args()
+
+    wheel = TimingWheel(TICK, slots=2 * int(TIMEOUT / TICK))
+    addresses = [('10.0.0.1', port) for port in range(args.connections)]
+
+    start = time.perf_counter()
+    for address in addresses:
+        wheel.schedule(address, TIMEOUT)
+    elapsed = time.perf_counter() - start
+    print(f"schedule:  {elapsed / args.connections * 1e6:.2f} us per connection")
+
+    # Everyone but the last 100 keeps talking
+    alive = addresses[:-100]
+    expired = []
+    tick_times = []
+    resets = 0
+    reset_time = 0.0
+    end = time.monotonic() + TIMEOUT + 1.0
+    while time.monotonic() < end:
+        start = time.perf_counter()
+        batch = alive[len(tick_times) % STRIDE::STRIDE]
+        for address in batch:
+            wheel.schedule(address, TIMEOUT)
+        reset_time += time.perf_counter() - start
+        resets += len(batch)
+
+        start = time.perf_counter()
+        expired.extend(wheel.advance())
+        tick_times.append(time.perf_counter() - start)
+        time.sleep(TICK / 4)
+
+    tick_times.sort()
+    print(f"reset:     {reset_time / max(resets, 1) * 1e6:.2f} us per message")
+    print(f"advance:   median {tick_times[len(tick_times) // 2] * 1e6:.0f} us, "
+          f"max {tick_times[-1] * 1e6:.0f} us per call")
+    print(f"expired:   {len(expired)} (expected 100), {len(wheel)} still scheduled")
+
+if __name__ == '__main__':
+    main()
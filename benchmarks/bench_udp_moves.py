@@ -0,0 +1,135 @@
+"""
+bench_udp_moves.py
+
+Freshness of remote drags over TCP vs the UDP channel on a lossy link.
+One player drags a piece at 60 moves/s; an observer is connected through
+netsim relays (same loss / latency for TCP and UDP). "shown age" is how
+old the newest move the observer has applied is, sampled every frame:
+over TCP one lost segment holds back every move behind it, over UDP a
+lost move is simply superseded by the next one.
+
+    python benchmarks/bench_udp_moves.py [--loss 0.05] [--latency 0.03] [--jitter 0.01] [--seconds 5]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
+from server import Server
+from network_manager import NetworkManager
+from netsim import TcpRelay, UdpRelay
+
+MOVE_RATE = 60
+FPS = 60
+
+class Observer(NetworkManager):
+    def __init__(self):
+        super().__init__()
+        self.applied = []       # (receive time, sent_at) of every move applied
+
+    def _handle_move_group_brod(self, payload):
+        self.applied.append((time.perf_counter(), payload['sent_at']))
+        super()._handle_move_group_brod(payload)
+
+def wait_for(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise TimeoutError("timed out")
+        time.sleep(0.01)
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else float('nan')
+
+def run(server, transport, args):
+    """
+    Drag a piece for args.seconds and return the observer's stats.
+    """
+    tcp_relay = TcpRelay(0, ('127.0.0.1', server.port), args.loss, args.latency, args.jitter, seed=1)
+    udp_relay = UdpRelay(0, ('127.0.0.1', server.port), args.loss, args.latency, args.jitter, seed=2)
+
+    mover = NetworkManager()
+    mover.connect('127.0.0.1', server.port)
+    if transport == 'udp':
+        mover.open_udp()
+        wait_for(lambda: mover.udp_ready)
+    mover.host_game('bench', 4, '', 'easy')
+    wait_for(lambda: mover.game_id)
+
+    observer = Observer()
+    observer.connect('127.0.0.1', tcp_relay.port)
+    if transport == 'udp':
+        observer.open_udp(port=udp_relay.port)
+        wait_for(lambda: observer.udp_ready)
+    observer.join_game(mover.game_id)
+    wait_for(lambda: observer.game_id)
+
+    mover.lock_group('piece_0')
+    wait_for(lambda: 'piece_0' in observer.locked_by_others)
+
+    start = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - start < args.seconds:
+        sent += 1
+        mover.move_group('piece_0', {'x': 100 + sent % 500, 'y': 100})
+        time.sleep(1 / MOVE_RATE)
+    end = time.perf_counter()
+    time.sleep(args.latency + 4 * args.jitter + 0.5)
+    mover.release_group('piece_0', {'x': 100, 'y': 100})
+    mover.disconnect()
+    observer.disconnect()
+
+    # Age of the newest applied move at every frame while dragging
+    shown_ages = []
+    applied = sorted(observer.applied)
+    index = 0
+    newest = None
+    frame = start + 0.5
+    while frame < end:
+        while index < len(applied) and applied[index][0] <= frame:
+            newest = max(newest or 0.0, applied[index][1])
+            index += 1
+        if newest is not None:
+            shown_ages.append(frame - newest)
+        frame += 1 / FPS
+
+    return {
+        'sent': sent,
+        'applied': len(applied),
+        'p50': percentile(shown_ages, 0.5) * 1000,
+        'p99': percentile(shown_ages, 0.99) * 1000,
+        'max': max(shown_ages) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--loss', type=float, default=0.05)
+    parser.add_argument('--latency', type=float, default=0.03, help="one-way, seconds")
+    parser.add_argument('--jitter', type=float, default=0.01, help="seconds")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # The server and clients log every message
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    server = Server(host='127.0.0.1', port=0)
+    server_thread = threading.Thread(target=server.start)
+    server_thread.daemon = True
+    server_thread.start()
+
+    print(f"{MOVE_RATE} moves/s for {args.seconds:.0f} s, loss {args.loss:.0%}, "
+          f"latency {args.latency * 1000:.0f} ms + {args.jitter * 1000:.0f} ms jitter", file=output)
+    print(f"{'transport':>9} | {'applied':>12} | {'shown age p50':>13} {'p99':>7} {'max':>7}", file=output)
+    for transport in ('tcp', 'udp'):
+        stats = run(server, transport, args)
+        print(f"{transport:>9} | {stats['applied']:>5}/{stats['sent']:<6} | {stats['p50']:>10.0f} ms "
+              f"{stats['p99']:>4.0f} ms {stats['max']:>4.0f} ms", file=output)
+
+if __name__ == '__main__':
+    main()
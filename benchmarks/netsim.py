@@ -0,0 +1,178 @@
+"""
+netsim.py
+
+Network condition simulator for localhost testing: relays that sit between
+a client and the server and add latency, jitter and loss.
+
+UdpRelay drops each datagram with probability `loss` and delays the rest
+by latency + random jitter, so datagrams can also arrive out of order.
+TcpRelay cannot lose bytes; instead a "lost" chunk is delivered after an
+extra retransmission timeout, and everything behind it waits for it
+(head-of-line blocking), which is what loss looks like from a TCP reader.
+
+    # UDP relay on 5556 -> server 5555, 10% loss, 50 ms +- 20 ms
+    python benchmarks/netsim.py udp 5556 127.0.0.1:5555 --loss 0.1 --latency 0.05 --jitter 0.02
+    python benchmarks/netsim.py tcp 5557 127.0.0.1:5555 --loss 0.05 --latency 0.05
+"""
+
+import argparse
+import heapq
+import itertools
+import random
+import socket
+import threading
+import time
+
+TCP_RETRANSMIT_TIMEOUT = 0.2    # extra delay of a "lost" TCP segment (Linux min RTO)
+
+class DelayLine:
+    def __init__(self):
+        """
+        Calls send(data) for each queued item at its delivery time, on one thread.
+        """
+        self.queue = []
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def put(self, deliver_at, send, data):
+        with self.condition:
+            heapq.heappush(self.queue, (deliver_at, next(self.order), send, data))
+            self.condition.notify()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.queue or self.queue[0][0] > time.monotonic():
+                    timeout = self.queue[0][0] - time.monotonic() if self.queue else None
+                    self.condition.wait(timeout)
+                _, _, send, data = heapq.heappop(self.queue)
+            try:
+                send(data)
+            except OSError:
+                pass
+
+class UdpRelay:
+    def __init__(self, listen_port, target, loss=0.0, latency=0.0, jitter=0.0, seed=None):
+        """
+        Relay datagrams between the last client that sent to listen_port
+        and target, both ways. listen_port 0 picks a free port (see .port).
+        """
+        self.target = target
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.client_address = None
+        self.dropped = 0
+        self.relayed = 0
+
+        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client_socket.bind(('127.0.0.1', listen_port))
+        self.port = self.client_socket.getsockname()[1]
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.server_socket.connect(target)
+        self.delay_line = DelayLine()
+
+        for target_function in (self._from_client, self._from_server):
+            thread = threading.Thread(target=target_function)
+            thread.daemon = True
+            thread.start()
+
+    def _schedule(self, send, data):
+        if self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        self.relayed += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        self.delay_line.put(time.monotonic() + delay, send, data)
+
+    def _from_client(self):
+        while True:
+            data, self.client_address = self.client_socket.recvfrom(65536)
+            self._schedule(self.server_socket.send, data)
+
+    def _from_server(self):
+        while True:
+            data = self.server_socket.recv(65536)
+            if self.client_address:
+                client_address = self.client_address
+                self._schedule(lambda data: self.client_socket.sendto(data, client_address), data)
+
+class TcpRelay:
+    def __init__(self, listen_port, target, loss=0.0, latency=0.0, jitter=0.0, seed=None):
+        """
+        Relay TCP connections to target, delaying every chunk in order.
+        listen_port 0 picks a free port (see .port).
+        """
+        self.target = target
+        self.loss = loss
+        self.latency = latency
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.retransmits = 0
+
+        self.listen_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listen_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listen_socket.bind(('127.0.0.1', listen_port))
+        self.listen_socket.listen(16)
+        self.port = self.listen_socket.getsockname()[1]
+
+        thread = threading.Thread(target=self._accept)
+        thread.daemon = True
+        thread.start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.listen_socket.accept()
+            server = socket.create_connection(self.target)
+            for source, destination in ((client, server), (server, client)):
+                thread = threading.Thread(target=self._pipe, args=(source, destination))
+                thread.daemon = True
+                thread.start()
+
+    def _pipe(self, source, destination):
+        delay_line = DelayLine()
+        last_delivery = 0.0
+        while True:
+            try:
+                data = source.recv(65536)
+            except OSError:
+                data = b''
+            if not data:
+                delay_line.put(last_delivery, lambda _: destination.shutdown(socket.SHUT_WR), None)
+                return
+            deliver_at = time.monotonic() + self.latency + self.random.uniform(0, self.jitter)
+            if self.random.random() < self.loss:
+                self.retransmits += 1
+                deliver_at += TCP_RETRANSMIT_TIMEOUT
+
+            # In order: nothing overtakes a delayed chunk
+            last_delivery = max(deliver_at, last_delivery)
+            delay_line.put(last_delivery, destination.sendall, data)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('protocol', choices=('udp', 'tcp'))
+    parser.add_argument('listen_port', type=int)
+    parser.add_argument('target', help="host:port")
+    parser.add_argument('--loss', type=float, default=0.0)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="seconds of extra random delay")
+    args = parser.parse_args()
+
+    host, port = args.target.rsplit(':', 1)
+    relay_class = UdpRelay if args.protocol == 'udp' else TcpRelay
+    relay = relay_class(args.listen_port, (host, int(port)), args.loss, args.latency, args.jitter)
+    print(f"Relaying {args.protocol} :{relay.port} -> {args.target} "
+          f"(loss {args.loss:.0%}, latency {args.latency * 1000:.0f} ms + {args.jitter * 1000:.0f} ms)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+"""
+stress_locks.py
+
+Lock exclusivity stress test. Several rooms, each with many clients
+racing to LOCK_GROUP / MOVE_GROUP / RELEASE_GROUP the same few pieces.
+Every successful lock is recorded as an interval from its ACK to the
+RELEASE being sent; for any piece the intervals of different holders
+must never overlap (the next ACK is causally after the previous release).
+
+    python benchmarks/stress_locks.py [--rooms 4] [--clients 8] [--pieces 2] [--seconds 5]
+    python benchmarks/stress_locks.py --port 5555     # against a running server
+
+Without --port an in-process server is started on a free port.
+"""
+
+import argparse
+import os
+import socket
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'server'))
+from server import Server
+from protocol import *
+
+def receive_until(sock, reader, msg_type, pending):
+    """
+    Return the payload of the next msg_type message, skipping broadcasts.
+    """
+    while True:
+        while pending:
+            message = deserialize(pending.pop(0))
+            if message['type'] == msg_type:
+                return message['payload']
+        pending.extend(reader.feed(sock.recv(65536)))
+
+def run_client(host, port, game_id, pieces, stop, results, index):
+    sock = socket.create_connection((host, port))
+    reader = MessageReader()
+    pending = []
+    if game_id is None:
+        sock.sendall(serialize(MSG_HOST_GAME, {'game_name': 'stress', 'max_players': 64,
+                                               'image_url': '', 'difficulty': 'hard'}))
+        results['game_id'] = receive_until(sock, reader, MSG_HOST_GAME_ACK, pending)['game_id']
+    else:
+        sock.sendall(serialize(MSG_JOIN_GAME, {'game_id': game_id}))
+        receive_until(sock, reader, MSG_JOIN_GAME_ACK, pending)
+    results['ready'].wait()
+
+    attempts = 0
+    intervals = []
+    while not stop.is_set():
+        piece_id = pieces[attempts % len(pieces)]
+        attempts += 1
+        sock.sendall(serialize(MSG_LOCK_GROUP, {'object_id': piece_id}))
+        if not receive_until(sock, reader, MSG_LOCK_GROUP_ACK, pending)['success']:
+            continue
+
+        acquired = time.perf_counter()
+        position = {'x': 5, 'y': 5}
+        sock.sendall(serialize(MSG_MOVE_GROUP, {'object_id': piece_id, 'position': position}))
+        released = time.perf_counter()
+        sock.sendall(serialize(MSG_RELEASE_GROUP, {'object_id': piece_id, 'position': position}))
+        receive_until(sock, reader, MSG_RELEASE_GROUP_ACK, pending)
+        intervals.append((piece_id, acquired, released, index))
+
+    sock.close()
+    results['attempts'] += attempts
+    results['intervals'].extend(intervals)
+
+def run_room(host, port, clients, pieces):
+    """
+    Start one room's clients; returns (results, stop event, threads).
+    """
+    results = {'ready': threading.Event(), 'attempts': 0, 'intervals': []}
+    stop = threading.Event()
+    host_thread = threading.Thread(target=run_client, args=(host, port, None, pieces, stop, results, 0))
+    host_thread.start()
+    while 'game_id' not in results:
+        time.sleep(0.01)
+
+    threads = [host_thread] + [
+        threading.Thread(target=run_client, args=(host, port, results['game_id'], pieces, stop, results, i))
+        for i in range(1, clients)
+    ]
+    for thread in threads[1:]:
+        thread.start()
+    return results, stop, threads
+
+def check_exclusive(intervals):
+    """
+    Count overlapping intervals of different holders on the same piece.
+    """
+    violations = 0
+    by_piece = {}
+    for piece_id, acquired, released, holder in intervals:
+        by_piece.setdefault(piece_id, []).append((acquired, released, holder))
+    for piece_intervals in by_piece.values():
+        piece_intervals.sort()
+        for (_, prev_released, prev_holder), (acquired, _, holder) in zip(piece_intervals, piece_intervals[1:]):
+            if acquired < prev_released and holder != prev_holder:
+                violations += 1
+    return violations
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=None)
+    parser.add_argument('--rooms', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=8, help="clients per room")
+    parser.add_argument('--pieces', type=int, default=2, help="contested pieces per room")
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    # Switch threads as often as possible to provoke races
+    sys.setswitchinterval(1e-6)
+
+    # The server logs every message; results go to the real stdout
+    sys.stdout = open(os.devnull, 'w')
+    output = sys.__stdout__
+
+    server = None
+    if args.port is None:
+        server = Server(host=args.host, port=0)
+        args.port = server.port
+        server_thread = threading.Thread(target=server.start)
+        server_thread.daemon = True
+        server_thread.start()
+        time.sleep(0.2)
+
+    pieces = [f'piece_{i}' for i in range(args.pieces)]
+    rooms = [run_room(args.host, args.port, args.clients, pieces) for _ in range(args.rooms)]
+    time.sleep(0.5)
+    start = time.perf_counter()
+    for results, _, _ in rooms:
+        results['ready'].set()
+    time.sleep(args.seconds)
+    for _, stop, _ in rooms:
+        stop.set()
+    for _, _, threads in rooms:
+        for thread in threads:
+            thread.join()
+    elapsed = time.perf_counter() - start
+
+    attempts = sum(results['attempts'] for results, _, _ in rooms)
+    intervals = [interval for results, _, _ in rooms for interval in results['intervals']]
+    violations = sum(check_exclusive(results['intervals']) for results, _, _ in rooms)
+
+    print(f"{args.rooms} rooms x {args.clients} clients racing for {args.pieces} pieces for {elapsed:.1f} s", file=output)
+    print(f"lock attempts: {attempts} ({attempts / elapsed:.0f}/s), granted: {len(intervals)}", file=output)
+    print(f"exclusivity violations: {violations}", file=output)
+    if server:
+        time.sleep(0.5)
+        leaked = sum(len(room.locked_objects) for room in server.game_rooms.values())
+        print(f"locks left held on the server: {leaked}", file=output)
+    sys.exit(1 if violations else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+from array import array
+
+try:
+    import numpy as np
+except ImportError:     # optional: evaluated with plain loops instead
+    np = None
+
+class BoardEvaluator:
+    def __init__(self, targets, tolerance, use_numpy=True):
+        """
+        Evaluates the whole board at once: which pieces are within tolerance
+        of their target, how many are, and how far each one is. Piece
+        positions and targets are kept in contiguous coordinate arrays
+        indexed by piece number (targets is a list of (x, y)). With NumPy
+        the evaluation is vectorized; without it (or with use_numpy=False)
+        the same arrays are walked in a loop. Results are cached until a
+        position changes, so an unchanged board costs nothing per frame.
+        """
+        self.use_numpy = use_numpy and np is not None
+        self.tolerance_sq = tolerance * tolerance
+        if self.use_numpy:
+            self.target_x = np.array([x for x, y in targets], dtype=np.float64)
+            self.target_y = np.array([y for x, y in targets], dtype=np.float64)
+            self.xs = self.target_x.copy()
+            self.ys = self.target_y.copy()
+        else:
+            self.target_x = array('d', (x for x, y in targets))
+            self.target_y = array('d', (y for x, y in targets))
+            self.xs = array('d', self.target_x)
+            self.ys = array('d', self.target_y)
+
+        # Cached evaluation, None when a position changed since
+        self.correct = None         # per piece: within tolerance
+        self.correct_count = 0
+        self.distances = None
+
+    def set_position(self, index, x, y):
+        self.xs[index] = x
+        self.ys[index] = y
+        self.correct = None
+        self.distances = None
+
+    def set_positions(self, positions):
+        """Set every position at once from a list of (x, y) in piece order."""
+        for index, (x, y) in enumerate(positions):
+            self.xs[index] = x
+            self.ys[index] = y
+        self.correct = None
+        self.distances = None
+
+    def _evaluate(self):
+        if self.correct is not None:
+            return
+        if self.use_numpy:
+            dx = self.xs - self.target_x
+            dy = self.ys - self.target_y
+            self.correct = dx * dx + dy * dy <= self.tolerance_sq
+            self.correct_count = int(np.count_nonzero(self.correct))
+        else:
+            tolerance_sq = self.tolerance_sq
+            self.correct = [(x - tx) * (x - tx) + (y - ty) * (y - ty) <= tolerance_sq
+                            for x, y, tx, ty in zip(self.xs, self.ys, self.target_x, self.target_y)]
+            self.correct_count = sum(self.correct)
+
+    # -------------------------------------------------------------------------
+    # Queries
+
+    def is_correct(self, index):
+        self._evaluate()
+        return bool(self.correct[index])
+
+    def get_correct_count(self):
+        self._evaluate()
+        return self.correct_count
+
+    def get_misplaced(self):
+        """Indexes of the pieces outside tolerance of their target."""
+        self._evaluate()
+        if self.use_numpy:
+            return np.flatnonzero(~self.correct).tolist()
+        return [index for index, correct in enumerate(self.correct) if not correct]
+
+    def get_distances(self):
+        """Distance from every piece to its target, in piece order."""
+        if self.distances is None:
+            if self.use_numpy:
+                self.distances = np.hypot(self.xs - self.target_x, self.ys - self.target_y)
+            else:
+                self.distances = [((x - tx) ** 2 + (y - ty) ** 2) ** 0.5
+                                  for x, y, tx, ty in zip(self.xs, self.ys, self.target_x, self.target_y)]
+        return self.distances
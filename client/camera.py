@@ -0,0 +1,155 @@
+import pygame
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import CAMERA_ZOOM_LEVELS, MIPMAP_BUILDS_PER_FRAME
+
+class Camera:
+    def __init__(self, viewport_width, viewport_height, zoom_levels=CAMERA_ZOOM_LEVELS):
+        """
+        Maps between world coordinates (where pieces live, and what the
+        server stores) and screen coordinates inside the window.
+        Zoom is restricted to a fixed set of levels so scaled piece
+        surfaces can be cached per level.
+        """
+        self.viewport_width = viewport_width
+        self.viewport_height = viewport_height
+        self.zoom_levels = sorted(zoom_levels)
+        self.zoom_index = self.zoom_levels.index(1.0) if 1.0 in self.zoom_levels else 0
+
+        # World coordinate shown at the top-left corner of the screen
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+
+    @property
+    def zoom(self):
+        return self.zoom_levels[self.zoom_index]
+
+    # -------------------------------------------------------------------------
+    # Coordinate Conversion
+
+    def world_to_screen(self, x, y):
+        """
+        Convert a world point to an integer screen point.
+        """
+        return (round((x - self.offset_x) * self.zoom), round((y - self.offset_y) * self.zoom))
+
+    def screen_to_world(self, x, y):
+        """
+        Convert a screen point to an integer world point.
+        """
+        return (round(x / self.zoom + self.offset_x), round(y / self.zoom + self.offset_y))
+
+    def scale_size(self, width, height):
+        """
+        Size on screen of something width x height in the world.
+        """
+        return (max(1, round(width * self.zoom)), max(1, round(height * self.zoom)))
+
+    def world_rect_to_screen(self, rect):
+        """
+        Convert a world rect to a screen rect.
+        """
+        return pygame.Rect(self.world_to_screen(rect.x, rect.y), self.scale_size(rect.width, rect.height))
+
+    def get_visible_world_rect(self):
+        """
+        Return the part of the world currently on screen.
+        """
+        return pygame.Rect(
+            int(self.offset_x),
+            int(self.offset_y),
+            int(self.viewport_width / self.zoom) + 2,
+            int(self.viewport_height / self.zoom) + 2
+        )
+
+    # -------------------------------------------------------------------------
+    # Movement
+
+    def pan(self, dx, dy):
+        """
+        Pan by a screen-space delta (e.g. a mouse drag).
+        """
+        self.offset_x -= dx / self.zoom
+        self.offset_y -= dy / self.zoom
+
+    def zoom_at(self, screen_pos, steps):
+        """
+        Move steps zoom levels in (positive) or out (negative), keeping the
+        world point under screen_pos fixed.
+        Returns True if the zoom level changed.
+        """
+        new_index = max(0, min(len(self.zoom_levels) - 1, self.zoom_index + steps))
+        if new_index == self.zoom_index:
+            return False
+
+        world_x = screen_pos[0] / self.zoom + self.offset_x
+        world_y = screen_pos[1] / self.zoom + self.offset_y
+        self.zoom_index = new_index
+        self.offset_x = world_x - screen_pos[0] / self.zoom
+        self.offset_y = world_y - screen_pos[1] / self.zoom
+        return True
+
+    def reset(self):
+        """
+        Go back to 1:1 zoom with the world origin at the top-left corner.
+        """
+        self.zoom_index = self.zoom_levels.index(1.0) if 1.0 in self.zoom_levels else 0
+        self.offset_x = 0.0
+        self.offset_y = 0.0
+
+class PieceSurfaceCache:
+    def __init__(self, builds_per_frame=MIPMAP_BUILDS_PER_FRAME):
+        """
+        Cache of pre-scaled piece surfaces, one per piece per zoom level.
+        Each level is built from the closest larger level already cached
+        (a mip chain), which keeps smoothscale cheap when zooming out step
+        by step. The cache for a piece is dropped when its source surface
+        changes, e.g. when placeholder pieces are upgraded.
+        """
+        self.builds_per_frame = builds_per_frame
+        self.builds_left = builds_per_frame
+        self._cache = {}    # piece_id -> (source_surface, {zoom: surface})
+
+    def start_frame(self):
+        """
+        Reset the per-frame build budget.
+        """
+        self.builds_left = self.builds_per_frame
+
+    def get(self, piece_id, source, zoom, size):
+        """
+        Return source scaled to size for the given zoom level.
+        """
+        if zoom == 1.0 and source.get_size() == size:
+            return source
+
+        entry = self._cache.get(piece_id)
+        if entry is None or entry[0] is not source:
+            entry = (source, {})
+            self._cache[piece_id] = entry
+        levels = entry[1]
+
+        scaled = levels.get(zoom)
+        if scaled is not None and scaled.get_size() == size:
+            return scaled
+
+        # Over budget for this frame: draw a cheap uncached scale so a zoom
+        # change over thousands of pieces spreads the smoothscale work out
+        if self.builds_left <= 0:
+            return pygame.transform.scale(source, size)
+        self.builds_left -= 1
+
+        # Scale down from the closest larger cached level
+        parent = source
+        larger = [level for level in levels if zoom < level <= 1.0]
+        if larger:
+            parent = levels[min(larger)]
+
+        scaled = pygame.transform.smoothscale(parent, size)
+        levels[zoom] = scaled
+        return scaled
+
+    def clear(self):
+        self._cache.clear()
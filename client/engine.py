@@ -0,0 +1,364 @@
+import sys
+import os
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import *
+from board_eval import BoardEvaluator
+
+class ClientEngine:
+    def __init__(self, network_manager, piece_positions=None):
+        """
+        Everything the client does besides drawing: piece positions and draw
+        order, dragging, local snap prediction, move throttling, lock lease
+        renewal, win detection and syncing with the network manager.
+        Works on plain (x, y) world coordinates and never touches pygame, so
+        it runs headless (bots, benchmarks) as well as under GameGUI.
+        piece_positions is used if the network manager has none yet.
+        """
+        self.network_manager = network_manager
+        self.snap_tolerance = SNAP_TOLERANCE
+
+        # The server decides the board layout; every piece is one grid cell
+        self.board = network_manager.board
+        self.piece_width = self.board['piece_width']
+        self.piece_height = self.board['piece_height']
+        self.board_rect = (self.board['x'], self.board['y'],
+                           self.board['cols'] * self.piece_width, self.board['rows'] * self.piece_height)
+
+        # Top-left world position of every piece, and the draw order (back to front)
+        self.piece_positions = {}
+        self.piece_order = []
+        self.piece_index = {}           # piece_id -> index in piece_order
+        self.piece_numbers = {}         # piece_id -> row-major number (index in board_eval)
+        self.board_eval = None
+        self._place_pieces(network_manager.get_current_piece_positions() or piece_positions)
+
+        # Drag state
+        self.selected_piece_id = None
+        self.drag_group_ids = set()
+        self.is_dragging = False
+        self.drag_offset = (0, 0)       # grab point relative to the selected piece
+        self.last_move_sent = 0.0
+        self.pending_move = None        # (piece_id, x, y) not sent yet (moves are throttled)
+
+        self.game_won = False
+        self.reported_viewport = None   # (left, top, right, bottom) last sent with SET_VIEWPORT
+
+    def _place_pieces(self, server_positions):
+        """
+        Set every piece's position from server data (row-major piece ids).
+        """
+        piece_ids = [f'piece_{i}' for i in range(self.board['cols'] * self.board['rows'])]
+        if not server_positions:
+            print("No server positions provided, using fallback scatter")
+            server_positions = self._fallback_scatter(piece_ids)
+
+        for piece_id in piece_ids:
+            position = server_positions.get(piece_id)
+            if position is None:
+                print(f"Warning: No server position for piece {piece_id}, using fallback")
+                position = {'x': 50, 'y': 50}
+            self.piece_positions[piece_id] = (position['x'], position['y'])
+        self.piece_order = piece_ids
+        self._rebuild_piece_index()
+
+        self.piece_numbers = {piece_id: i for i, piece_id in enumerate(piece_ids)}
+        self.board_eval = BoardEvaluator([self.get_correct_position(piece_id) for piece_id in piece_ids],
+                                         self.snap_tolerance)
+        self.board_eval.set_positions([self.piece_positions[piece_id] for piece_id in piece_ids])
+
+    def _fallback_scatter(self, piece_ids):
+        """
+        Spread the pieces over the play area (with margins, below the title).
+        """
+        max_x = max(10, WINDOW_WIDTH - self.piece_width - 10)
+        max_y = max(80, WINDOW_HEIGHT - self.piece_height - 10)
+        return {piece_id: {'x': 10 + (i * 25) % max_x, 'y': 80 + (i * 35) % max_y}
+                for i, piece_id in enumerate(piece_ids)}
+
+    def _rebuild_piece_index(self):
+        """Rebuild the piece_id -> draw order index lookup."""
+        self.piece_index = {piece_id: i for i, piece_id in enumerate(self.piece_order)}
+
+    # -------------------------------------------------------------------------
+    # Per-frame Update
+
+    def update(self):
+        """
+        Run one frame of logic: sync with the network manager, then send the
+        latest drag position if the move send interval has passed.
+        """
+        self._sync_with_network_manager()
+        self._flush_pending_move()
+
+    def _sync_with_network_manager(self):
+        """Sync piece positions and lock states with network manager."""
+        # The server released our lock (lease expired): drop the drag
+        expired = self.network_manager.expired_pieces
+        if expired:
+            if self.is_dragging and expired & self.drag_group_ids:
+                print("Lock lease expired, piece released")
+                self.is_dragging = False
+                self.selected_piece_id = None
+                self.drag_group_ids = set()
+                self.pending_move = None
+            expired.clear()
+
+        # Holding a piece still sends no moves; renew the lease anyway
+        if self.is_dragging and time.perf_counter() - self.last_move_sent > LOCK_LEASE_TTL / 2:
+            x, y = self.piece_positions[self.selected_piece_id]
+            self._send_group_move(self.selected_piece_id, x, y, reliable=True)
+
+        # Check if puzzle was completed by another player
+        if not self.game_won and self.network_manager.is_puzzle_completed():
+            self.game_won = True
+            solver_info = self.network_manager.get_puzzle_solver()
+            if solver_info:
+                print(f"PUZZLE SOLVED by {solver_info['ip']}:{solver_info['port']}!")
+            else:
+                print("PUZZLE SOLVED by another player!")
+
+        # Take positions from the network manager (remote drags smoothed),
+        # except for the group we are dragging ourselves
+        network_positions = self.network_manager.get_display_piece_positions()
+        for piece_id, position in network_positions.items():
+            if self.is_dragging and piece_id in self.drag_group_ids:
+                continue
+            current = self.piece_positions.get(piece_id)
+            if current is not None and current != (position['x'], position['y']):
+                self._set_position(piece_id, position['x'], position['y'])
+
+    def report_viewport(self, left, top, width, height):
+        """
+        Send the part of the world on screen, plus VIEWPORT_MARGIN, whenever
+        the screen leaves the area last sent or is much smaller than it
+        (after zooming in). Other players' moves outside it are not sent to us.
+        """
+        if self.network_manager.is_spectator:
+            return
+        reported = self.reported_viewport
+        if (reported and reported[0] <= left and reported[1] <= top
+                and left + width <= reported[2] and top + height <= reported[3]
+                and (reported[2] - reported[0]) * (reported[3] - reported[1]) <= 16 * width * height):
+            return
+        margin_x = round(VIEWPORT_MARGIN * width)
+        margin_y = round(VIEWPORT_MARGIN * height)
+        reported = (left - margin_x, top - margin_y, left + width + margin_x, top + height + margin_y)
+        self.network_manager.set_viewport(*reported)
+        self.reported_viewport = reported
+
+    # -------------------------------------------------------------------------
+    # Input (world coordinates)
+
+    def press(self, world_pos):
+        """
+        Start dragging the topmost piece at world_pos, with its group, unless
+        another player holds any of it. Returns True if a drag started.
+        """
+        if self.game_won or self.network_manager.is_spectator:
+            return False
+
+        # Check pieces from front to back (reverse order)
+        piece_id = self.get_piece_at(world_pos)
+        if piece_id is None:
+            return False
+        members = self.network_manager.get_group_members(piece_id)
+
+        # Check if the piece (or its group) is locked by another player
+        for member_id in members:
+            if self.network_manager.is_piece_locked_by_others(member_id):
+                locker_info = self.network_manager.get_piece_locker_info(member_id)
+                print(f"Piece {member_id} is locked by another player: {locker_info}")
+                return False
+
+        self.is_dragging = True
+        self.selected_piece_id = piece_id
+        self.drag_group_ids = set(members)
+
+        # The clicked piece is the anchor for the group on the wire
+        self.network_manager.lock_group(piece_id)
+        self.last_move_sent = time.perf_counter()
+
+        # Keep the grab point under the cursor while dragging
+        x, y = self.piece_positions[piece_id]
+        self.drag_offset = (world_pos[0] - x, world_pos[1] - y)
+
+        # Move selected group to front for rendering
+        self._bring_to_front(self.drag_group_ids)
+        return True
+
+    def drag_to(self, world_pos):
+        """
+        Move the dragged group so the grab point follows world_pos.
+        """
+        if not self.is_dragging:
+            return
+        anchor_x, anchor_y = self.piece_positions[self.selected_piece_id]
+        new_x = world_pos[0] - self.drag_offset[0]
+        new_y = world_pos[1] - self.drag_offset[1]
+
+        # Keep the whole group inside the play area
+        group_positions = [self.piece_positions[piece_id] for piece_id in self.drag_group_ids]
+        left = min(x for x, y in group_positions) - anchor_x
+        top = min(y for x, y in group_positions) - anchor_y
+        right = max(x for x, y in group_positions) + self.piece_width - anchor_x
+        bottom = max(y for x, y in group_positions) + self.piece_height - anchor_y
+        new_x = max(-left, min(new_x, WINDOW_WIDTH - right))
+        new_y = max(-top, min(new_y, WINDOW_HEIGHT - bottom))
+
+        self._move_drag_group(new_x - anchor_x, new_y - anchor_y)
+
+        # Send move update to server (one message for the whole group),
+        # at most every MOVE_SEND_INTERVAL; others interpolate in between
+        self.pending_move = (self.selected_piece_id, new_x, new_y)
+        self._flush_pending_move()
+
+    def release(self):
+        """
+        Drop the dragged group, predicting the server's snap locally so the
+        drop looks instant. The server applies the authoritative snap,
+        merges and win detection on release.
+        """
+        if not self.is_dragging:
+            return
+        piece_id = self.selected_piece_id
+
+        dx, dy = self._find_snap_offset()
+        if (dx, dy) != (0, 0):
+            self._move_drag_group(dx, dy)
+            print(f"Piece {piece_id} snapped into place!")
+
+        # Release the group (also updates network manager's local tracking);
+        # the release carries the final position, so a pending move is dropped
+        x, y = self.piece_positions[piece_id]
+        self.pending_move = None
+        self.network_manager.release_group(piece_id, {"x": x, "y": y})
+
+        self.is_dragging = False
+        self.selected_piece_id = None
+        self.drag_group_ids = set()
+
+    def _move_drag_group(self, dx, dy):
+        for piece_id in self.drag_group_ids:
+            x, y = self.piece_positions[piece_id]
+            self._set_position(piece_id, x + dx, y + dy)
+
+    def _set_position(self, piece_id, x, y):
+        """Move a piece, keeping board_eval's coordinate arrays in step."""
+        self.piece_positions[piece_id] = (x, y)
+        self.board_eval.set_position(self.piece_numbers[piece_id], x, y)
+
+    def _bring_to_front(self, piece_ids):
+        """Move the given pieces to the end of the draw order, keeping their relative order."""
+        self.piece_order = ([piece_id for piece_id in self.piece_order if piece_id not in piece_ids] +
+                            [piece_id for piece_id in self.piece_order if piece_id in piece_ids])
+        self._rebuild_piece_index()
+
+    def _flush_pending_move(self):
+        """Send the latest drag position if the send interval has passed."""
+        if self.pending_move and time.perf_counter() - self.last_move_sent >= MOVE_SEND_INTERVAL:
+            self._send_group_move(*self.pending_move)
+
+    def _send_group_move(self, piece_id, x, y, reliable=False):
+        """Send the dragged group's anchor position (also renews the lock lease)."""
+        self.network_manager.move_group(piece_id, {"x": x, "y": y}, reliable=reliable)
+        self.last_move_sent = time.perf_counter()
+        self.pending_move = None
+
+    # -------------------------------------------------------------------------
+    # Snapping
+
+    def _find_snap_offset(self):
+        """
+        Offset that snaps the dragged group into place: to the board if any
+        member is near its correct position, otherwise against a neighbour.
+        """
+        for member_id in self.drag_group_ids:
+            position = self.piece_positions[member_id]
+            correct_pos = self.get_correct_position(member_id)
+            if self._distance(position, correct_pos) <= self.snap_tolerance:
+                return (correct_pos[0] - position[0], correct_pos[1] - position[1])
+
+        for member_id, neighbour_id, expected_pos in self._iter_drag_group_neighbours():
+            position = self.piece_positions[member_id]
+            if self._distance(position, expected_pos) <= self.snap_tolerance:
+                return (expected_pos[0] - position[0], expected_pos[1] - position[1])
+
+        return (0, 0)
+
+    def _iter_drag_group_neighbours(self):
+        """
+        Yield (member_id, neighbour_id, expected_pos) for every grid neighbour
+        of the dragged group that is not part of it, where expected_pos is
+        where the member would sit if it were joined to that neighbour.
+        """
+        cols, rows = self.board['cols'], self.board['rows']
+        for member_id in self.drag_group_ids:
+            row, col = divmod(int(member_id.rsplit('_', 1)[1]), cols)
+            for d_col, d_row in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                n_col, n_row = col + d_col, row + d_row
+                if not (0 <= n_col < cols and 0 <= n_row < rows):
+                    continue
+                neighbour_id = f'piece_{n_row * cols + n_col}'
+                if neighbour_id in self.drag_group_ids:
+                    continue
+                if self.network_manager.is_piece_locked_by_others(neighbour_id):
+                    continue
+                neighbour_x, neighbour_y = self.piece_positions[neighbour_id]
+                expected_pos = (neighbour_x - d_col * self.piece_width,
+                                neighbour_y - d_row * self.piece_height)
+                yield member_id, neighbour_id, expected_pos
+
+    def _distance(self, pos_a, pos_b):
+        return ((pos_a[0] - pos_b[0]) ** 2 + (pos_a[1] - pos_b[1]) ** 2) ** 0.5
+
+    # -------------------------------------------------------------------------
+    # Queries
+
+    def get_piece_at(self, world_pos):
+        """Return the topmost piece_id at world_pos, or None."""
+        x, y = world_pos
+        for piece_id in reversed(self.piece_order):
+            piece_x, piece_y = self.piece_positions[piece_id]
+            if piece_x <= x < piece_x + self.piece_width and piece_y <= y < piece_y + self.piece_height:
+                return piece_id
+        return None
+
+    def iter_visible_pieces(self, left, top, width, height):
+        """
+        Yield (piece_id, x, y) in draw order for the pieces that intersect
+        the given world rectangle.
+        """
+        right = left + width
+        bottom = top + height
+        for piece_id in self.piece_order:
+            x, y = self.piece_positions[piece_id]
+            if x < right and left < x + self.piece_width and y < bottom and top < y + self.piece_height:
+                yield piece_id, x, y
+
+    def get_correct_position(self, piece_id):
+        """Get the board position a piece belongs at."""
+        row, col = divmod(int(piece_id.rsplit('_', 1)[1]), self.board['cols'])
+        return (self.board['x'] + col * self.piece_width, self.board['y'] + row * self.piece_height)
+
+    def is_piece_correctly_placed(self, piece_id):
+        """Check if a specific piece is within snap tolerance of its board position."""
+        number = self.piece_numbers.get(piece_id)
+        if number is None:
+            return False
+        return self.board_eval.is_correct(number)
+
+    def get_correct_count(self):
+        return self.board_eval.get_correct_count()
+
+    def get_misplaced_pieces(self):
+        """Return the set of piece_ids not within snap tolerance of their board position."""
+        return {f'piece_{number}' for number in self.board_eval.get_misplaced()}
+
+    def get_distance_to_target(self, piece_id):
+        """Distance from a piece to its board position."""
+        return float(self.board_eval.get_distances()[self.piece_numbers[piece_id]])
+
+    def get_piece_count(self):
+        return len(self.piece_order)
@@ -0,0 +1,109 @@
+import collections
+import csv
+import json
+import time
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import FRAME_PROFILE_WINDOW, FRAME_LOG_MAX_FRAMES
+
+PROFILE_PERCENTILES = (50, 95, 99)
+
+class FrameProfiler:
+    def __init__(self, stages, window=FRAME_PROFILE_WINDOW, log_frames=FRAME_LOG_MAX_FRAMES):
+        """
+        Times the stages of every frame. A frame is start_frame(), then
+        mark(stage) after each stage (the time since the previous mark is
+        charged to it), then end_frame(). The last `window` frames give the
+        rolling percentiles; the last `log_frames` frames are kept for the
+        dump written with write_log().
+        """
+        self.stages = list(stages)
+        self.window = window
+        self.samples = {stage: collections.deque(maxlen=window) for stage in self.stages + ['frame']}
+        self.frame_log = collections.deque(maxlen=log_frames)
+        self.frame_count = 0
+        self.start_time = time.perf_counter()
+
+        # Current frame
+        self.frame_start = None
+        self.last_mark = None
+        self.current = {}
+
+    def start_frame(self):
+        now = time.perf_counter()
+        self.frame_start = now
+        self.last_mark = now
+        self.current = dict.fromkeys(self.stages, 0.0)
+
+    def mark(self, stage):
+        """
+        Charge the time since the previous mark (or the frame start) to stage.
+        """
+        now = time.perf_counter()
+        self.current[stage] += now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        frame_time = time.perf_counter() - self.frame_start
+        for stage, seconds in self.current.items():
+            self.samples[stage].append(seconds)
+        self.samples['frame'].append(frame_time)
+        self.frame_log.append((self.frame_start - self.start_time, frame_time,
+                               tuple(self.current[stage] for stage in self.stages)))
+        self.frame_count += 1
+        self.frame_start = None
+
+    # -------------------------------------------------------------------------
+    # Statistics
+
+    def get_summary(self):
+        """
+        Return {stage: {'p50': ms, 'p95': ms, 'p99': ms, 'max': ms}} over the
+        rolling window, with the whole frame under 'frame'.
+        """
+        summary = {}
+        for stage, samples in self.samples.items():
+            ordered = sorted(samples)
+            if not ordered:
+                continue
+            stats = {f'p{p}': ordered[min(len(ordered) - 1, len(ordered) * p // 100)] * 1000
+                     for p in PROFILE_PERCENTILES}
+            stats['max'] = ordered[-1] * 1000
+            summary[stage] = stats
+        return summary
+
+    def get_fps(self):
+        """Average frames per second over the rolling window."""
+        frames = self.samples['frame']
+        total = sum(frames)
+        return len(frames) / total if total else 0.0
+
+    # -------------------------------------------------------------------------
+    # Export
+
+    def write_log(self, path):
+        """
+        Write the logged frames to path: CSV if it ends in .csv, otherwise
+        JSON lines (one object per frame, then one with the summary).
+        Times are in milliseconds; 't' is when the frame started.
+        """
+        with open(path, 'w', newline='') as f:
+            if path.endswith('.csv'):
+                writer = csv.writer(f)
+                writer.writerow(['t', 'frame'] + self.stages)
+                for started, frame_time, stage_times in self.frame_log:
+                    writer.writerow([f'{started * 1000:.3f}', f'{frame_time * 1000:.3f}'] +
+                                    [f'{seconds * 1000:.3f}' for seconds in stage_times])
+                return
+
+            for started, frame_time, stage_times in self.frame_log:
+                record = {'t': round(started * 1000, 3), 'frame': round(frame_time * 1000, 3)}
+                record.update({stage: round(seconds * 1000, 3) for stage, seconds in zip(self.stages, stage_times)})
+                f.write(json.dumps(record) + '\n')
+            summary = {stage: {name: round(ms, 3) for name, ms in stats.items()}
+                       for stage, stats in self.get_summary().items()}
+            f.write(json.dumps({'summary': summary, 'frames': self.frame_count}) + '\n')
@@ -1,21 +1,38 @@
 import pygame
 import sys
 import os
+import time
 
-from puzzle import Puzzle
+from puzzle import Puzzle, LOAD_STAGE_FULL, LOAD_STAGE_FAILED
+from camera import Camera, PieceSurfaceCache
+from engine import ClientEngine
+from frame_profiler import FrameProfiler
+from hud import Hud
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 from protocol import *
 from constants import *
 
+# Stages of a frame, in order, as timed by the frame profiler
+FRAME_STAGES = ['loading', 'network', 'events', 'ui', 'board', 'pieces', 'overlay', 'flip', 'idle']
+
 class GameGUI:
-    def __init__(self, network_manager, image_url, piece_positions, difficulty='easy'):
+    def __init__(self, network_manager, image_url, piece_positions, difficulty='easy', frame_log_path=None):
+        """
+        Pygame front end: turns input events into ClientEngine calls and
+        draws the engine's state. All game logic lives in the engine.
+        If frame_log_path is given, per-frame stage timings are written
+        there on exit (.csv or JSON lines).
+        """
         pygame.init()
         self.screen = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
         pygame.display.set_caption(f"Multiplayer Jigsaw Puzzle - {difficulty.title()}")
         self.clock = pygame.time.Clock()
         self.font = pygame.font.Font(None, 36)
         self.small_font = pygame.font.Font(None, 24)
+
+        # Rendered text and overlays, rebuilt only when what they show changes
+        self.hud = Hud()
     
         # Network manager
         self.network_manager = network_manager
@@ -24,307 +41,152 @@ class GameGUI:
         self.difficulty = difficulty
         self.difficulty_settings = DIFFICULTY_SETTINGS[difficulty]
         
-        # Game state
-        self.selected_piece_index = None
-        self.is_dragging = False
-        self.mouse_offset_x = 0
-        self.mouse_offset_y = 0
-        self.game_won = False
-        self.snap_tolerance = 30
-        
-        # Create puzzle with difficulty
-        self.puzzle = Puzzle(image_url, difficulty)
-        self.pieces = self.puzzle.get_pieces()
-        self.piece_rects = []
-        
-        # Calculate board dimensions using ACTUAL puzzle piece sizes
-        if self.pieces:
-            grid_cols, grid_rows = self.puzzle.get_grid_dimensions()
-            piece_width, piece_height = self.puzzle.get_piece_size()
-            
-            # Use the actual puzzle dimensions
-            board_width = piece_width * grid_cols
-            board_height = piece_height * grid_rows
-            
-            # Center the board on screen
-            board_x = (WINDOW_WIDTH - board_width) // 2
-            board_y = (WINDOW_HEIGHT - board_height) // 2
-            
-            self.board_rect = pygame.Rect(board_x, board_y, board_width, board_height)
-            
-            # Use the ACTUAL piece sizes from puzzle
-            self.piece_display_width = piece_width
-            self.piece_display_height = piece_height
-            
-            # Set piece positions from server data
-            self._set_piece_positions(piece_positions)
-            
-            # print(f"Board size: {board_width}x{board_height}")
-            # print(f"Board position: ({board_x}, {board_y})")
-            # print(f"Piece display size: {self.piece_display_width}x{self.piece_display_height}")
-            # print(f"Total pieces: {len(self.pieces)}")
-            # print(f"Difficulty: {difficulty}")
-        else:
-            print("Failed to load puzzle pieces. Game cannot start.")
-            self.board_rect = pygame.Rect(0, 0, 0, 0)
-            self.piece_display_width = 0
-            self.piece_display_height = 0
-        
-        # Track piece positions for win condition
-        self.piece_positions = {}
-        for i, piece in enumerate(self.pieces):
-            if i < len(self.piece_rects):
-                pos = self.piece_rects[i].topleft
-                self.piece_positions[piece['id']] = pos
-
-    def _set_piece_positions(self, server_positions):
-        """
-        Set piece positions from server data - pieces can be anywhere on screen.
-        """
-        self.piece_rects = []
-        
-        if server_positions:
-            # print(f"Using server-provided piece positions for {len(server_positions)} pieces")
-            
-            # Position pieces according to server data
-            for piece_data in self.pieces:
-                piece_id = piece_data['id']
-                piece_image = piece_data['image']
-                
-                # Get position from server data
-                if piece_id in server_positions:
-                    server_pos = server_positions[piece_id]
-                    x, y = server_pos['x'], server_pos['y']
-                else:
-                    # Fallback position if server data missing
-                    print(f"Warning: No server position for piece {piece_id}, using fallback")
-                    x, y = 50, 50
-                
-                self.piece_rects.append(piece_image.get_rect(topleft=(x, y)))
-        else:
-            print("No server positions provided, using fallback scatter")
-            self._fallback_scatter_pieces()
+        # Game state (piece positions, dragging, snapping, win detection)
+        self.engine = ClientEngine(network_manager, piece_positions)
+        self.board_rect = pygame.Rect(self.engine.board_rect)
+
+        # Camera (world <-> screen) and per-zoom-level piece surfaces
+        self.camera = Camera(WINDOW_WIDTH, WINDOW_HEIGHT)
+        self.piece_surfaces = PieceSurfaceCache()
+        self.is_panning = False
+        
+        # Create puzzle with difficulty. Loading runs on a worker thread so the
+        # window is up (and the network keeps being drained) while it downloads.
+        self.load_start_time = time.perf_counter()
+        self.first_frame_reported = False
+        self.full_quality_reported = False
 
-    def _fallback_scatter_pieces(self):
+        # The server decides the board layout; the image is fitted to it
+        board_size = (self.board_rect.width, self.board_rect.height)
+        self.puzzle = Puzzle(image_url, difficulty, resize_to=board_size, load_async=True)
+        self.puzzle_ready = False
+
+        # Per-stage frame timings; F3 toggles the overlay
+        self.profiler = FrameProfiler(FRAME_STAGES)
+        self.frame_log_path = frame_log_path
+        self.show_profiler = False
+        self.profiler_font = pygame.font.SysFont('monospace', 14)
+        self.profiler_lines = []
+        self.profiler_lines_time = 0.0
+
+    def _poll_puzzle_loading(self):
         """
-        Fallback method for positioning pieces anywhere on the screen.
+        Start drawing (and accepting input) once the loader thread has
+        published pieces. Placeholder pieces are enough to start playing;
+        the full quality images are swapped into the same piece dicts later on.
         """
-        self.piece_rects = []
-        
-        for i, piece_data in enumerate(self.pieces):
-            piece_image = piece_data['image']
-            
-            # Allow pieces to be scattered anywhere on screen (with margins) 
-            # # Leave space for title
-            max_x = max(10, WINDOW_WIDTH - piece_image.get_width() - 10)
-            max_y = max(80, WINDOW_HEIGHT - piece_image.get_height() - 10) 
-            
-            # Use piece index for basic positioning
-            x = 10 + (i * 25) % max_x
-            y = 80 + (i * 35) % max_y
-            
-            self.piece_rects.append(piece_image.get_rect(topleft=(x, y)))
+        stage = self.puzzle.get_load_stage()
 
-    def update_piece_positions(self, server_positions):
+        if not self.puzzle_ready and self.puzzle.is_loaded():
+            self.puzzle_ready = True
+
+        if stage == LOAD_STAGE_FULL and not self.full_quality_reported:
+            self.full_quality_reported = True
+            elapsed_ms = (time.perf_counter() - self.load_start_time) * 1000
+            print(f"[PERF] Full quality pieces ready after {elapsed_ms:.0f} ms")
+        elif stage == LOAD_STAGE_FAILED and not self.full_quality_reported:
+            self.full_quality_reported = True
+            print("Failed to load puzzle pieces. Game cannot start.")
+
+    def _report_first_interactive_frame(self):
         """
-        Update all piece positions from server data.
-        Called when joining a game or receiving position updates.
+        Print time from GUI creation to the first frame with playable pieces.
         """
-        if not server_positions:
-            return
-            
-        print(f"Updating piece positions from server data")
-        
-        for i, piece in enumerate(self.pieces):
-            piece_id = piece['id']
-            if piece_id in server_positions and i < len(self.piece_rects):
-                server_pos = server_positions[piece_id]
-                self.piece_rects[i].x = server_pos['x']
-                self.piece_rects[i].y = server_pos['y']
-                self.piece_positions[piece_id] = (server_pos['x'], server_pos['y'])
+        self.first_frame_reported = True
+        elapsed_ms = (time.perf_counter() - self.load_start_time) * 1000
+        print(f"[PERF] First interactive frame after {elapsed_ms:.0f} ms ({self.puzzle.get_load_stage()} pieces)")
 
     def run(self):
         """The main game loop."""
         running = True
+        profiler = self.profiler
         while running:
+            profiler.start_frame()
             mouse_pos = pygame.mouse.get_pos()
+
+            # Pick up pieces published by the loader thread
+            self._poll_puzzle_loading()
+            profiler.mark('loading')
             
-            # Update piece positions from network manager each frame
-            self._sync_with_network_manager()
+            # The frame's room operations (lock, moves, release, viewport) go
+            # out together: several in one BATCH, a lone one on its own
+            with self.network_manager.batch():
+                # Sync with the network manager and send throttled moves
+                self.engine.update()
+                profiler.mark('network')
             
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
-                    self.network_manager.leave_game()
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
 
-                elif event.type == pygame.MOUSEBUTTONDOWN:
-                    if event.button == 1 and not self.game_won:
-                        self._handle_mouse_down(mouse_pos)
+                    elif event.type == pygame.MOUSEBUTTONDOWN:
+                        if event.button == 1 and self.puzzle_ready:
+                            self.engine.press(self.camera.screen_to_world(*mouse_pos))
+                        elif event.button in (2, 3):
+                            self.is_panning = True
 
-                elif event.type == pygame.MOUSEBUTTONUP:
-                    if event.button == 1 and self.is_dragging:
-                        self._handle_mouse_up()
+                    elif event.type == pygame.MOUSEBUTTONUP:
+                        if event.button == 1:
+                            self.engine.release()
+                        elif event.button in (2, 3):
+                            self.is_panning = False
 
-                elif event.type == pygame.MOUSEMOTION:
-                    if self.is_dragging and self.selected_piece_index is not None:
-                        self._handle_mouse_move(mouse_pos)
+                    elif event.type == pygame.MOUSEMOTION:
+                        if self.is_panning:
+                            self.camera.pan(*event.rel)
+                        self.engine.drag_to(self.camera.screen_to_world(*mouse_pos))
+
+                    elif event.type == pygame.MOUSEWHEEL:
+                        self.camera.zoom_at(mouse_pos, event.y)
+                        self.engine.drag_to(self.camera.screen_to_world(*mouse_pos))
+
+                    elif event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_HOME:
+                            self.camera.reset()
+                        elif event.key == pygame.K_F3:
+                            self.show_profiler = not self.show_profiler
+                profiler.mark('events')
+
+                self.engine.report_viewport(*self.camera.get_visible_world_rect())
+            profiler.mark('network')
+
+            if not running:
+                self.network_manager.leave_game()
 
             self._draw_game()
+            if self.show_profiler:
+                self._draw_profiler_overlay()
+            profiler.mark('overlay')
+
             pygame.display.flip()
+            profiler.mark('flip')
+
+            if self.puzzle_ready and not self.first_frame_reported:
+                self._report_first_interactive_frame()
+
             self.clock.tick(60)
+            profiler.mark('idle')
+            profiler.end_frame()
 
+        self._report_frame_profile()
         pygame.quit()
 
-    def _sync_with_network_manager(self):
-        """Sync piece positions and lock states with network manager."""
-        # Check if puzzle was completed by another player
-        if not self.game_won and self.network_manager.is_puzzle_completed():
-            self.game_won = True
-            solver_info = self.network_manager.get_puzzle_solver()
-            if solver_info:
-                print(f"PUZZLE SOLVED by {solver_info['ip']}:{solver_info['port']}!")
-            else:
-                print("PUZZLE SOLVED by another player!")
-        
-        # Get current positions from network manager
-        network_positions = self.network_manager.get_current_piece_positions()
-        
-        # Update local positions for pieces that aren't being dragged by us
-        for i, piece in enumerate(self.pieces):
-            piece_id = piece['id']
-            
-            # Skip if we're dragging this piece
-            if self.is_dragging and i == self.selected_piece_index:
-                continue
-                
-            # Update position from network manager if available
-            if piece_id in network_positions and i < len(self.piece_rects):
-                network_pos = network_positions[piece_id]
-                current_pos = (self.piece_rects[i].x, self.piece_rects[i].y)
-                network_tuple = (network_pos['x'], network_pos['y'])
-                
-                # Only update if position changed
-                if current_pos != network_tuple:
-                    self.piece_rects[i].x = network_pos['x']
-                    self.piece_rects[i].y = network_pos['y']
-                    self.piece_positions[piece_id] = network_tuple
-
-    def _handle_mouse_down(self, mouse_pos):
-        """Handle mouse button down event."""
-        # Check pieces from front to back (reverse order)
-        for i in range(len(self.piece_rects) - 1, -1, -1):
-            if self.piece_rects[i].collidepoint(mouse_pos):
-                piece_id = self.pieces[i]['id']
-                
-                # Check if piece is locked by another player using network manager
-                if self.network_manager.is_piece_locked_by_others(piece_id):
-                    locker_info = self.network_manager.get_piece_locker_info(piece_id)
-                    print(f"Piece {piece_id} is locked by another player: {locker_info}")
-                    return
-                
-                self.is_dragging = True
-                self.selected_piece_index = i
-                
-                self.network_manager.lock_object(piece_id)
-                
-                # Calculate mouse offset for smooth dragging
-                self.mouse_offset_x = mouse_pos[0] - self.piece_rects[i].x
-                self.mouse_offset_y = mouse_pos[1] - self.piece_rects[i].y
-                
-                # Move selected piece to front for rendering
-                selected_piece = self.pieces.pop(i)
-                selected_rect = self.piece_rects.pop(i)
-                self.pieces.append(selected_piece)
-                self.piece_rects.append(selected_rect)
-                self.selected_piece_index = len(self.pieces) - 1
-                break
-
-    def _handle_mouse_up(self):
-        """Handle mouse button up event."""
-        if self.selected_piece_index is None:
-            return
-            
-        piece_id = self.pieces[self.selected_piece_index]['id']
-        piece_rect = self.piece_rects[self.selected_piece_index]
-        
-        # Check if piece should snap to correct position
-        correct_pos = self._get_correct_screen_position(piece_id)
-        if correct_pos:
-            distance = ((piece_rect.x - correct_pos[0]) ** 2 + 
-                       (piece_rect.y - correct_pos[1]) ** 2) ** 0.5
-            
-            if distance <= self.snap_tolerance:
-                # Snap to correct position
-                piece_rect.x, piece_rect.y = correct_pos
-                print(f"Piece {piece_id} snapped to correct position!")
-        
-        # Update piece position tracking
-        final_pos = piece_rect.topleft
-        self.piece_positions[piece_id] = final_pos
-        
-        # Update network manager's local position tracking
-        self.network_manager.update_local_piece_position(piece_id, {"x": final_pos[0], "y": final_pos[1]})
-        
-        self.network_manager.release_object(piece_id, {"x": final_pos[0], "y": final_pos[1]})
-        
-        # Check win condition
-        if self._check_win_condition():
-            self.game_won = True
-            print("PUZZLE SOLVED! YOU WIN!")
-            self.network_manager.puzzle_solved()
-        
-        self.is_dragging = False
-        self.selected_piece_index = None
-
-    def _handle_mouse_move(self, mouse_pos):
-        """Handle mouse movement during dragging."""
-        new_x = mouse_pos[0] - self.mouse_offset_x
-        new_y = mouse_pos[1] - self.mouse_offset_y
-        
-        # Keep piece on screen
-        piece_rect = self.piece_rects[self.selected_piece_index]
-        new_x = max(0, min(new_x, WINDOW_WIDTH - piece_rect.width))
-        new_y = max(0, min(new_y, WINDOW_HEIGHT - piece_rect.height))
-        
-        piece_rect.x = new_x
-        piece_rect.y = new_y
-        
-        # Send move update to server
-        piece_id = self.pieces[self.selected_piece_index]['id']
-        self.network_manager.move_locked_object(piece_id, {"x": new_x, "y": new_y})
-
-    def _get_correct_screen_position(self, piece_id):
-        """Get the correct screen position for a piece using actual piece dimensions."""
-        piece = self.puzzle.get_piece_by_id(piece_id)
-        if not piece:
-            return None
-        
-        # Calculate position using actual piece sizes
-        correct_x = self.board_rect.x + (piece['correct_col'] * self.piece_display_width)
-        correct_y = self.board_rect.y + (piece['correct_row'] * self.piece_display_height)
-        
-        return (correct_x, correct_y)
-
-    def _check_win_condition(self):
-        """Check if all pieces are in correct positions."""
-        for piece in self.pieces:
-            piece_id = piece['id']
-            if piece_id not in self.piece_positions:
-                return False
-            
-            current_pos = self.piece_positions[piece_id]
-            correct_pos = self._get_correct_screen_position(piece_id)
-            
-            if not correct_pos:
-                return False
-            
-            distance = ((current_pos[0] - correct_pos[0]) ** 2 + 
-                       (current_pos[1] - correct_pos[1]) ** 2) ** 0.5
-            
-            if distance > self.snap_tolerance:
-                return False
-        
-        return True
+    def _report_frame_profile(self):
+        """
+        Print the frame time percentiles of the last frames and write the
+        frame log if one was requested.
+        """
+        summary = self.profiler.get_summary()
+        if 'frame' in summary:
+            frame = summary['frame']
+            print(f"[PERF] Frame time p50 {frame['p50']:.1f} ms, p99 {frame['p99']:.1f} ms, "
+                  f"max {frame['max']:.1f} ms over the last {len(self.profiler.samples['frame'])} frames")
+        if self.frame_log_path:
+            try:
+                self.profiler.write_log(self.frame_log_path)
+                print(f"[PERF] Frame log written to {self.frame_log_path}")
+            except OSError as e:
+                print(f"Failed to write frame log: {e}")
 
     def _draw_game(self):
         """Renders the entire game state."""
@@ -332,145 +194,199 @@ class GameGUI:
         
         # Draw UI elements
         self._draw_ui()
+
+        # Pieces are still being downloaded / decoded
+        if not self.puzzle_ready:
+            self._draw_loading_message()
+            self.profiler.mark('ui')
+            return
+        self.profiler.mark('ui')
         
         # Draw puzzle board
         self._draw_board()
+        self.profiler.mark('board')
         
         # Draw pieces
         self._draw_pieces()
+        self.profiler.mark('pieces')
         
         # Draw win message if game is won
-        if self.game_won:
+        if self.engine.game_won:
             self._draw_win_message()
 
     def _draw_ui(self):
         """Draw UI elements with centered title."""
+        hud = self.hud
+        network_manager = self.network_manager
+
         # Centered title at the top
-        title_text = self.font.render(f"Multiplayer Jigsaw Puzzle", True, COLOR_WHITE)
-        title_rect = title_text.get_rect(center=(WINDOW_WIDTH // 2, 25))
-        self.screen.blit(title_text, title_rect)
-        
+        hud.draw_label(self.screen, 'title', "Multiplayer Jigsaw Puzzle", self.font, COLOR_WHITE,
+                       (WINDOW_WIDTH // 2, 25), 'center')
+
         # Game info in top-left corner
-        game_id_text = f"Game: {self.network_manager.game_id or 'N/A'}"
-        game_id_surface = self.small_font.render(game_id_text, True, COLOR_GREY)
-        self.screen.blit(game_id_surface, (10, 10))
-        
-        game_name_text = f"Room: {self.network_manager.game_name or 'N/A'}"
-        game_name_surface = self.small_font.render(game_name_text, True, COLOR_GREY)
-        self.screen.blit(game_name_surface, (10, 30))
-        
-        players_text = f"Players: {self.network_manager.current_players}/{self.network_manager.max_players}"
-        players_surface = self.small_font.render(players_text, True, COLOR_GREY)
-        self.screen.blit(players_surface, (10, 50))
-        
+        hud.draw_label(self.screen, 'game_id', network_manager.game_id, self.small_font, COLOR_GREY,
+                       (10, 10), format=_format_game_id)
+        hud.draw_label(self.screen, 'game_name', network_manager.game_name, self.small_font, COLOR_GREY,
+                       (10, 30), format=_format_game_name)
+        players = (network_manager.current_players, network_manager.max_players,
+                   network_manager.room_closed, network_manager.is_spectator)
+        hud.draw_label(self.screen, 'players', players, self.small_font, COLOR_GREY, (10, 50),
+                       format=_format_players)
+
         # Host info
-        if hasattr(self.network_manager, 'host_info') and self.network_manager.host_info:
-            host_text = f"Host: {self.network_manager.host_info['ip']}:{self.network_manager.host_info['port']}"
-        else:
-            host_text = "Host: N/A"
-        host_surface = self.small_font.render(host_text, True, COLOR_GREY)
-        self.screen.blit(host_surface, (10, 70))
-        
+        host_info = getattr(network_manager, 'host_info', None)
+        host = (host_info['ip'], host_info['port']) if host_info else None
+        hud.draw_label(self.screen, 'host', host, self.small_font, COLOR_GREY, (10, 70),
+                       format=_format_host)
+
         # Puzzle state and difficulty in top-right corner
-        correct_pieces = sum(1 for piece in self.pieces if self._is_piece_correctly_placed(piece['id']))
-        total_pieces_count = len(self.pieces)
-        completion_percent = int((correct_pieces / total_pieces_count) * 100) if total_pieces_count > 0 else 0
-        
-        correct_text = f"Correct: {correct_pieces}/{total_pieces_count}"
-        correct_surface = self.small_font.render(correct_text, True, COLOR_GREY)
-        correct_rect = correct_surface.get_rect(topright=(WINDOW_WIDTH - 10, 10))
-        self.screen.blit(correct_surface, correct_rect)
-        
-        progress_text = f"Progress: {completion_percent}%"
-        progress_surface = self.small_font.render(progress_text, True, COLOR_GREY)
-        progress_rect = progress_surface.get_rect(topright=(WINDOW_WIDTH - 10, 30))
-        self.screen.blit(progress_surface, progress_rect)
-        
-        difficulty_text = f"Difficulty: {self.difficulty.title()}"
-        difficulty_surface = self.small_font.render(difficulty_text, True, COLOR_GREY)
-        difficulty_rect = difficulty_surface.get_rect(topright=(WINDOW_WIDTH - 10, 50))
-        self.screen.blit(difficulty_surface, difficulty_rect)
+        progress = (self.engine.get_correct_count(), self.engine.get_piece_count())
+        hud.draw_label(self.screen, 'correct', progress, self.small_font, COLOR_GREY,
+                       (WINDOW_WIDTH - 10, 10), 'topright', format=_format_correct)
+        hud.draw_label(self.screen, 'progress', progress, self.small_font, COLOR_GREY,
+                       (WINDOW_WIDTH - 10, 30), 'topright', format=_format_progress)
+        hud.draw_label(self.screen, 'difficulty', self.difficulty, self.small_font, COLOR_GREY,
+                       (WINDOW_WIDTH - 10, 50), 'topright', format=_format_difficulty)
 
     def _draw_board(self):
         """Draw the puzzle board with grid lines using actual dimensions."""
+        board_rect = self.camera.world_rect_to_screen(self.board_rect)
+
         # Draw board background
-        pygame.draw.rect(self.screen, COLOR_BOARD_BG, self.board_rect)
-        pygame.draw.rect(self.screen, COLOR_WHITE, self.board_rect, 2)
+        pygame.draw.rect(self.screen, COLOR_BOARD_BG, board_rect)
+        pygame.draw.rect(self.screen, COLOR_WHITE, board_rect, 2)
         
         # Draw grid lines using actual piece dimensions
         grid_cols, grid_rows = self.puzzle.get_grid_dimensions()
         
         # Vertical lines
         for i in range(grid_cols + 1):
-            x = self.board_rect.x + i * self.piece_display_width
-            start_pos = (x, self.board_rect.y)
-            end_pos = (x, self.board_rect.y + self.board_rect.height)
+            x = self.board_rect.x + i * self.engine.piece_width
+            start_pos = self.camera.world_to_screen(x, self.board_rect.y)
+            end_pos = self.camera.world_to_screen(x, self.board_rect.y + self.board_rect.height)
             pygame.draw.line(self.screen, COLOR_GREY, start_pos, end_pos, 1)
         
         # Horizontal lines
         for i in range(grid_rows + 1):
-            y = self.board_rect.y + i * self.piece_display_height
-            start_pos = (self.board_rect.x, y)
-            end_pos = (self.board_rect.x + self.board_rect.width, y)
+            y = self.board_rect.y + i * self.engine.piece_height
+            start_pos = self.camera.world_to_screen(self.board_rect.x, y)
+            end_pos = self.camera.world_to_screen(self.board_rect.x + self.board_rect.width, y)
             pygame.draw.line(self.screen, COLOR_GREY, start_pos, end_pos, 1)
 
     def _draw_pieces(self):
-        """Draw all puzzle pieces."""
-        for i, piece_data in enumerate(self.pieces):
-            piece_rect = self.piece_rects[i]
-            piece_id = piece_data['id']
+        """Draw the puzzle pieces that intersect the viewport."""
+        visible_rect = self.camera.get_visible_world_rect()
+        zoom = self.camera.zoom
+        engine = self.engine
+        self.piece_surfaces.start_frame()
+
+        # Pieces outside the viewport are skipped by the engine
+        for piece_id, x, y in engine.iter_visible_pieces(*visible_rect):
+            piece_data = self.puzzle.get_piece_by_id(piece_id)
+            if not piece_data:
+                continue
+            screen_rect = self.camera.world_rect_to_screen(pygame.Rect(x, y, engine.piece_width, engine.piece_height))
             
             # Draw piece
-            self.screen.blit(piece_data['image'], piece_rect)
+            piece_image = self.piece_surfaces.get(piece_id, piece_data['image'], zoom, screen_rect.size)
+            self.screen.blit(piece_image, screen_rect)
             
-            # Draw border around selected piece (your own)
-            if i == self.selected_piece_index and self.is_dragging:
-                pygame.draw.rect(self.screen, COLOR_YELLOW, piece_rect, 3)
+            # Draw border around selected pieces (your own)
+            if engine.is_dragging and piece_id in engine.drag_group_ids:
+                pygame.draw.rect(self.screen, COLOR_YELLOW, screen_rect, 3)
             
             # Draw border around pieces locked by other players (using network manager)
             elif self.network_manager.is_piece_locked_by_others(piece_id):
-                pygame.draw.rect(self.screen, COLOR_ORANGE, piece_rect, 3)
+                pygame.draw.rect(self.screen, COLOR_ORANGE, screen_rect, 3)
             
             # Draw border around correctly placed pieces
-            elif self._is_piece_correctly_placed(piece_id):
-                pygame.draw.rect(self.screen, COLOR_GREEN, piece_rect, 2)
+            elif engine.is_piece_correctly_placed(piece_id):
+                pygame.draw.rect(self.screen, COLOR_GREEN, screen_rect, 2)
+
+    def _draw_profiler_overlay(self):
+        """Draw rolling per-stage frame time percentiles (toggled with F3)."""
+        # Rendering the text every frame would show up in the numbers
+        now = time.perf_counter()
+        if now - self.profiler_lines_time >= PROFILER_OVERLAY_REFRESH:
+            self.profiler_lines_time = now
+            summary = self.profiler.get_summary()
+            lines = [f"{self.profiler.get_fps():5.1f} fps    p50    p95    p99    max ms"]
+            for stage in FRAME_STAGES + ['frame']:
+                if stage in summary:
+                    stats = summary[stage]
+                    lines.append(f"{stage:<9} {stats['p50']:6.2f} {stats['p95']:6.2f} "
+                                 f"{stats['p99']:6.2f} {stats['max']:6.2f}")
+            self.profiler_lines = [self.profiler_font.render(line, True, COLOR_WHITE) for line in lines]
+
+        if not self.profiler_lines:
+            return
+        line_height = self.profiler_lines[0].get_height()
+        width = max(line.get_width() for line in self.profiler_lines) + 12
+        height = line_height * len(self.profiler_lines) + 12
+        top = WINDOW_HEIGHT - height - 10
+
+        self.screen.blit(self.hud.overlay((width, height), COLOR_BLACK, 180), (10, top))
+        for i, line in enumerate(self.profiler_lines):
+            self.screen.blit(line, (16, top + 6 + i * line_height))
+
+    def _draw_loading_message(self):
+        """Draw the loading message while the puzzle image is being prepared."""
+        if self.puzzle.get_load_stage() == LOAD_STAGE_FAILED:
+            loading_text = "Failed to load puzzle image"
+        else:
+            loading_text = "Loading puzzle..."
+
+        self.hud.draw_label(self.screen, 'loading', loading_text, self.font, COLOR_GREY,
+                            (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2), 'center')
 
-    def _is_piece_correctly_placed(self, piece_id):
-        """Check if a specific piece is correctly placed."""
-        if piece_id not in self.piece_positions:
-            return False
-        
-        current_pos = self.piece_positions[piece_id]
-        correct_pos = self._get_correct_screen_position(piece_id)
-        
-        if not correct_pos:
-            return False
-        
-        distance = ((current_pos[0] - correct_pos[0]) ** 2 + 
-                   (current_pos[1] - correct_pos[1]) ** 2) ** 0.5
-        
-        return distance <= self.snap_tolerance
-    
     def _draw_win_message(self):
         """Draw the win message overlay."""
         # Semi-transparent overlay
-        overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT))
-        overlay.set_alpha(128)
-        overlay.fill(COLOR_BLACK)
-        self.screen.blit(overlay, (0, 0))
+        self.screen.blit(self.hud.overlay((WINDOW_WIDTH, WINDOW_HEIGHT), COLOR_BLACK, 128), (0, 0))
         
         # Win message
-        win_text = self.font.render("PUZZLE COMPLETED!", True, COLOR_GREEN)
-        text_rect = win_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2))
-        self.screen.blit(win_text, text_rect)
+        self.hud.draw_label(self.screen, 'win', "PUZZLE COMPLETED!", self.font, COLOR_GREEN,
+                            (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2), 'center')
         
         # Show who solved it
         solver_info = self.network_manager.get_puzzle_solver()
-        if solver_info:
-            solver_text = f"Solved by: {solver_info['ip']}:{solver_info['port']}"
-        else:
-            solver_text = "Congratulations! You solved the puzzle!"
-        
-        sub_text = self.small_font.render(solver_text, True, COLOR_WHITE)
-        sub_rect = sub_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40))
-        self.screen.blit(sub_text, sub_rect)
\ No newline at end of file
+        solver = (solver_info['ip'], solver_info['port']) if solver_info else None
+        self.hud.draw_label(self.screen, 'solver', solver, self.small_font, COLOR_WHITE,
+                            (WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40), 'center', format=_format_solver)
+
+# -----------------------------------------------------------------------------
+# HUD text (module functions, so passing them as formats allocates nothing)
+
+def _format_game_id(game_id):
+    return f"Game: {game_id or 'N/A'}"
+
+def _format_game_name(game_name):
+    return f"Room: {game_name or 'N/A'}"
+
+def _format_players(players):
+    current_players, max_players, room_closed, is_spectator = players
+    players_text = f"Players: {current_players}/{max_players}"
+    if room_closed:
+        players_text += " (room closed)"
+    elif is_spectator:
+        players_text += " (spectating)"
+    return players_text
+
+def _format_host(host):
+    return f"Host: {host[0]}:{host[1]}" if host else "Host: N/A"
+
+def _format_correct(progress):
+    return f"Correct: {progress[0]}/{progress[1]}"
+
+def _format_progress(progress):
+    correct_pieces, total_pieces_count = progress
+    completion_percent = int((correct_pieces / total_pieces_count) * 100) if total_pieces_count > 0 else 0
+    return f"Progress: {completion_percent}%"
+
+def _format_difficulty(difficulty):
+    return f"Difficulty: {difficulty.title()}"
+
+def _format_solver(solver):
+    if solver:
+        return f"Solved by: {solver[0]}:{solver[1]}"
+    return "Congratulations! You solved the puzzle!"
@@ -0,0 +1,53 @@
+import pygame
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import HUD_MAX_OVERLAYS
+
+class Hud:
+    def __init__(self):
+        """
+        Caches the rendered surfaces of on-screen text and overlays. Every
+        label has a slot holding the value it shows, its style and the
+        surface rendered for them; drawing a label whose value and style are
+        unchanged reuses that surface (and its placement), so a frame where
+        nothing changes renders and allocates no surfaces. Overlays (filled,
+        semi-transparent surfaces) are built once per size and color.
+        """
+        self.labels = {}            # slot -> [value, font, color, surface, rect, position]
+        self.overlays = {}          # (size, color, alpha) -> Surface
+        self.renders = 0            # surfaces rendered or built, for profiling
+
+    def draw_label(self, screen, slot, value, font, color, position, anchor='topleft', format=None):
+        """
+        Blit the text for value, placed with its anchor ('topleft',
+        'center', ...) at position. format(value) gives the text (value
+        itself if no format) and is only called when value changes.
+        """
+        entry = self.labels.get(slot)
+        if entry is None or entry[0] != value or entry[1] is not font or entry[2] != color:
+            surface = font.render(value if format is None else format(value), True, color)
+            self.renders += 1
+            entry = [value, font, color, surface, surface.get_rect(**{anchor: position}), position]
+            self.labels[slot] = entry
+        elif entry[5] != position:
+            entry[4] = entry[3].get_rect(**{anchor: position})
+            entry[5] = position
+        screen.blit(entry[3], entry[4])
+
+    def overlay(self, size, color, alpha):
+        """
+        A surface of size filled with color, blitted at the given alpha.
+        """
+        key = (size, color, alpha)
+        surface = self.overlays.get(key)
+        if surface is None:
+            if len(self.overlays) >= HUD_MAX_OVERLAYS:
+                self.overlays.clear()
+            surface = pygame.Surface(size)
+            surface.set_alpha(alpha)
+            surface.fill(color)
+            self.renders += 1
+            self.overlays[key] = surface
+        return surface
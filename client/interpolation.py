@@ -0,0 +1,100 @@
+import sys
+import os
+import threading
+from collections import deque
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import INTERPOLATION_DELAY, MAX_EXTRAPOLATION
+
+MAX_SAMPLES = 32        # per track; at 20 updates/s this is well over the delay
+
+class _Track:
+    def __init__(self):
+        """
+        Position history of one remotely dragged piece. Sample times are
+        on the sender's clock; clock_offset maps them to ours and is the
+        smallest (receive - send) seen, i.e. the least delayed sample.
+        """
+        self.samples = deque(maxlen=MAX_SAMPLES)    # (sent_at, x, y)
+        self.clock_offset = None
+
+class MotionInterpolator:
+    def __init__(self, delay=INTERPOLATION_DELAY, max_extrapolation=MAX_EXTRAPOLATION):
+        """
+        Smooths remote drags. Each update is stored with its timestamp and
+        pieces are shown where they were `delay` seconds ago, interpolated
+        between the two surrounding updates. When updates are late the last
+        velocity is extrapolated for at most `max_extrapolation` seconds,
+        after which the piece holds still until the next update arrives.
+
+        Updates are added from the network thread and read by the GUI.
+        """
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.lock = threading.Lock()
+        self.tracks = {}        # piece_id -> _Track
+
+    def add_sample(self, piece_id, position, received_at, sent_at=None):
+        """
+        Record that piece_id was at position. sent_at is the sender's clock
+        when it sent the move (if known); without it the receive time is
+        used, so bursts of updates are not spread out.
+        """
+        if sent_at is None:
+            sent_at = received_at
+        with self.lock:
+            track = self.tracks.get(piece_id)
+            if track is None:
+                track = self.tracks[piece_id] = _Track()
+
+            # Drop updates that arrive after a newer one
+            if track.samples and sent_at <= track.samples[-1][0]:
+                return
+            offset = received_at - sent_at
+            if track.clock_offset is None or offset < track.clock_offset:
+                track.clock_offset = offset
+            track.samples.append((sent_at, position['x'], position['y']))
+
+    def remove(self, piece_id):
+        """
+        Stop smoothing piece_id (its drag ended); it is shown at its real position.
+        """
+        with self.lock:
+            self.tracks.pop(piece_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.tracks.clear()
+
+    def get_positions(self, now):
+        """
+        Return {piece_id: (x, y)} of the display position of every tracked
+        piece at local time now.
+        """
+        with self.lock:
+            return {piece_id: self._sample(track, now - self.delay - track.clock_offset)
+                    for piece_id, track in self.tracks.items() if track.samples}
+
+    def _sample(self, track, render_time):
+        samples = track.samples
+        last_time, last_x, last_y = samples[-1]
+
+        # Late: extrapolate from the last two updates, for a bounded time
+        if render_time >= last_time:
+            if len(samples) < 2:
+                return (last_x, last_y)
+            prev_time, prev_x, prev_y = samples[-2]
+            ahead = min(render_time - last_time, self.max_extrapolation) / (last_time - prev_time)
+            return (last_x + (last_x - prev_x) * ahead, last_y + (last_y - prev_y) * ahead)
+
+        # Find the two updates around render_time (the newest ones are the usual case)
+        for index in range(len(samples) - 2, -1, -1):
+            prev_time, prev_x, prev_y = samples[index]
+            if prev_time <= render_time:
+                next_time, next_x, next_y = samples[index + 1]
+                t = (render_time - prev_time) / (next_time - prev_time)
+                return (prev_x + (next_x - prev_x) * t, prev_y + (next_y - prev_y) * t)
+
+        # Before the first update of this drag
+        _, first_x, first_y = samples[0]
+        return (first_x, first_y)
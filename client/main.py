@@ -1,16 +1,104 @@
+import os
 import sys
 import time
 from game_gui import GameGUI
 from network_manager import NetworkManager
 from protocol import *
 
+def list_games(network, difficulty):
+    """
+    Print the first page of open, unsolved games.
+    """
+    network.list_games(difficulty=difficulty, not_full=True, not_solved=True, limit=50)
+
+    start_time = time.time()
+    while network.lobby_games is None:
+        time.sleep(0.1)
+        if time.time() - start_time > 10:
+            print("Error: No response from server. Timed out.")
+            return
+
+    if not network.lobby_games:
+        print("No open games found.")
+        return
+    for game in network.lobby_games:
+        print(f"  {game['game_id']}  {game['game_name']:<24} {game['difficulty']:<7} "
+              f"({game['current_players']}/{game['max_players']})")
+    if network.lobby_next_cursor is not None:
+        print("  ...more games available")
+
+def show_metrics(network):
+    """
+    Print the server's counters and gauges.
+    """
+    network.get_metrics()
+
+    start_time = time.time()
+    while network.server_metrics is None:
+        time.sleep(0.1)
+        if time.time() - start_time > 10:
+            print("Error: No response from server. Timed out.")
+            return
+
+    for name, value in sorted(network.server_metrics.items()):
+        print(f"  {name:<24} {value}")
+
+def admin_profile(network, action, mode, duration):
+    """
+    Start, stop or query a server profile and print the outcome. The admin
+    token is read from the JIGSAW_ADMIN_TOKEN environment variable.
+    """
+    token = os.environ.get('JIGSAW_ADMIN_TOKEN')
+    if not token:
+        print("Error: Set JIGSAW_ADMIN_TOKEN to the server's admin token.")
+        return
+    network.admin_profile(token, action, mode, duration)
+
+    start_time = time.time()
+    while network.admin_profile_status is None:
+        time.sleep(0.1)
+        if time.time() - start_time > 10:
+            print("Error: No response from server. Timed out.")
+            return
+
+    status = network.admin_profile_status
+    if not status.get('success'):
+        print(f"Error: {status.get('message')}")
+    if status.get('running'):
+        print(f"  '{status['mode']}' profile running, {status['remaining']:.0f} s left")
+    else:
+        print("  No profile running")
+    if status.get('path'):
+        print(f"  Last profile written to {status['path']} (on the server)")
+
 def main():
 
-    if len(sys.argv) < 5:
+    # Optional: send moves over a UDP channel (falls back to TCP)
+    use_udp = '--udp' in sys.argv
+    if use_udp:
+        sys.argv.remove('--udp')
+
+    # Optional: write per-frame stage timings here on exit (.csv or JSON lines)
+    frame_log_path = None
+    if '--frame-log' in sys.argv:
+        index = sys.argv.index('--frame-log')
+        if index + 1 >= len(sys.argv):
+            print("Error: --frame-log needs a file path.")
+            sys.exit(1)
+        frame_log_path = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+
+    if len(sys.argv) < 4:
         print("not gonna work try these:")
         print("  To host: python main.py <ip> <port> host <game_name> <max_players> <image_url> [difficulty]")
         print("  To join: python main.py <ip> <port> join <game_id>")
+        print("  To spectate: python main.py <ip> <port> spectate <game_id>")
+        print("  To list open games: python main.py <ip> <port> list [difficulty]")
+        print("  To show server metrics: python main.py <ip> <port> metrics")
+        print("  To profile the server: python main.py <ip> <port> profile <start|stop|status> [sample|timing] [seconds]")
         print("  Available difficulties: easy, medium, hard")
+        print("  Add --udp to host/join to send moves over UDP")
+        print("  Add --frame-log <path.csv|path.jsonl> to write frame timings on exit")
         sys.exit(1)
 
     print("\n")
@@ -30,6 +118,8 @@ def main():
     if not network.connect(server_ip, server_port):
         print(f"Failed to connect to server at {server_ip}:{server_port}")
         return
+    if use_udp:
+        network.open_udp()
 
     image_url = ""
 
@@ -56,17 +146,58 @@ def main():
         print(f"Attempting to host game '{game_name}' with difficulty '{difficulty}'...")
         network.host_game(game_name, max_players, image_url, difficulty)
 
+    # handle listing open games, then exit
+    elif command.lower() == 'list' and len(sys.argv) <= 5:
+        difficulty = sys.argv[4].lower() if len(sys.argv) == 5 else None
+        list_games(network, difficulty)
+        network.disconnect()
+        return
+
+    # handle printing server metrics, then exit
+    elif command.lower() == 'metrics' and len(sys.argv) == 4:
+        show_metrics(network)
+        network.disconnect()
+        return
+
+    # handle server profiling (admin only), then exit
+    elif command.lower() == 'profile' and 5 <= len(sys.argv) <= 7:
+        action = sys.argv[4].lower()
+        mode = sys.argv[5].lower() if len(sys.argv) >= 6 else None
+        duration = None
+        if len(sys.argv) == 7:
+            try:
+                duration = float(sys.argv[6])
+            except ValueError:
+                print("Error: Seconds must be a number.")
+                network.disconnect()
+                sys.exit(1)
+        admin_profile(network, action, mode, duration)
+        network.disconnect()
+        return
+
     # handle joining
     elif command.lower() == 'join' and len(sys.argv) == 5:
         game_id = sys.argv[4]
         print(f"Attempting to join game '{game_id}'...")
         network.join_game(game_id)
+
+    # handle spectating (read-only, takes no player slot)
+    elif command.lower() == 'spectate' and len(sys.argv) == 5:
+        game_id = sys.argv[4]
+        print(f"Attempting to spectate game '{game_id}'...")
+        network.spectate_game(game_id)
     else:
         print("Invalid arguments.")
         print("Usage:")
         print("  To host: python main.py <ip> <port> host <game_name> <max_players> <image_url> [difficulty]")
         print("  To join: python main.py <ip> <port> join <game_id>")
+        print("  To spectate: python main.py <ip> <port> spectate <game_id>")
+        print("  To list open games: python main.py <ip> <port> list [difficulty]")
+        print("  To show server metrics: python main.py <ip> <port> metrics")
+        print("  To profile the server: python main.py <ip> <port> profile <start|stop|status> [sample|timing] [seconds]")
         print("  Available difficulties: easy, medium, hard")
+        print("  Add --udp to host/join to send moves over UDP")
+        print("  Add --frame-log <path.csv|path.jsonl> to write frame timings on exit")
         network.disconnect()
         sys.exit(1)
 
@@ -92,7 +223,7 @@ def main():
 
     # launch game GUI (working dont touch)
     try:
-        gui = GameGUI(network, image_url, piece_positions, difficulty)
+        gui = GameGUI(network, image_url, piece_positions, difficulty, frame_log_path)
         gui.run()
     except Exception as e:
         print(f"An error occurred during the game: {e}")
@@ -1,11 +1,19 @@
+import contextlib
+import queue
 import socket
 import threading
+import itertools
+import struct
 import sys
 import os
 import json
+import time
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 from protocol import *
+from piece_groups import PieceGroups
+from constants import HEARTBEAT_INTERVAL, UDP_HELLO_INTERVAL, UDP_HELLO_ATTEMPTS, INTERPOLATION_DELAY
+from interpolation import MotionInterpolator
 
 class NetworkManager:
     def __init__(self):
@@ -14,9 +22,27 @@ class NetworkManager:
         Sets up socket, connection status, and message handling.
         """
         self.client_socket = None
+        self.outbox = None              # frames for the writer thread (see _write_loop)
+        self.writer_thread = None
         self.connected = False
         self.listening = False
         self.listen_thread = None
+        self.heartbeat_thread = None
+        self.heartbeat_stop = threading.Event()
+        self.latency_ms = None      # round trip of the last PING/PONG
+        self.compression = None     # algorithm the server agreed to (SET_COMPRESSION)
+        self.server_address = None
+        self.handler_lock = threading.Lock()    # the TCP and UDP listeners share the handlers
+
+        # Optional UDP channel for moves (see open_udp)
+        self.udp_socket = None
+        self.udp_token = None
+        self.udp_port = None            # overrides the port the server offers (e.g. a test relay)
+        self.udp_ready = False          # True once the server answered a UDP_HELLO
+        self.udp_thread = None
+        self.udp_send_seq = itertools.count(1)
+        self.udp_sent_seq = 0           # sequence number of the last move datagram sent
+        self.udp_last_seq = {}          # object_id -> sequence number of the last move applied
         
         # Game state
         self.game_id = None
@@ -26,27 +52,54 @@ class NetworkManager:
         self.image_url = None
         self.host_info = None 
         self.is_host = False
+        self.is_spectator = False       # watching read-only (SPECTATE_GAME)
+        self.room_closed = False        # the room we spectate was deleted
         self.difficulty = 'easy'
         self.difficulty_settings = None
+        self.board = None
 
         # Piece state
         self.piece_positions = {}
+        self.piece_groups = PieceGroups()
         self.locked_by_others = {} 
+        self.expired_pieces = set()     # pieces whose lock lease the server expired
+        self.remote_motion = MotionInterpolator()   # recent positions of remote drags
     
         # Puzzle completion state
         self.puzzle_completed = False
         self.puzzle_solver = None
 
-    def connect(self, ip, port):
+        # Lobby listing (None until a LIST_GAMES_ACK arrives)
+        self.lobby_games = None
+        self.lobby_next_cursor = None
+
+        # Server metrics (None until a GET_METRICS_ACK arrives)
+        self.server_metrics = None
+
+        # Latest ADMIN_PROFILE_ACK payload (None until one arrives)
+        self.admin_profile_status = None
+
+        # Room operations collected inside batch(), None when not batching
+        self.batch_operations = None
+        self.batch_datagram = None      # payload of a batched move that could have gone over UDP
+
+    def connect(self, ip, port, compression=True):
         """
         Establish a connection to the server at the specified IP and port.
+        With compression, the server is offered to compress large messages.
         Returns True on successful connection, False otherwise.
         """
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            configure_stream_socket(self.client_socket)
             self.client_socket.connect((ip, port))
+            self.server_address = (ip, port)
             self.connected = True
+            self._start_writer()
             self._start_listener()
+            self._start_heartbeat()
+            if compression:
+                self.send_message(MSG_SET_COMPRESSION, {'algorithms': [COMPRESSION_ALGORITHM]})
             return True
         except Exception as e:
             print(f"Connection failed: {e}")
@@ -60,6 +113,13 @@ class NetworkManager:
         """
         self.connected = False
         self.listening = False
+        self.heartbeat_stop.set()
+        self.udp_ready = False
+
+        # Let the writer send what is queued (e.g. a LEAVE_GAME) first
+        if self.writer_thread and self.writer_thread.is_alive():
+            self.outbox.put(None)
+            self.writer_thread.join(timeout=1.0)
         
         if self.client_socket:
             try:
@@ -70,8 +130,55 @@ class NetworkManager:
         if self.listen_thread and self.listen_thread.is_alive():
             self.listen_thread.join(timeout=1.0)
 
+        if self.udp_thread and self.udp_thread.is_alive():
+            self.udp_thread.join(timeout=1.0)
+        if self.udp_socket:
+            self.udp_socket.close()
+
     # -------------------------------------------------------------------------
 
+    def _start_writer(self):
+        """
+        Start the thread that writes queued frames to the server, so no
+        caller (the game loop, heartbeats) blocks on the socket and frames
+        queued together go out in one gathered write.
+        """
+        self.outbox = queue.SimpleQueue()
+        self.writer_thread = threading.Thread(target=self._write_loop, args=(self.outbox,))
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def _write_loop(self, outbox):
+        while True:
+            frames = take_frames(outbox)
+            closing = frames[-1] is None
+            if closing:
+                frames.pop()
+            if frames:
+                try:
+                    send_frames(self.client_socket, frames)
+                except OSError as e:
+                    print(f"Failed to send message: {e}")
+                    break
+            if closing:
+                break
+
+    def _start_heartbeat(self):
+        """
+        Start a background thread that PINGs the server every HEARTBEAT_INTERVAL,
+        so an idle but healthy connection is never reaped by the server.
+        """
+        self.heartbeat_stop.clear()
+        self.heartbeat_thread = threading.Thread(target=self._send_heartbeats)
+        self.heartbeat_thread.daemon = True
+        self.heartbeat_thread.start()
+
+    def _send_heartbeats(self):
+        while not self.heartbeat_stop.wait(HEARTBEAT_INTERVAL):
+            if not self.connected:
+                break
+            self.send_message(MSG_PING, {'sent': time.monotonic()})
+
     def _start_listener(self):
         """
         Start a background thread to listen for incoming messages from the server.
@@ -88,20 +195,24 @@ class NetworkManager:
         Main loop for receiving and processing messages from the server.
         Runs in a separate thread until connection is closed.
         """
+        reader = MessageReader()
+
         while self.listening and self.connected:
             try:
                 data = self.client_socket.recv(4096)
                 if not data:
                     break
                 
-                try:
-                    message = deserialize(data)
-                    # Temporary
-                    # print(json.dumps(message, indent=2))
-                    
-                    self._handle_received_message(message)
-                except json.JSONDecodeError:
-                    print(f"Received non-JSON message: {data.decode('utf-8', errors='ignore')}")
+                for message_data in reader.feed(data):
+                    try:
+                        message = deserialize(message_data)
+                        # Temporary
+                        # print(json.dumps(message, indent=2))
+                        
+                        with self.handler_lock:
+                            self._handle_received_message(message)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        print(f"Received non-JSON message: {message_data.decode('utf-8', errors='ignore')}")
                     
             except Exception as e:
                 if self.listening:
@@ -111,6 +222,69 @@ class NetworkManager:
         self.connected = False
         print("Network listener stopped")
 
+    def _start_udp(self, port):
+        """
+        Open the UDP channel the server offered and start its listener.
+        """
+        if self.udp_socket:
+            self.udp_socket.close()
+        self.udp_ready = False
+        self.udp_last_seq = {}
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.connect((self.server_address[0], self.udp_port or port))
+        self.udp_socket.settimeout(UDP_HELLO_INTERVAL)
+        self.udp_thread = threading.Thread(target=self._listen_for_datagrams, args=(self.udp_socket,))
+        self.udp_thread.daemon = True
+        self.udp_thread.start()
+
+    def _listen_for_datagrams(self, udp_socket):
+        """
+        Receive loop of the UDP channel. UDP_HELLO is resent until the server
+        answers; if it never does (e.g. UDP is blocked) moves stay on TCP.
+        """
+        hellos = 0
+        while self.connected and udp_socket is self.udp_socket:
+            if not self.udp_ready:
+                if hellos == UDP_HELLO_ATTEMPTS:
+                    print("[UDP] No answer from server, moves stay on TCP")
+                    break
+                self._send_datagram(MSG_UDP_HELLO, {}, seq=0)
+                hellos += 1
+            try:
+                data = udp_socket.recv(MAX_DATAGRAM_SIZE)
+                _, seq, message = deserialize_datagram(data)
+            except socket.timeout:
+                continue
+            except (ValueError, struct.error):
+                continue
+            except OSError:
+                break
+            with self.handler_lock:
+                self._handle_datagram(seq, message)
+
+    def _handle_datagram(self, seq, message):
+        """
+        Apply a move received over UDP unless it is stale: older than a move
+        already applied to the piece, or from a drag that has since ended.
+        """
+        msg_type = message.get('type')
+        payload = message.get('payload', {})
+        if msg_type == MSG_UDP_HELLO_ACK:
+            if not self.udp_ready:
+                self.udp_ready = True
+                print("[UDP] Channel open, moves now go over UDP")
+            return
+        if msg_type not in UDP_BROADCAST_TYPES:
+            return
+
+        object_id = payload.get('object_id')
+        if seq <= self.udp_last_seq.get(object_id, 0):
+            return
+        if self.locked_by_others.get(object_id) != payload.get('player'):
+            return
+        self.udp_last_seq[object_id] = seq
+        self._handle_received_message(message)
+
     # -------------------------------------------------------------------------
     # Server to Client Message Handlers
 
@@ -126,6 +300,8 @@ class NetworkManager:
             self._handle_host_game_ack(payload)
         elif msg_type == MSG_JOIN_GAME_ACK:
             self._handle_join_game_ack(payload)
+        elif msg_type == MSG_SPECTATE_GAME_ACK:
+            self._handle_spectate_game_ack(payload)
         elif msg_type == MSG_LEAVE_GAME_ACK:
             self._handle_leave_game_ack(payload)
         elif msg_type == MSG_LOCK_OBJECT_ACK:
@@ -146,6 +322,38 @@ class NetworkManager:
             self._handle_move_locked_object_brod(payload)
         elif msg_type == MSG_PUZZLE_SOLVED_BROD:
             self._handle_puzzle_solved_brod(payload)
+        elif msg_type == MSG_LOCK_GROUP_ACK:
+            self._handle_lock_group_ack(payload)
+        elif msg_type == MSG_RELEASE_GROUP_ACK:
+            self._handle_release_group_ack(payload)
+        elif msg_type == MSG_LIST_GAMES_ACK:
+            self._handle_list_games_ack(payload)
+        elif msg_type == MSG_PONG:
+            self._handle_pong(payload)
+        elif msg_type == MSG_GET_METRICS_ACK:
+            self.server_metrics = payload.get('metrics', {})
+        elif msg_type == MSG_ADMIN_PROFILE_ACK:
+            self.admin_profile_status = payload
+        elif msg_type == MSG_BATCH_ACK:
+            for response in payload.get('responses', []):
+                self._handle_received_message(response)
+        elif msg_type == MSG_BATCH_BROD:
+            for broadcast in payload.get('messages', []):
+                self._handle_received_message(broadcast)
+        elif msg_type == MSG_OPEN_UDP_ACK:
+            self._handle_open_udp_ack(payload)
+        elif msg_type == MSG_SET_COMPRESSION_ACK:
+            self.compression = payload.get('algorithm') if payload.get('success') else None
+        elif msg_type == MSG_VIEWPORT_SYNC:
+            self._handle_viewport_sync(payload)
+        elif msg_type == MSG_LOCK_GROUP_BROD:
+            self._handle_lock_group_brod(payload)
+        elif msg_type == MSG_MOVE_GROUP_BROD:
+            self._handle_move_group_brod(payload)
+        elif msg_type == MSG_RELEASE_GROUP_BROD:
+            self._handle_release_group_brod(payload)
+        elif msg_type == MSG_SPECTATOR_MOVES_BROD:
+            self._handle_spectator_moves_brod(payload)
         elif msg_type == MSG_ERROR:
             self._handle_error(payload)
         else:
@@ -164,8 +372,11 @@ class NetworkManager:
             self.is_host = True
             self.difficulty = payload.get('difficulty', 'easy')
             self.difficulty_settings = payload.get('difficulty_settings')
+            self.board = payload.get('board')
 
             self.piece_positions = payload.get('piece_positions', {})
+            self.piece_groups = PieceGroups(self.piece_positions)
+            self.piece_groups.load_groups(payload.get('groups'))
 
             print("\n")
             # print(f"[ACK] Game hosted successfully: {self.game_id}")
@@ -187,8 +398,12 @@ class NetworkManager:
             self.is_host = False
             self.difficulty = payload.get('difficulty', 'easy')
             self.difficulty_settings = payload.get('difficulty_settings')
+            self.board = payload.get('board')
+            self.puzzle_completed = payload.get('puzzle_solved', False)
             
             self.piece_positions = payload.get('piece_positions', {})
+            self.piece_groups = PieceGroups(self.piece_positions)
+            self.piece_groups.load_groups(payload.get('groups'))
 
             print("\n")
             # print(f"[ACK] Joined game: {self.game_name}")
@@ -200,6 +415,19 @@ class NetworkManager:
         else:
             print(f"[ACK] Failed to join game: {payload.get('message')}")
 
+    def _handle_spectate_game_ack(self, payload):
+        if payload.get('success'):
+            self._handle_join_game_ack(payload)
+            self.is_spectator = True
+            self.room_closed = False
+
+            # Updates come every update_interval; render two intervals behind
+            # so there is always a next position to interpolate towards
+            self.remote_motion.delay = max(INTERPOLATION_DELAY, 2 * payload.get('update_interval', 0))
+            print(f"[ACK] Spectating game, Game Name: {self.game_name}, Game ID: {self.game_id}")
+        else:
+            print(f"[ACK] Failed to spectate game: {payload.get('message')}")
+
     def _handle_leave_game_ack(self, payload):
         if payload.get('success'):
             self.game_id = None
@@ -209,11 +437,16 @@ class NetworkManager:
             self.image_url = None
             self.host_info = None
             self.is_host = False
+            self.is_spectator = False
             self.difficulty = 'easy'
             self.difficulty_settings = None
+            self.board = None
 
             self.piece_positions = {}
+            self.piece_groups = PieceGroups()
             self.locked_by_others = {}
+            self.remote_motion.clear()
+            self.remote_motion.delay = INTERPOLATION_DELAY
             
             # Reset puzzle completion state
             self.puzzle_completed = False
@@ -247,6 +480,53 @@ class NetworkManager:
         else:
             print(f"[ACK] Failed to solve puzzle: {payload.get('info', {}).get('error', '')}")
 
+    def _handle_lock_group_ack(self, payload):
+        print("\n")
+        if payload.get('success'):
+            print(f"[ACK] Group locked: {payload.get('object_id')} ({payload.get('info', {}).get('group_size')} pieces)")
+        else:
+            print(f"[ACK] Failed to lock group: {payload.get('info', {}).get('error', '')}")
+
+    def _handle_release_group_ack(self, payload):
+        print("\n")
+        if payload.get('success'):
+            # Apply the server's final (snapped) placement and merges
+            object_id = payload.get('object_id')
+            info = payload.get('info', {})
+            self._move_group_anchor(object_id, info.get('position'))
+            self._merge_groups(object_id, info.get('merged', []))
+            print(f"[ACK] Group released: {object_id}")
+        else:
+            print(f"[ACK] Failed to release group: {payload.get('info', {}).get('error', '')}")
+
+    def _handle_list_games_ack(self, payload):
+        self.lobby_next_cursor = payload.get('next_cursor')
+        self.lobby_games = payload.get('games', [])
+
+    def _handle_open_udp_ack(self, payload):
+        print("\n")
+        if payload.get('success'):
+            self.udp_token = bytes.fromhex(payload['token'])
+            self._start_udp(payload['port'])
+            print(f"[ACK] UDP channel offered on port {payload['port']}")
+        else:
+            print(f"[ACK] UDP channel refused: {payload.get('message')}")
+
+    def _handle_viewport_sync(self, payload):
+        """
+        Current positions of the groups being dragged in our new viewport,
+        whose moves were filtered out while they were outside the old one.
+        """
+        for piece_id, position in payload.get('positions', {}).items():
+            if piece_id in self.piece_positions:
+                self.piece_positions[piece_id] = position
+                self.remote_motion.remove(piece_id)
+
+    def _handle_pong(self, payload):
+        sent = payload.get('sent')
+        if sent is not None:
+            self.latency_ms = (time.monotonic() - sent) * 1000
+
     # Broadcast Handlers
 
     def _handle_player_joined_brod(self, payload):
@@ -261,6 +541,17 @@ class NetworkManager:
         print("\n")
         player_info = payload.get('player')
         self.current_players = payload.get('current_players', self.current_players)
+
+        # The last player left the room we were spectating
+        if payload.get('room_closed'):
+            self.room_closed = True
+            print(f"[BROD] Room {payload.get('game_id')} closed, no players left")
+            return
+
+        # The server freed every lock the player held
+        for piece_id in [piece_id for piece_id, locker in self.locked_by_others.items() if locker == player_info]:
+            del self.locked_by_others[piece_id]
+            self.remote_motion.remove(piece_id)
         
         # Handle host change if it occurred
         if payload.get('host_changed', False):
@@ -302,6 +593,12 @@ class NetworkManager:
         # Update piece position
         if object_id in self.piece_positions:
             self.piece_positions[object_id] = position
+        self.remote_motion.remove(object_id)
+        self._merge_groups(object_id, payload.get('merged', []))
+
+        # An expired lease may be our own drag; the GUI checks this set
+        if payload.get('info', {}).get('expired'):
+            self.expired_pieces.add(object_id)
 
         print(f"[BROD] Object released: {object_id} at {position} by {player_info}")
         
@@ -313,9 +610,82 @@ class NetworkManager:
         # Update piece position
         if object_id in self.piece_positions:
             self.piece_positions[object_id] = position
+            self.remote_motion.add_sample(object_id, position, time.perf_counter(), payload.get('sent_at'))
 
         # print(f"[BROD] Object moved: {object_id} to {position} by {player_info}")
       
+    def _handle_lock_group_brod(self, payload):
+        print("\n")
+        player_info = payload.get('player')
+        object_id = payload.get('object_id')
+
+        # Add every member of the group to the locked list
+        for piece_id in self.piece_groups.get_members(object_id):
+            self.locked_by_others[piece_id] = player_info
+
+        # A new drag starts a fresh position history
+        self.remote_motion.remove(object_id)
+
+        print(f"[BROD] Group locked: {object_id} by {player_info}")
+
+    def _handle_move_group_brod(self, payload):
+        object_id = payload.get('object_id')
+        position = payload.get('position')
+
+        # Update all member positions from the anchor position
+        self._move_group_anchor(object_id, position)
+        if position and object_id in self.piece_positions:
+            self.remote_motion.add_sample(object_id, position, time.perf_counter(), payload.get('sent_at'))
+
+    def _handle_release_group_brod(self, payload):
+        print("\n")
+        object_id = payload.get('object_id')
+        position = payload.get('position')
+        player_info = payload.get('player')
+
+        # Update positions, remove from locked list and apply the merges
+        self._move_group_anchor(object_id, position)
+        self.remote_motion.remove(object_id)
+        for piece_id in self.piece_groups.get_members(object_id):
+            self.locked_by_others.pop(piece_id, None)
+        self._merge_groups(object_id, payload.get('merged', []))
+
+        # An expired lease may be our own drag; the GUI checks this set
+        if payload.get('info', {}).get('expired'):
+            self.expired_pieces.update(self.piece_groups.get_members(object_id))
+
+        print(f"[BROD] Group released: {object_id} at {position} by {player_info}")
+
+    def _handle_spectator_moves_brod(self, payload):
+        """
+        Coalesced positions of the groups being dragged, for spectators.
+        Each one is applied like a MOVE_GROUP_BROD (so it is interpolated).
+        """
+        sent_at = payload.get('sent_at')
+        for object_id, position in payload.get('moves', {}).items():
+            self._handle_move_group_brod({'object_id': object_id, 'position': position, 'sent_at': sent_at})
+
+    def _move_group_anchor(self, object_id, position):
+        """
+        Move every member of object_id's group by the anchor's displacement.
+        """
+        anchor = self.piece_positions.get(object_id)
+        if not anchor or not position:
+            return
+        dx = position['x'] - anchor['x']
+        dy = position['y'] - anchor['y']
+        for piece_id in self.piece_groups.get_members(object_id):
+            current = self.piece_positions[piece_id]
+            self.piece_positions[piece_id] = {'x': current['x'] + dx, 'y': current['y'] + dy}
+
+    def _merge_groups(self, object_id, merged):
+        """
+        Apply group merges decided by the server.
+        """
+        for other_id in merged:
+            if object_id in self.piece_positions and other_id in self.piece_positions:
+                self.piece_groups.union(object_id, other_id)
+
     def _handle_puzzle_solved_brod(self, payload):
         print("\n")
         player_info = payload.get('player')
@@ -345,10 +715,31 @@ class NetworkManager:
         """Get current piece positions from network manager."""
         return self.piece_positions.copy()
 
+    def get_display_piece_positions(self):
+        """
+        Get piece positions to draw: the current positions, with groups being
+        dragged by other players smoothed by the interpolator.
+        """
+        positions = self.piece_positions.copy()
+        for anchor_id, (x, y) in self.remote_motion.get_positions(time.perf_counter()).items():
+            anchor = positions.get(anchor_id)
+            if not anchor:
+                continue
+            dx = round(x) - anchor['x']
+            dy = round(y) - anchor['y']
+            for piece_id in self.piece_groups.get_members(anchor_id):
+                current = positions[piece_id]
+                positions[piece_id] = {'x': current['x'] + dx, 'y': current['y'] + dy}
+        return positions
+
     def update_local_piece_position(self, piece_id, position):
         """Update local piece position tracking."""
         self.piece_positions[piece_id] = position
 
+    def get_group_members(self, piece_id):
+        """Get the pieces snapped together with piece_id (including itself)."""
+        return self.piece_groups.get_members(piece_id) or [piece_id]
+
     def is_puzzle_completed(self):
         """Check if the puzzle has been completed by any player."""
         return self.puzzle_completed
@@ -379,33 +770,104 @@ class NetworkManager:
         payload = {'game_id': game_id}
         return self.send_message(MSG_JOIN_GAME, payload)
     
+    def spectate_game(self, game_id):
+        """
+        Send a request to watch a game without taking a player slot
+        """
+        payload = {'game_id': game_id}
+        return self.send_message(MSG_SPECTATE_GAME, payload)
+
     def leave_game(self):
         """
         Send a request to leave the current game
         """
         return self.send_message(MSG_LEAVE_GAME, {})
 
+    def list_games(self, difficulty=None, not_full=False, not_solved=False, cursor=None, limit=None):
+        """
+        Request one page of the lobby listing; the result arrives in
+        lobby_games / lobby_next_cursor.
+        """
+        self.lobby_games = None
+        payload = self._make_payload(difficulty=difficulty, not_full=not_full, not_solved=not_solved,
+                                     cursor=cursor, limit=limit)
+        return self.send_message(MSG_LIST_GAMES, payload)
+
+    def get_metrics(self):
+        """
+        Request the server's metrics; the result arrives in server_metrics.
+        """
+        self.server_metrics = None
+        return self.send_message(MSG_GET_METRICS, {})
+
+    def admin_profile(self, token, action, mode=None, duration=None):
+        """
+        Start ('start', with mode 'sample' or 'timing' and duration seconds),
+        stop ('stop') or query ('status') a profile of the server. The reply
+        arrives in admin_profile_status.
+        """
+        self.admin_profile_status = None
+        payload = self._make_payload(token=token, action=action, mode=mode, duration=duration)
+        return self.send_message(MSG_ADMIN_PROFILE, payload)
+
+    def set_viewport(self, left, top, right, bottom):
+        """
+        Report the world area on screen. The server then only sends moves
+        of groups that touch it.
+        """
+        payload = self._make_payload(left=left, top=top, right=right, bottom=bottom)
+        return self.send_message(MSG_SET_VIEWPORT, payload)
+
     def lock_object(self, object_id):
         """
-        Request to lock an object.
+        Request to lock an object. udp_seq tells the server which move
+        datagrams were sent before the lock (it drops them if they arrive later).
         """
-        payload = self._make_payload(object_id=object_id)
+        payload = self._make_payload(object_id=object_id, udp_seq=self.udp_sent_seq or None)
         return self.send_message(MSG_LOCK_OBJECT, payload)
 
     def move_locked_object(self, object_id, position):
         """
         Send a request to move a locked object to a new position.
         """
-        payload = self._make_payload(object_id=object_id, position=position)
-        return self.send_message(MSG_MOVE_LOCKED_OBJECT, payload)
+        payload = self._make_payload(object_id=object_id, position=position, sent_at=time.perf_counter())
+        return self._send_move(MSG_MOVE_LOCKED_OBJECT, payload)
 
     def release_object(self, object_id, position):
         """
         Request to release an object with its position.
         """
-        payload = self._make_payload(object_id=object_id, position=position)
+        payload = self._make_payload(object_id=object_id, position=position, udp_seq=self.udp_sent_seq or None)
         return self.send_message(MSG_RELEASE_OBJECT, payload)
 
+    def lock_group(self, object_id):
+        """
+        Request to lock the group containing object_id (udp_seq as in lock_object).
+        """
+        payload = self._make_payload(object_id=object_id, udp_seq=self.udp_sent_seq or None)
+        return self.send_message(MSG_LOCK_GROUP, payload)
+
+    def move_group(self, object_id, position, reliable=False):
+        """
+        Send a request to move a locked group so its anchor is at position.
+        sent_at lets other players space out updates that arrive in bursts.
+        Goes over the UDP channel if there is one, unless reliable is set.
+        """
+        self._move_group_anchor(object_id, position)
+        payload = self._make_payload(object_id=object_id, position=position, sent_at=time.perf_counter())
+        if reliable:
+            return self.send_message(MSG_MOVE_GROUP, payload)
+        return self._send_move(MSG_MOVE_GROUP, payload)
+
+    def release_group(self, object_id, position):
+        """
+        Request to release a group with its anchor position.
+        The server snaps it and decides merges; see the RELEASE_GROUP_ACK.
+        """
+        self._move_group_anchor(object_id, position)
+        payload = self._make_payload(object_id=object_id, position=position, udp_seq=self.udp_sent_seq or None)
+        return self.send_message(MSG_RELEASE_GROUP, payload)
+
     def puzzle_solved(self, completion_time=None, total_pieces=None):
         """
         Notify the server that the puzzle is completed.
@@ -413,6 +875,61 @@ class NetworkManager:
         payload = self._make_payload(completion_time=completion_time, total_pieces=total_pieces)
         return self.send_message(MSG_PUZZLE_SOLVED, payload)
 
+    def open_udp(self, port=None):
+        """
+        Ask the server for a UDP channel for moves. Locks, releases and
+        membership stay on TCP. port overrides the port the server offers.
+        """
+        self.udp_port = port
+        return self.send_message(MSG_OPEN_UDP, {})
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Collect the room operations (locks, moves, releases, viewport) sent
+        inside the with-block and send them as one BATCH when it ends. The
+        server applies them in order without other messages in between and
+        answers with one BATCH_ACK. A batch of one operation is sent as if
+        there had been no batch (a lone move still goes over UDP).
+        """
+        self.batch_operations = []
+        try:
+            yield
+        finally:
+            operations, self.batch_operations = self.batch_operations, None
+            datagram, self.batch_datagram = self.batch_datagram, None
+            if len(operations) == 1 and operations[0]['payload'] is datagram:
+                self._send_move(operations[0]['type'], datagram)
+            elif len(operations) == 1:
+                self.send_message(operations[0]['type'], operations[0]['payload'])
+            elif operations:
+                for start in range(0, len(operations), MAX_BATCH_OPERATIONS):
+                    self.send_message(MSG_BATCH, {'operations': operations[start:start + MAX_BATCH_OPERATIONS]})
+
+    def _send_move(self, msg_type, payload):
+        """
+        Send a move over the UDP channel if it is open, otherwise over TCP.
+        Moves made inside batch() go in the batch.
+        """
+        if self.batch_operations is not None:
+            self.batch_datagram = payload
+        elif self.udp_ready and self._send_datagram(msg_type, payload):
+            return True
+        return self.send_message(msg_type, payload)
+
+    def _send_datagram(self, msg_type, payload, seq=None):
+        """
+        Send a message over the UDP channel with the next sequence number.
+        """
+        if seq is None:
+            seq = self.udp_sent_seq = next(self.udp_send_seq)
+        try:
+            self.udp_socket.send(serialize_datagram(seq, msg_type, payload, self.udp_token))
+            return True
+        except OSError as e:
+            print(f"Failed to send datagram: {e}")
+            return False
+
     def _make_payload(self, **kwargs):
         """
         Build a payload dictionary, excluding keys with None values.
@@ -422,14 +939,17 @@ class NetworkManager:
     
     def send_message(self, msg_type, payload):
         """
-        Send a message to the server with the specified type and payload.
-        Returns True if sent successfully, False if connection is unavailable.
+        Queue a message to the server with the specified type and payload
+        (the writer thread sends it). Returns True if queued, False if the
+        connection is unavailable.
         """
+        if self.batch_operations is not None and msg_type in BATCHABLE_TYPES:
+            self.batch_operations.append({'type': msg_type, 'payload': payload})
+            return True
         if not self.connected or not self.client_socket:
             return False
         try:
-            message = serialize(msg_type, payload)
-            self.client_socket.send(message)
+            self.outbox.put(serialize(msg_type, payload))
             return True
         except Exception as e:
             print(f"Failed to send message: {e}")
@@ -1,15 +1,112 @@
 import io
 import os 
 import sys
+import time
+import threading
 import pygame
 import requests
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from PIL import Image
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
-from constants import DIFFICULTY_SETTINGS
+from constants import (DIFFICULTY_SETTINGS, PREVIEW_DOWNSCALE, SLICE_POOL,
+                       SLICE_WORKERS, PARALLEL_SLICE_MIN_PIECES)
+
+# Loading stages, in the order a progressive load moves through them
+LOAD_STAGE_PENDING = 'pending'
+LOAD_STAGE_PREVIEW = 'preview'
+LOAD_STAGE_FULL = 'full'
+LOAD_STAGE_FAILED = 'failed'
+
+# -----------------------------------------------------------------------------
+# Piece slicing
+#
+# Every piece is cropped (and run through the per-piece processors, e.g. edge
+# masks or outlines) independently, so the work is spread over a pool.
+# Executor.map keeps results in submission order, which is row-major piece
+# order, so piece ids are the same whatever pool is used.
+
+def _crop_piece(pil_image, row, col, piece_size, processors):
+    """
+    Crop one piece and apply the per-piece processors.
+    Returns (mode, size, raw bytes).
+    """
+    left = col * piece_size[0]
+    top = row * piece_size[1]
+    pil_piece = pil_image.crop((left, top, left + piece_size[0], top + piece_size[1]))
+
+    for processor in processors:
+        pil_piece = processor(pil_piece, row, col)
+
+    return pil_piece.mode, pil_piece.size, pil_piece.tobytes()
+
+def _crop_piece_to_surface(pil_image, row, col, piece_size, processors):
+    """
+    Crop one piece and convert it to a pygame surface (thread pool worker)
+    """
+    mode, size, data = _crop_piece(pil_image, row, col, piece_size, processors)
+    return pygame.image.fromstring(data, size, mode), size
+
+# Process pool workers get the image once through the initializer instead of
+# having it pickled with every task.
+_worker_image = None
+
+def _init_process_worker(mode, size, data):
+    global _worker_image
+    _worker_image = Image.frombytes(mode, size, data)
+
+def _crop_row_in_process(row, grid_cols, piece_size, processors):
+    return [_crop_piece(_worker_image, row, col, piece_size, processors) for col in range(grid_cols)]
+
+def build_pieces(pil_image, grid_cols, grid_rows, processors=(), pool=SLICE_POOL, workers=SLICE_WORKERS):
+    """
+    Split a resized image into grid_cols x grid_rows piece dicts.
+    pool is 'serial', 'thread' or 'process'. Small grids are always sliced
+    serially since the pool start-up would cost more than it saves.
+    """
+    img_width, img_height = pil_image.size
+    piece_size = (img_width // grid_cols, img_height // grid_rows)
+    cells = [(row, col) for row in range(grid_rows) for col in range(grid_cols)]
+    processors = tuple(processors)
+
+    if pool == 'serial' or len(cells) < PARALLEL_SLICE_MIN_PIECES:
+        surfaces = [_crop_piece_to_surface(pil_image, row, col, piece_size, processors) for row, col in cells]
+
+    elif pool == 'thread':
+        # One task per row keeps executor overhead small for large grids
+        def slice_row(row):
+            return [_crop_piece_to_surface(pil_image, row, col, piece_size, processors) for col in range(grid_cols)]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            surfaces = [surface for row_surfaces in executor.map(slice_row, range(grid_rows))
+                        for surface in row_surfaces]
+
+    elif pool == 'process':
+        # Surfaces can't cross process boundaries, so workers return raw bytes
+        # (one task per row) and the conversion happens here
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_process_worker,
+                                 initargs=(pil_image.mode, pil_image.size, pil_image.tobytes())) as executor:
+            rows = executor.map(_crop_row_in_process, range(grid_rows), [grid_cols] * grid_rows,
+                                [piece_size] * grid_rows, [processors] * grid_rows)
+            surfaces = [(pygame.image.fromstring(data, size, mode), size)
+                        for row_pieces in rows for mode, size, data in row_pieces]
+    else:
+        raise ValueError(f"Unknown slice pool: {pool}")
+
+    pieces = []
+    for piece_index, ((row, col), (pygame_piece, size)) in enumerate(zip(cells, surfaces)):
+        pieces.append({
+            'id': f'piece_{piece_index}',
+            'image': pygame_piece,
+            'correct_row': row,
+            'correct_col': col,
+            'grid_position': (col, row),
+            'size': size
+        })
+    return pieces
 
 class Puzzle:
-    def __init__(self, image_url, difficulty='easy', resize_to=None):
+    def __init__(self, image_url, difficulty='easy', resize_to=None, load_async=False):
         self.image_url = image_url
         self.difficulty = difficulty
         self.difficulty_settings = DIFFICULTY_SETTINGS[difficulty]
@@ -21,9 +118,22 @@ class Puzzle:
         self.resize_to = resize_to
 
         self.pieces = []
+        self.pieces_by_id = {}
         self.piece_size = (0, 0)
+
+        # Per-piece PIL processing hooks: processor(pil_piece, row, col) -> pil_piece
+        self.piece_processors = []
+
+        # Loading state (written by the loader thread when load_async is set)
+        self.load_stage = LOAD_STAGE_PENDING
+        self.load_timings = {}
+        self._load_lock = threading.Lock()
+        self._load_thread = None
         
-        self._load_and_split_image()
+        if load_async:
+            self.start_loading()
+        else:
+            self._load_and_split_image()
         # self._display_puzzle_info()
 
     def _calculate_resize_dimensions(self, original_size):
@@ -53,68 +163,142 @@ class Puzzle:
         resized_size = (resized_width, resized_height)
         return resized_size
 
+    def start_loading(self):
+        """
+        Load the puzzle on a background thread.
+        Placeholder pieces decoded at reduced scale are published first
+        (LOAD_STAGE_PREVIEW), then swapped for full quality ones (LOAD_STAGE_FULL).
+        """
+        if self._load_thread is None:
+            self._load_thread = threading.Thread(target=self._load_progressively)
+            self._load_thread.daemon = True
+            self._load_thread.start()
+
+    def _load_progressively(self):
+        """
+        Worker thread function for the staged load
+        """
+        start_time = time.perf_counter()
+        try:
+            image_data = self._download_image()
+            self.load_timings['download'] = time.perf_counter() - start_time
+
+            # Stage 1: cheap draft decode, upscaled into blurry placeholder pieces
+            preview_image = self._decode_image(image_data, downscale=PREVIEW_DOWNSCALE)
+            resize_dimensions = self._calculate_resize_dimensions(self.original_size)
+            preview_image = self._resize_image(preview_image, resize_dimensions, Image.BILINEAR)
+            self._publish_pieces(self._split_image(preview_image), LOAD_STAGE_PREVIEW)
+            self.load_timings['preview'] = time.perf_counter() - start_time
+
+            # Stage 2: full quality pieces
+            full_image = self._decode_image(image_data)
+            full_image = self._resize_image(full_image, resize_dimensions, Image.LANCZOS)
+            self._publish_pieces(self._split_image(full_image), LOAD_STAGE_FULL)
+            self.load_timings['full'] = time.perf_counter() - start_time
+
+        except requests.exceptions.RequestException as e:
+            print(f"Error downloading image: {e}")
+            self.load_stage = LOAD_STAGE_FAILED
+        except Exception as e:
+            print(f"Error processing image: {e}")
+            self.load_stage = LOAD_STAGE_FAILED
+
     def _load_and_split_image(self):
         """
         Load image from URL and split it into puzzle pieces
         """
         if not self.image_url:
             print("Error: No image URL provided.")
+            self.load_stage = LOAD_STAGE_FAILED
             return
 
         try:
-            # Download image from URL
-            response = requests.get(self.image_url)
-            response.raise_for_status() 
-
-            # Open image with Pillow
-            image_file = io.BytesIO(response.content)
-            pil_image = Image.open(image_file)
-            
-            # Store original dimensions
-            self.original_size = pil_image.size
+            image_data = self._download_image()
 
             # Resize image to optimal puzzle size
+            pil_image = self._decode_image(image_data)
             resize_dimensions = self._calculate_resize_dimensions(self.original_size)
-            pil_image = pil_image.resize(resize_dimensions, Image.LANCZOS)
-
-            # Calculate individual piece dimensions
-            img_width, img_height = pil_image.size
-            self.piece_size = (img_width // self.grid_cols, img_height // self.grid_rows)
-
-            # Split image into puzzle pieces
-            piece_id_counter = 0
-            for row in range(self.grid_rows):
-                for col in range(self.grid_cols):
-                    # Calculate crop boundaries for this piece
-                    left = col * self.piece_size[0]
-                    top = row * self.piece_size[1]
-                    right = left + self.piece_size[0]
-                    bottom = top + self.piece_size[1]
-                    
-                    # Crop piece from main image
-                    pil_piece = pil_image.crop((left, top, right, bottom))
-                    
-                    # Convert Pillow image to Pygame surface
-                    mode = pil_piece.mode
-                    size = pil_piece.size
-                    data = pil_piece.tobytes()
-                    pygame_piece = pygame.image.fromstring(data, size, mode)
-                    
-                    # Store piece with metadata
-                    self.pieces.append({
-                        'id': f'piece_{piece_id_counter}',
-                        'image': pygame_piece,
-                        'correct_row': row,
-                        'correct_col': col,
-                        'grid_position': (col, row),
-                        'size': size
-                    })
-                    piece_id_counter += 1
+            pil_image = self._resize_image(pil_image, resize_dimensions, Image.LANCZOS)
+
+            self._publish_pieces(self._split_image(pil_image), LOAD_STAGE_FULL)
 
         except requests.exceptions.RequestException as e:
             print(f"Error downloading image: {e}")
+            self.load_stage = LOAD_STAGE_FAILED
         except Exception as e:
             print(f"Error processing image: {e}")
+            self.load_stage = LOAD_STAGE_FAILED
+
+    def _download_image(self):
+        """
+        Download the raw image bytes from the puzzle URL
+        """
+        if not self.image_url:
+            raise ValueError("No image URL provided")
+
+        response = requests.get(self.image_url)
+        response.raise_for_status()
+        return response.content
+
+    def _decode_image(self, image_data, downscale=1):
+        """
+        Decode image bytes with Pillow.
+        For JPEGs, draft() lets the decoder skip detail we are going to throw
+        away anyway, so large photos decode at a fraction of their full size.
+        """
+        pil_image = Image.open(io.BytesIO(image_data))
+
+        # Store original dimensions (known from the header, before decoding)
+        self.original_size = pil_image.size
+
+        # Smallest size the decoder may produce for this stage
+        target_width, target_height = self._calculate_resize_dimensions(self.original_size)
+        draft_size = (max(1, target_width // downscale), max(1, target_height // downscale))
+        pil_image.draft('RGB', draft_size)
+
+        if pil_image.mode not in ('RGB', 'RGBA'):
+            pil_image = pil_image.convert('RGB')
+        return pil_image
+
+    def _resize_image(self, pil_image, resize_dimensions, resample):
+        """
+        Resize to resize_dimensions, center-cropping first if the aspect
+        ratios differ (e.g. a landscape photo on the server's board) so the
+        image is never stretched.
+        """
+        img_width, img_height = pil_image.size
+        target_width, target_height = resize_dimensions
+
+        crop_width = min(img_width, img_height * target_width / target_height)
+        crop_height = min(img_height, img_width * target_height / target_width)
+        left = (img_width - crop_width) / 2
+        top = (img_height - crop_height) / 2
+
+        return pil_image.resize(resize_dimensions, resample, box=(left, top, left + crop_width, top + crop_height))
+
+    def _split_image(self, pil_image):
+        """
+        Split a resized image into puzzle pieces
+        """
+        return build_pieces(pil_image, self.grid_cols, self.grid_rows, self.piece_processors)
+
+    def _publish_pieces(self, pieces, stage):
+        """
+        Make a set of pieces visible to the game.
+        The first publish creates the piece list. Later ones only swap the
+        images of the existing pieces, so references held by the GUI stay valid.
+        """
+        with self._load_lock:
+            if not self.pieces_by_id:
+                self.pieces = pieces
+                self.pieces_by_id = {piece['id']: piece for piece in pieces}
+                self.piece_size = pieces[0]['size'] if pieces else (0, 0)
+            else:
+                for upgraded in pieces:
+                    piece = self.pieces_by_id.get(upgraded['id'])
+                    if piece:
+                        piece['image'] = upgraded['image']
+            self.load_stage = stage
 
     def _display_puzzle_info(self):
         """
@@ -139,9 +323,14 @@ class Puzzle:
         """
         Get a specific piece by its ID
         """
-        for piece in self.pieces:
-            if piece['id'] == piece_id:
-                return piece
+        return self.pieces_by_id.get(piece_id)
+
+    def get_piece_id_at(self, col, row):
+        """
+        Get the ID of the piece that belongs at grid cell (col, row)
+        """
+        if 0 <= col < self.grid_cols and 0 <= row < self.grid_rows:
+            return f'piece_{row * self.grid_cols + col}'
         return None
 
     def get_piece_size(self):
@@ -154,4 +343,16 @@ class Puzzle:
         """
         Return grid dimensions as (cols, rows)
         """
-        return (self.grid_cols, self.grid_rows)
\ No newline at end of file
+        return (self.grid_cols, self.grid_rows)
+
+    def get_load_stage(self):
+        """
+        Return the current loading stage (LOAD_STAGE_*)
+        """
+        return self.load_stage
+
+    def is_loaded(self):
+        """
+        Return True once pieces (placeholder or full quality) are available
+        """
+        return self.load_stage in (LOAD_STAGE_PREVIEW, LOAD_STAGE_FULL)
\ No newline at end of file
@@ -0,0 +1,136 @@
+import itertools
+import queue
+import socket
+import threading
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from protocol import (DATAGRAM_HEADER, FRAME_HEADER, COMPRESSION_THRESHOLD, compress_frame,
+                      configure_stream_socket, split_serialized, take_frames, send_frames)
+from constants import OUTBOX_MAX_BYTES
+
+class ClientConnection:
+    def __init__(self, client_socket, client_address, metrics=None):
+        """
+        One connected client. Outgoing messages go through an outbox that a
+        writer thread drains, so callers (possibly holding a room lock) only
+        enqueue and never block on a slow client's socket, and messages to
+        one client are sent in the order they were queued. Whatever queued
+        up while the writer was busy goes out in one gathered write.
+        A client that lets more than OUTBOX_MAX_BYTES queue up (it stopped
+        reading), or whose socket fails, is shut down.
+        """
+        configure_stream_socket(client_socket)
+        self.socket = client_socket
+        self.address = client_address
+        self.metrics = metrics
+        self.outbox = queue.SimpleQueue()
+        self.outbox_lock = threading.Lock()
+        self.outbox_bytes = 0           # queued, not yet taken by the writer
+        self.failed = False             # overflowed or failed to send: nothing is queued anymore
+
+        # Set once the client negotiated compression (SET_COMPRESSION); large
+        # frames are then compressed by the writer thread, off the room lock
+        self.compression = False
+
+        # Optional UDP channel (see Server.handle_open_udp)
+        self.udp_token = None
+        self.udp_address = None         # where datagrams for this client go
+        self.udp_last_seq = 0           # highest sequence number received
+        self.udp_fence_seq = 0          # last datagram sent before the latest lock or release
+        self.udp_send_seq = itertools.count(1)
+
+        self.writer_thread = threading.Thread(target=self._write_loop)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+    def send(self, data):
+        """
+        Queue framed bytes for sending. Dropped once the connection failed.
+        """
+        with self.outbox_lock:
+            if self.failed:
+                return
+            if self.outbox_bytes + len(data) <= OUTBOX_MAX_BYTES:
+                self.outbox_bytes += len(data)
+                self.outbox.put(data)
+                return
+            self.failed = True
+        print(f"Outbox of {self.address} is full ({self.outbox_bytes} bytes unsent), disconnecting")
+        if self.metrics:
+            self.metrics.increment('outbox_overflows')
+        self.shutdown()
+
+    def send_datagram(self, udp_socket, body):
+        """
+        Send a message body over the UDP channel with the next sequence
+        number. Returns False if the client has no UDP channel.
+        """
+        udp_address = self.udp_address
+        if udp_address is None:
+            return False
+        try:
+            udp_socket.sendto(DATAGRAM_HEADER.pack(next(self.udp_send_seq)) + body, udp_address)
+        except OSError:
+            return False
+        return True
+
+    def _write_loop(self):
+        while True:
+            frames = take_frames(self.outbox)
+            closing = frames[-1] is None
+            if closing:
+                frames.pop()
+            with self.outbox_lock:
+                self.outbox_bytes -= sum(len(frame) for frame in frames)
+            if self.compression:
+                frames = [frame for data in frames for frame in self._compress(data)]
+            if frames:
+                try:
+                    calls = send_frames(self.socket, frames)
+                except OSError as e:
+                    print(f"Failed to send to {self.address}: {e}")
+                    with self.outbox_lock:
+                        self.failed = True
+                    self.shutdown()
+                    break
+                if self.metrics:
+                    self.metrics.increment('send_calls', calls)
+                    self.metrics.increment('frames_sent', len(frames))
+            if closing:
+                break
+
+    def _compress(self, data):
+        """
+        Compress the large frames of one queued buffer, each on its own
+        (a buffer may hold several frames, e.g. a response and PUZZLE_SOLVED).
+        Returns the buffer's frames.
+        """
+        if len(data) < COMPRESSION_THRESHOLD:
+            return [data]
+        (length,) = FRAME_HEADER.unpack_from(data)
+        frames = [data] if FRAME_HEADER.size + length == len(data) else split_serialized(data)
+        return [self._compress_frame(frame) if len(frame) >= COMPRESSION_THRESHOLD else frame
+                for frame in frames]
+
+    def _compress_frame(self, frame):
+        compressed = compress_frame(frame)
+        if self.metrics and compressed is not frame:
+            self.metrics.increment('frames_compressed')
+            self.metrics.increment('compression_bytes_saved', len(frame) - len(compressed))
+        return compressed
+
+    def shutdown(self):
+        """
+        Wake the reading thread (it sees EOF and cleans up).
+        """
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self):
+        self.outbox.put(None)
+        self.writer_thread.join(timeout=1.0)
+        self.socket.close()
@@ -2,16 +2,29 @@ import random
 import string
 import sys
 import os
+import threading
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 from constants import * 
+from piece_groups import PieceGroups
+from timing_wheel import TimingWheel
+from spatial_index import SpatialHash
+from scatter import jittered_grid
 
 class GameRoom:
-    def __init__(self, game_name, max_players, host_address, image_url, difficulty='easy'):
+    def __init__(self, game_name, max_players, host_address, image_url, difficulty='easy', piece_positions=None,
+                 scatter_seed=None):
         """
         Initialize a new game room with the specified parameters.
         The host is automatically added as the first player.
+        piece_positions skips the random scatter (used when restoring);
+        scatter_seed makes the scatter reproducible.
         """
+        # Every read/write of this room's state happens under its own lock
+        # (see Server.process_message); closed is set once it is deleted
+        self.lock = threading.RLock()
+        self.closed = False
+
         # Game config
         self.game_id = self._generate_game_id()
         self.game_name = game_name
@@ -19,16 +32,49 @@ class GameRoom:
         self.host_address = host_address
         self.players = [host_address]
 
+        # Spectators are read-only and take no player slot. Moves are not
+        # sent to them one by one: the anchors moved since the last spectator
+        # update are collected and sent together (see Server.send_spectator_updates)
+        self.spectators = set()
+        self.spectator_moves = set()
+
         # Puzzle config
         self.image_url = image_url
         self.difficulty = difficulty
         self.difficulty_settings = DIFFICULTY_SETTINGS[difficulty]
-        self.piece_positions = self._generate_initial_piece_positions()
+        self.piece_positions = piece_positions or self._generate_initial_piece_positions(scatter_seed)
+        self.piece_groups = PieceGroups(self.piece_positions)
+
+        # Board geometry: the server decides where every piece belongs, so it
+        # can snap releases and detect completion itself
+        self.board = self._calculate_board_geometry()
+        self.correct_positions = self._calculate_correct_positions()
+        self.snap_tolerance = SNAP_TOLERANCE
+
+        # Pieces currently within snap tolerance of their correct position,
+        # kept up to date on every position change so completion is O(1)
+        self.correct_pieces = set()
+        for piece_id, position in self.piece_positions.items():
+            self._update_correctness(piece_id, position)
+
+        # Interest management: pieces indexed by top-left corner, and the
+        # world area each player reported having on screen. Players with a
+        # viewport only get moves that touch it (see Server.route_broadcast)
+        self.piece_index = SpatialHash(INTEREST_CELL_PIECES * self.board['piece_width'])
+        for piece_id, position in self.piece_positions.items():
+            self.piece_index.insert(piece_id, position['x'], position['y'])
+        self.viewports = {}             # client_address -> (left, top, right, bottom)
+        self.last_move_bounds = None    # area the latest move swept (read under self.lock)
 
         # Game state
         self.locked_objects = {}
+        self.object_locks = set()       # pieces locked with lock_object (released with RELEASE_OBJECT)
         self.puzzle_solved_flag = False
 
+        # Lock leases keyed by group root, renewed by moves; the wheel is
+        # only created once the room sees its first lock
+        self.lock_leases = None
+
     def _generate_game_id(self):
         """
         Generate a random 6-character alphanumeric game ID
@@ -36,34 +82,47 @@ class GameRoom:
         chars = string.ascii_uppercase + string.digits
         return ''.join(random.choice(chars) for _ in range(6))
 
-    def _generate_initial_piece_positions(self):
+    def _generate_initial_piece_positions(self, seed=None):
         """
-        Generate a dictionary mapping piece_id to random x,y coordinates, 
-        based on the difficulty settings
+        Generate a dictionary mapping piece_id to x,y coordinates spread over
+        the window on a jittered grid (see scatter.py), so pieces do not pile
+        up even on large grids
         """
         total_pieces = self.difficulty_settings['pieces']
-        
-        # Screen dimensions
-        window_width = WINDOW_WIDTH
-        window_height = WINDOW_HEIGHT
-        avg_piece_size = self.difficulty_settings['target_piece_size']
-        margin = 80 
-        
-        piece_positions = {}
-        
-        for i in range(total_pieces):
-            piece_id = f'piece_{i}'
-            
-            # x,y boundaries (with small margin)
-            max_x = max(margin, window_width - avg_piece_size - margin)
-            max_y = max(margin, window_height - avg_piece_size - margin)
-            
-            # generate x,y coordinates
-            x = random.randint(margin, max_x)
-            y = random.randint(margin, max_y)
-            piece_positions[piece_id] = {'x': x, 'y': y}
-        
-        return piece_positions
+        piece_size = self.difficulty_settings['target_piece_size']
+        positions = jittered_grid(total_pieces, WINDOW_WIDTH, WINDOW_HEIGHT, piece_size, SCATTER_MARGIN, seed)
+        return {f'piece_{i}': {'x': x, 'y': y} for i, (x, y) in enumerate(positions)}
+
+    def _calculate_board_geometry(self):
+        """
+        Board layout shared with clients: grid size, piece size and the
+        board's top-left corner (centered in the window).
+        """
+        grid_cols, grid_rows = self.difficulty_settings['grid']
+        piece_size = self.difficulty_settings['target_piece_size']
+        return {
+            'x': (WINDOW_WIDTH - grid_cols * piece_size) // 2,
+            'y': (WINDOW_HEIGHT - grid_rows * piece_size) // 2,
+            'cols': grid_cols,
+            'rows': grid_rows,
+            'piece_width': piece_size,
+            'piece_height': piece_size
+        }
+
+    def _calculate_correct_positions(self):
+        """
+        Map each piece_id to its position on the board (row-major ids).
+        """
+        board = self.board
+        correct_positions = {}
+        for row in range(board['rows']):
+            for col in range(board['cols']):
+                piece_id = f'piece_{row * board["cols"] + col}'
+                correct_positions[piece_id] = {
+                    'x': board['x'] + col * board['piece_width'],
+                    'y': board['y'] + row * board['piece_height']
+                }
+        return correct_positions
     
     # -------------------------------------------------------------------------
     # Player Management
@@ -78,6 +137,10 @@ class GameRoom:
         if len(self.players) >= self.max_players:
             return False
         self.players.append(client_address)
+
+        # Rooms restored after a restart have no host until someone joins
+        if self.host_address is None:
+            self.host_address = client_address
         return True
 
     def remove_player(self, client_address):
@@ -89,11 +152,14 @@ class GameRoom:
         if client_address in self.players:
             # Remove from players array
             self.players.remove(client_address)
+            self.viewports.pop(client_address, None)
 
             # Remove any locks held by this player
             to_remove = [obj for obj, addr in self.locked_objects.items() if addr == client_address]
             for obj in to_remove:
+                self._cancel_lease(obj)
                 del self.locked_objects[obj]
+                self.object_locks.discard(obj)
 
             # If host left, assign new host if possible
             host_changed = False
@@ -107,6 +173,33 @@ class GameRoom:
             return host_changed
         return False
 
+    def add_spectator(self, client_address):
+        """
+        Add a read-only spectator. Returns True if added, otherwise False.
+        """
+        if client_address in self.spectators or client_address in self.players:
+            return False
+        if len(self.spectators) >= MAX_SPECTATORS:
+            return False
+        self.spectators.add(client_address)
+        return True
+
+    def remove_spectator(self, client_address):
+        self.spectators.discard(client_address)
+        if not self.spectators:
+            self.spectator_moves.clear()
+
+    def take_spectator_moves(self):
+        """
+        Return {anchor_id: position} of the groups still being dragged that
+        moved since the last call. Released groups are left out; their
+        final position went to spectators with the release broadcast.
+        """
+        moves = {object_id: self.piece_positions[object_id]
+                 for object_id in self.spectator_moves if object_id in self.locked_objects}
+        self.spectator_moves.clear()
+        return moves
+
     def is_full(self):
         return len(self.players) >= self.max_players
 
@@ -133,6 +226,8 @@ class GameRoom:
         """
         if piece_id in self.piece_positions:
             self.piece_positions[piece_id] = position
+            self._update_correctness(piece_id, position)
+            self.piece_index.insert(piece_id, position['x'], position['y'])
             return True
         return False
 
@@ -147,6 +242,96 @@ class GameRoom:
         Get the current position of a specific piece.
         """
         return self.piece_positions.get(piece_id)
+
+    # -------------------------------------------------------------------------
+    # Placement
+
+    def _distance(self, position, target):
+        return ((position['x'] - target['x']) ** 2 + (position['y'] - target['y']) ** 2) ** 0.5
+
+    def _update_correctness(self, piece_id, position):
+        """
+        Keep the correct-piece set in sync with a single position change.
+        """
+        correct_position = self.correct_positions.get(piece_id)
+        if correct_position and self._distance(position, correct_position) <= self.snap_tolerance:
+            self.correct_pieces.add(piece_id)
+        else:
+            self.correct_pieces.discard(piece_id)
+
+    def _iter_group_neighbours(self, object_id):
+        """
+        Yield (member_id, neighbour_id, expected_position) for every grid
+        neighbour of object_id's group that is outside the group and not
+        locked, where expected_position is where the member would sit if it
+        were joined to that neighbour.
+        """
+        board = self.board
+        members = self.piece_groups.get_members(object_id)
+        member_set = set(members)
+        for member_id in members:
+            index = int(member_id.rsplit('_', 1)[1])
+            row, col = divmod(index, board['cols'])
+            for d_col, d_row in ((-1, 0), (1, 0), (0, -1), (0, 1)):
+                n_col, n_row = col + d_col, row + d_row
+                if not (0 <= n_col < board['cols'] and 0 <= n_row < board['rows']):
+                    continue
+                neighbour_id = f'piece_{n_row * board["cols"] + n_col}'
+                if neighbour_id in member_set or neighbour_id in self.locked_objects:
+                    continue
+                neighbour = self.piece_positions[neighbour_id]
+                expected_position = {
+                    'x': neighbour['x'] - d_col * board['piece_width'],
+                    'y': neighbour['y'] - d_row * board['piece_height']
+                }
+                yield member_id, neighbour_id, expected_position
+
+    def _find_snap_offset(self, object_id):
+        """
+        Offset that snaps object_id's group onto the board if any member is
+        near its correct position, otherwise against a neighbouring piece.
+        """
+        for member_id in self.piece_groups.get_members(object_id):
+            position = self.piece_positions[member_id]
+            correct_position = self.correct_positions[member_id]
+            if self._distance(position, correct_position) <= self.snap_tolerance:
+                return (correct_position['x'] - position['x'], correct_position['y'] - position['y'])
+
+        for member_id, neighbour_id, expected_position in self._iter_group_neighbours(object_id):
+            position = self.piece_positions[member_id]
+            if self._distance(position, expected_position) <= self.snap_tolerance:
+                return (expected_position['x'] - position['x'], expected_position['y'] - position['y'])
+
+        return (0, 0)
+
+    def _settle_group(self, object_id):
+        """
+        Snap a just-released group into place and merge it with every
+        neighbour it now lines up with.
+        Returns the list of neighbour piece ids that were merged in.
+        """
+        dx, dy = self._find_snap_offset(object_id)
+        if (dx, dy) != (0, 0):
+            anchor = self.piece_positions[object_id]
+            self._move_group_anchor(object_id, {'x': anchor['x'] + dx, 'y': anchor['y'] + dy})
+
+        aligned = [neighbour_id for member_id, neighbour_id, expected_position in self._iter_group_neighbours(object_id)
+                   if self._distance(self.piece_positions[member_id], expected_position) <= 1]
+
+        merged = []
+        for neighbour_id in aligned:
+            if self.piece_groups.union(object_id, neighbour_id):
+                merged.append(neighbour_id)
+        return merged
+
+    def is_complete(self):
+        """
+        Return True if every piece is correctly placed (O(1)).
+        """
+        return len(self.correct_pieces) == len(self.correct_positions)
+
+    def get_correct_count(self):
+        return len(self.correct_pieces)
     
     # -------------------------------------------------------------------------
     # Object Locking
@@ -156,12 +341,16 @@ class GameRoom:
         Attempt to lock an object for a player.
         Returns (success: bool, info: dict).
         """
-        if not object_id:
-            return False, {'error': 'Missing object_id'}
+        if not object_id or object_id not in self.piece_positions:
+            return False, {'error': 'Missing or unknown object_id'}
         if object_id in self.locked_objects:
             return False, {'error': f'Object {object_id} is already locked'}
+        if self.piece_groups.is_grouped(object_id):
+            return False, {'error': f'Object {object_id} is part of a group, lock the group instead'}
         
         self.locked_objects[object_id] = client_address
+        self.object_locks.add(object_id)
+        self._grant_lease(object_id)
         return True, {'message': f'Object {object_id} locked'}
 
     def release_object(self, object_id, client_address, position):
@@ -175,11 +364,18 @@ class GameRoom:
             return False, {'error': f'Object {object_id} not locked by you'}
     
         # Remove from locked objects
+        self._cancel_lease(object_id)
         del self.locked_objects[object_id]
+        self.object_locks.discard(object_id)
         
-        # Update piece position in server state
+        # Update piece position in server state, then snap it into place
         self.update_piece_position(object_id, position)
-        return True, {'message': f'Object {object_id} released'}
+        merged = self._settle_group(object_id)
+        return True, {
+            'message': f'Object {object_id} released',
+            'position': self.piece_positions[object_id],
+            'merged': merged
+        }
 
 
     def move_locked_object(self, object_id, client_address, position):
@@ -193,10 +389,200 @@ class GameRoom:
             return False, {'error': f'Object {object_id} not locked by you'}
         
         # Update piece position in server state
+        current = self.piece_positions[object_id]
+        self.last_move_bounds = self._swept_bounds(current['x'], current['y'], current['x'], current['y'],
+                                                   position['x'] - current['x'], position['y'] - current['y'])
         self.update_piece_position(object_id, position)
+        self._grant_lease(object_id)
+        if self.spectators:
+            self.spectator_moves.add(object_id)
 
         return True, {'message': f'Object {object_id} moved', 'position': position}
 
+    # -------------------------------------------------------------------------
+    # Piece Groups
+    #
+    # A group is addressed by any one of its pieces (the anchor). Moves carry
+    # only the anchor position; the offset is applied to every member here, so
+    # a group costs the same on the wire as a single piece.
+
+    def lock_group(self, object_id, client_address):
+        """
+        Lock every piece in the group containing object_id.
+        Returns (success: bool, info: dict).
+        """
+        if not object_id or object_id not in self.piece_positions:
+            return False, {'error': 'Missing or unknown object_id'}
+
+        members = self.piece_groups.get_members(object_id)
+        if any(piece_id in self.locked_objects for piece_id in members):
+            return False, {'error': f'Group of {object_id} is already locked'}
+
+        for piece_id in members:
+            self.locked_objects[piece_id] = client_address
+        self._grant_lease(object_id)
+        return True, {'message': f'Group of {object_id} locked', 'group_size': len(members)}
+
+    def move_group(self, object_id, client_address, position):
+        """
+        Move a locked group so that its anchor piece is at position.
+        Returns (success: bool, info: dict).
+        """
+        if not object_id or position is None:
+            return False, {'error': 'Missing object_id or position'}
+        if self.locked_objects.get(object_id) != client_address:
+            return False, {'error': f'Group of {object_id} not locked by you'}
+
+        self.last_move_bounds = self._move_group_anchor(object_id, position)
+        self._grant_lease(object_id)
+        if self.spectators:
+            self.spectator_moves.add(object_id)
+        return True, {'message': f'Group of {object_id} moved', 'position': position}
+
+    def release_group(self, object_id, client_address, position):
+        """
+        Release a locked group at position. The server snaps it into place
+        and merges it with any neighbours it lines up with; the final anchor
+        position and merged piece ids are returned in info.
+        Returns (success: bool, info: dict).
+        """
+        if not object_id or position is None:
+            return False, {'error': 'Missing object_id or position'}
+        if self.locked_objects.get(object_id) != client_address:
+            return False, {'error': f'Group of {object_id} not locked by you'}
+
+        self._move_group_anchor(object_id, position)
+
+        # Remove from locked objects (before merging changes the group root)
+        self._cancel_lease(object_id)
+        for piece_id in self.piece_groups.get_members(object_id):
+            self.locked_objects.pop(piece_id, None)
+
+        # Snap into place and merge with aligned neighbours
+        merged = self._settle_group(object_id)
+
+        return True, {
+            'message': f'Group of {object_id} released',
+            'position': self.piece_positions[object_id],
+            'merged': merged
+        }
+
+    def _move_group_anchor(self, object_id, position):
+        """
+        Apply the anchor's displacement to every member of its group.
+        Returns the area the group covered before and after the move.
+        """
+        anchor = self.piece_positions[object_id]
+        dx = position['x'] - anchor['x']
+        dy = position['y'] - anchor['y']
+        left, top = anchor['x'], anchor['y']
+        right, bottom = left, top
+        for piece_id in self.piece_groups.get_members(object_id):
+            current = self.piece_positions[piece_id]
+            x, y = current['x'], current['y']
+            left, top = min(left, x), min(top, y)
+            right, bottom = max(right, x), max(bottom, y)
+            self.update_piece_position(piece_id, {'x': x + dx, 'y': y + dy})
+        return self._swept_bounds(left, top, right, bottom, dx, dy)
+
+    def _swept_bounds(self, left, top, right, bottom, dx, dy):
+        """
+        (left, top, right, bottom) of the area covered by pieces whose
+        top-left corners span left..right, top..bottom, before and after
+        moving them by (dx, dy).
+        """
+        return (left + min(dx, 0), top + min(dy, 0),
+                right + max(dx, 0) + self.board['piece_width'],
+                bottom + max(dy, 0) + self.board['piece_height'])
+
+    def get_groups(self):
+        return self.piece_groups.get_groups()
+
+    # -------------------------------------------------------------------------
+    # Interest Management
+
+    def set_viewport(self, client_address, viewport):
+        """
+        Record the world area (left, top, right, bottom) a player has on
+        screen. Returns False if client_address is not a player here.
+        """
+        if client_address not in self.players:
+            return False
+        self.viewports[client_address] = viewport
+        return True
+
+    def is_in_view(self, client_address, bounds):
+        """
+        True if bounds (left, top, right, bottom) overlaps the player's
+        viewport, or the player has not reported one.
+        """
+        viewport = self.viewports.get(client_address)
+        if viewport is None or bounds is None:
+            return True
+        return (bounds[0] <= viewport[2] and viewport[0] <= bounds[2] and
+                bounds[1] <= viewport[3] and viewport[1] <= bounds[3])
+
+    def get_dragged_in_view(self, client_address):
+        """
+        Return {piece_id: position} for every piece of the groups other
+        players are dragging that overlap the player's viewport. Moves of
+        those groups may have been filtered out while they were outside it.
+        """
+        left, top, right, bottom = self.viewports[client_address]
+        # A piece overlaps the viewport if its top-left corner is at most
+        # one piece size above/left of it
+        left -= self.board['piece_width']
+        top -= self.board['piece_height']
+
+        positions = {}
+        for piece_id in self.piece_index.query(left, top, right, bottom):
+            locker = self.locked_objects.get(piece_id)
+            if locker is None or locker == client_address or piece_id in positions:
+                continue
+            position = self.piece_positions[piece_id]
+            if not (left <= position['x'] <= right and top <= position['y'] <= bottom):
+                continue
+            for member_id in self.piece_groups.get_members(piece_id):
+                positions[member_id] = self.piece_positions[member_id]
+        return positions
+
+    # -------------------------------------------------------------------------
+    # Lock Leases
+    #
+    # Every lock is a lease on its group (keyed by the group root, which
+    # cannot change while the group is locked). Locking and moving renew it;
+    # a holder that goes quiet mid-drag loses the lock after LOCK_LEASE_TTL.
+
+    def _grant_lease(self, object_id):
+        if self.lock_leases is None:
+            self.lock_leases = TimingWheel(LOCK_LEASE_TICK, slots=2 * int(LOCK_LEASE_TTL / LOCK_LEASE_TICK))
+        self.lock_leases.schedule(self.piece_groups.find(object_id), LOCK_LEASE_TTL)
+
+    def _cancel_lease(self, object_id):
+        if self.lock_leases is not None and object_id in self.piece_positions:
+            self.lock_leases.cancel(self.piece_groups.find(object_id))
+
+    def get_lease_count(self):
+        return len(self.lock_leases) if self.lock_leases is not None else 0
+
+    def expire_leases(self):
+        """
+        Return (object_id, holder_address, object_lock) for every lock whose
+        lease ran out. The locks are still held: the server releases them
+        at their last position like any release (see Server.expire_lock_leases).
+        object_lock is True for a lock_object lock, False for a group lock.
+        """
+        if self.lock_leases is None:
+            return []
+
+        expired = []
+        for object_id in self.lock_leases.advance():
+            holder = self.locked_objects.get(object_id)
+            if holder is None:
+                continue
+            expired.append((object_id, holder, object_id in self.object_locks))
+        return expired
+
     def get_locked_objects(self):
         return {
             obj: {"ip": addr[0], "port": addr[1]}
@@ -224,18 +610,58 @@ class GameRoom:
 
     def puzzle_solved(self, client_address):
         """
-        Mark the puzzle as solved.
+        Mark the puzzle as solved, if the server's own state agrees.
         Returns (success: bool, info: dict).
         """
         if self.puzzle_solved_flag:
             return False, {'error': 'Puzzle already solved'}
+        if not self.is_complete():
+            return False, {'error': f'Puzzle not solved ({self.get_correct_count()}/{len(self.correct_positions)} pieces placed)'}
         
         self.puzzle_solved_flag = True
         return True, {'message': 'Puzzle solved!'}
 
+    def check_solved(self):
+        """
+        Called after a release: marks the puzzle solved the first time every
+        piece is in place. Returns True only on that transition.
+        """
+        if self.puzzle_solved_flag or not self.is_complete():
+            return False
+        self.puzzle_solved_flag = True
+        return True
+
     # -------------------------------------------------------------------------
     # Game Room State
+
+    @classmethod
+    def from_state(cls, state):
+        """
+        Rebuild a room from a persisted state dict (see RoomJournal.recover).
+        Player addresses from before the restart are not restored.
+        """
+        positions = {f'piece_{index}': {'x': x, 'y': y} for index, (x, y) in enumerate(state['positions'])}
+        room = cls(state['game_name'], state['max_players'], None, state['image_url'], state['difficulty'], positions)
+        room.game_id = state['game_id']
+        room.players = []
+        room.piece_groups.load_groups([[f'piece_{index}' for index in members] for members in state['groups']])
+        room.puzzle_solved_flag = state['solved']
+        return room
     
+    def get_lobby_summary(self):
+        """
+        Small per-room summary for the lobby listing (no piece state).
+        """
+        return {
+            'game_id': self.game_id,
+            'game_name': self.game_name,
+            'difficulty': self.difficulty,
+            'current_players': self.get_player_count(),
+            'max_players': self.max_players,
+            'spectators': len(self.spectators),
+            'puzzle_solved': self.puzzle_solved_flag
+        }
+
     def get_game_room_state(self):
         """
         Get complete game room state for client communication.
@@ -248,11 +674,14 @@ class GameRoom:
             'current_players': self.get_player_count(),
             'host': self.get_host_info(),
             'players': self.get_players_info(),
+            'spectators': len(self.spectators),
             'is_full': self.is_full(),
             'is_empty': self.is_empty(),
             'image_url': self.image_url,
             'difficulty': self.difficulty,
+            'board': self.board,
             'piece_positions': self.get_piece_positions(),
             'locked_objects': self.get_locked_objects(),
+            'groups': self.get_groups(),
             'puzzle_solved': self.puzzle_solved_flag
         }
\ No newline at end of file
@@ -0,0 +1,339 @@
+import json
+import os
+import queue
+import struct
+import sys
+import threading
+import zlib
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import JOURNAL_SNAPSHOT_EVERY
+from piece_groups import PieceGroups
+
+# Record types
+REC_HOST = 1
+REC_JOIN = 2
+REC_LEAVE = 3
+REC_RELEASE = 4
+REC_SOLVED = 5
+
+# Record header: sequence number, record type, game_id, body length, body crc32
+RECORD_HEADER = struct.Struct('<QB6sII')
+ADDRESS = struct.Struct('<4sH')     # IPv4 address + port
+PIECE_POSITION = struct.Struct('<Iii')
+PIECE_INDEX = struct.Struct('<I')
+COUNT = struct.Struct('<I')
+
+JOURNAL_FILE = 'rooms.journal'
+SNAPSHOT_FILE = 'rooms.snapshot'
+
+def _piece_index(piece_id):
+    return int(piece_id.rsplit('_', 1)[1])
+
+def _pack_string(text):
+    data = text.encode('utf-8')
+    return COUNT.pack(len(data)) + data
+
+def _unpack_string(body, offset):
+    (length,) = COUNT.unpack_from(body, offset)
+    offset += COUNT.size
+    return body[offset:offset + length].decode('utf-8'), offset + length
+
+def _pack_address(address):
+    return ADDRESS.pack(bytes(int(part) for part in address[0].split('.')), address[1])
+
+def _unpack_address(body, offset):
+    ip, port = ADDRESS.unpack_from(body, offset)
+    return ('.'.join(str(part) for part in ip), port), offset + ADDRESS.size
+
+class RoomJournal:
+    def __init__(self, data_dir, snapshot_every=JOURNAL_SNAPSHOT_EVERY):
+        """
+        Append-only binary journal of GameRoom mutations plus periodic
+        snapshots. Handlers only enqueue records; a writer thread encodes,
+        appends and fsyncs them in batches, and also applies them to its own
+        shadow copy of every room, so snapshots never touch live rooms.
+        """
+        self.data_dir = data_dir
+        self.journal_path = os.path.join(data_dir, JOURNAL_FILE)
+        self.snapshot_path = os.path.join(data_dir, SNAPSHOT_FILE)
+        self.snapshot_every = snapshot_every
+
+        self.rooms = {}             # game_id -> shadow room state
+        self.sequence = 0           # last sequence number written
+        self.records_since_snapshot = 0
+
+        self.queue = queue.SimpleQueue()
+        self.journal_file = None
+        self.writer_thread = None
+
+    # -------------------------------------------------------------------------
+    # Startup / Shutdown
+
+    def recover(self):
+        """
+        Rebuild room states from the latest snapshot plus the journal tail,
+        then compact them into a fresh snapshot and start the writer.
+        Returns a list of room state dicts (see GameRoom.from_state).
+        """
+        os.makedirs(self.data_dir, exist_ok=True)
+        self._load_snapshot()
+        self._replay_journal()
+
+        # Nobody is connected after a restart
+        for state in self.rooms.values():
+            state['players'] = []
+            state['host'] = None
+
+        self._write_snapshot()
+        self.journal_file = open(self.journal_path, 'wb')
+
+        self.writer_thread = threading.Thread(target=self._writer_loop)
+        self.writer_thread.daemon = True
+        self.writer_thread.start()
+
+        return [self._export_state(state) for state in self.rooms.values()]
+
+    def close(self):
+        """
+        Flush every queued record and stop the writer.
+        """
+        if self.writer_thread:
+            self.queue.put(None)
+            self.writer_thread.join()
+            self.writer_thread = None
+
+    # -------------------------------------------------------------------------
+    # Logging (called from handlers; never blocks on I/O)
+
+    def log_host(self, room):
+        positions = [(_piece_index(piece_id), pos['x'], pos['y']) for piece_id, pos in room.piece_positions.items()]
+        self.queue.put((REC_HOST, room.game_id, (room.game_name, room.max_players, room.image_url,
+                                                 room.difficulty, room.host_address, positions)))
+
+    def log_join(self, game_id, client_address):
+        self.queue.put((REC_JOIN, game_id, client_address))
+
+    def log_leave(self, game_id, client_address):
+        self.queue.put((REC_LEAVE, game_id, client_address))
+
+    def log_release(self, room, object_id, merged):
+        positions = [(_piece_index(piece_id), room.piece_positions[piece_id]['x'], room.piece_positions[piece_id]['y'])
+                     for piece_id in room.piece_groups.get_members(object_id)]
+        self.queue.put((REC_RELEASE, room.game_id, (_piece_index(object_id), positions,
+                                                    [_piece_index(piece_id) for piece_id in merged])))
+
+    def log_solved(self, game_id):
+        self.queue.put((REC_SOLVED, game_id, None))
+
+    # -------------------------------------------------------------------------
+    # Writer Thread
+
+    def _writer_loop(self):
+        """
+        Drain the queue in batches: one write + fsync per batch (group commit).
+        """
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            chunks = []
+            for item in batch:
+                if item is None:
+                    running = False
+                    continue
+                record_type, game_id, data = item
+                try:
+                    body = self._encode_body(record_type, data)
+                    header = RECORD_HEADER.pack(self.sequence + 1, record_type, game_id.encode('ascii'),
+                                                len(body), zlib.crc32(body))
+                except (struct.error, TypeError, ValueError, AttributeError) as e:
+                    # One bad record must not stop persistence for every room
+                    print(f"Journal record {record_type} of room {game_id} skipped: {e}")
+                    continue
+                self.sequence += 1
+                chunks.append(header)
+                chunks.append(body)
+                self._apply(record_type, game_id, body)
+                self.records_since_snapshot += 1
+
+            try:
+                if chunks:
+                    self.journal_file.write(b''.join(chunks))
+                    self.journal_file.flush()
+                    os.fsync(self.journal_file.fileno())
+
+                if self.records_since_snapshot >= self.snapshot_every:
+                    self._compact()
+            except OSError as e:
+                print(f"Journal write failed: {e}")
+
+        self.journal_file.close()
+
+    def _compact(self):
+        """
+        Write a snapshot of the shadow state and start a new, empty journal.
+        """
+        self._write_snapshot()
+        self.journal_file.close()
+        self.journal_file = open(self.journal_path, 'wb')
+
+    # -------------------------------------------------------------------------
+    # Record Encoding
+
+    def _encode_body(self, record_type, data):
+        if record_type == REC_HOST:
+            game_name, max_players, image_url, difficulty, host_address, positions = data
+            return b''.join([
+                _pack_string(game_name), COUNT.pack(max_players), _pack_string(image_url),
+                _pack_string(difficulty), _pack_address(host_address), COUNT.pack(len(positions)),
+                *(PIECE_POSITION.pack(*position) for position in positions)
+            ])
+        if record_type in (REC_JOIN, REC_LEAVE):
+            return _pack_address(data)
+        if record_type == REC_RELEASE:
+            anchor, positions, merged = data
+            return b''.join([
+                PIECE_INDEX.pack(anchor), COUNT.pack(len(positions)),
+                *(PIECE_POSITION.pack(*position) for position in positions),
+                COUNT.pack(len(merged)), *(PIECE_INDEX.pack(index) for index in merged)
+            ])
+        return b''
+
+    def _apply(self, record_type, game_id, body):
+        """
+        Apply one record to the shadow state (used both live and on replay).
+        """
+        if record_type == REC_HOST:
+            game_name, offset = _unpack_string(body, 0)
+            (max_players,) = COUNT.unpack_from(body, offset)
+            image_url, offset = _unpack_string(body, offset + COUNT.size)
+            difficulty, offset = _unpack_string(body, offset)
+            host_address, offset = _unpack_address(body, offset)
+            (count,) = COUNT.unpack_from(body, offset)
+            positions = [None] * count
+            for index, x, y in PIECE_POSITION.iter_unpack(body[offset + COUNT.size:]):
+                positions[index] = [x, y]
+            self.rooms[game_id] = {
+                'game_id': game_id, 'game_name': game_name, 'max_players': max_players,
+                'image_url': image_url, 'difficulty': difficulty, 'host': host_address,
+                'players': [host_address], 'positions': positions,
+                'groups': PieceGroups(range(count)), 'solved': False
+            }
+            return
+
+        state = self.rooms.get(game_id)
+        if state is None:
+            return
+
+        if record_type == REC_JOIN:
+            address, _ = _unpack_address(body, 0)
+            state['players'].append(address)
+            if state['host'] is None:
+                state['host'] = address
+
+        elif record_type == REC_LEAVE:
+            address, _ = _unpack_address(body, 0)
+            if address in state['players']:
+                state['players'].remove(address)
+            if not state['players']:
+                del self.rooms[game_id]
+            elif state['host'] == address:
+                state['host'] = state['players'][0]
+
+        elif record_type == REC_RELEASE:
+            (anchor,) = PIECE_INDEX.unpack_from(body, 0)
+            (count,) = COUNT.unpack_from(body, PIECE_INDEX.size)
+            offset = PIECE_INDEX.size + COUNT.size
+            end = offset + count * PIECE_POSITION.size
+            for index, x, y in PIECE_POSITION.iter_unpack(body[offset:end]):
+                state['positions'][index] = [x, y]
+            for (index,) in PIECE_INDEX.iter_unpack(body[end + COUNT.size:]):
+                state['groups'].union(anchor, index)
+
+        elif record_type == REC_SOLVED:
+            state['solved'] = True
+
+    # -------------------------------------------------------------------------
+    # Snapshot / Replay
+
+    def _export_state(self, state):
+        """
+        Shadow state -> plain (JSON-friendly) room state dict.
+        """
+        return {
+            'game_id': state['game_id'],
+            'game_name': state['game_name'],
+            'max_players': state['max_players'],
+            'image_url': state['image_url'],
+            'difficulty': state['difficulty'],
+            'host': state['host'],
+            'players': state['players'],
+            'positions': state['positions'],
+            'groups': state['groups'].get_groups() if isinstance(state['groups'], PieceGroups) else state['groups'],
+            'solved': state['solved']
+        }
+
+    def _write_snapshot(self):
+        """
+        Atomically replace the snapshot file (write temp file, fsync, rename).
+        """
+        snapshot = {
+            'sequence': self.sequence,
+            'rooms': [self._export_state(state) for state in self.rooms.values()]
+        }
+        data = zlib.compress(json.dumps(snapshot, separators=(',', ':')).encode('utf-8'))
+
+        temp_path = self.snapshot_path + '.tmp'
+        with open(temp_path, 'wb') as snapshot_file:
+            snapshot_file.write(data)
+            snapshot_file.flush()
+            os.fsync(snapshot_file.fileno())
+        os.replace(temp_path, self.snapshot_path)
+        self.records_since_snapshot = 0
+
+    def _load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return
+
+        with open(self.snapshot_path, 'rb') as snapshot_file:
+            snapshot = json.loads(zlib.decompress(snapshot_file.read()).decode('utf-8'))
+
+        self.sequence = snapshot['sequence']
+        for state in snapshot['rooms']:
+            groups = PieceGroups(range(len(state['positions'])))
+            groups.load_groups(state['groups'])
+            state['groups'] = groups
+            state['host'] = tuple(state['host']) if state['host'] else None
+            state['players'] = [tuple(player) for player in state['players']]
+            self.rooms[state['game_id']] = state
+
+    def _replay_journal(self):
+        """
+        Apply journal records newer than the snapshot. Stops at the first
+        truncated or corrupt record (a torn write from a crash).
+        """
+        if not os.path.exists(self.journal_path):
+            return
+
+        with open(self.journal_path, 'rb') as journal_file:
+            data = journal_file.read()
+
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            sequence, record_type, game_id, length, crc = RECORD_HEADER.unpack_from(data, offset)
+            body = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(body) != length or zlib.crc32(body) != crc:
+                print(f"Journal: ignoring torn record at offset {offset}")
+                break
+            offset += RECORD_HEADER.size + length
+
+            if sequence <= self.sequence:
+                continue
+            self._apply(record_type, game_id.decode('ascii'), body)
+            self.sequence = sequence
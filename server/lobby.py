@@ -0,0 +1,106 @@
+import bisect
+import heapq
+import itertools
+import threading
+
+LIST_GAMES_DEFAULT_LIMIT = 20
+LIST_GAMES_MAX_LIMIT = 100
+
+class _Bucket:
+    def __init__(self):
+        """
+        The rooms with one (difficulty, open, unsolved) combination.
+        current maps game_id -> the stamp it entered the bucket with;
+        stamps/game_ids are parallel append-only lists in stamp order.
+        Entries whose stamp no longer matches current are dead and
+        skipped, and the lists are compacted when they are mostly dead.
+        """
+        self.current = {}
+        self.stamps = []
+        self.game_ids = []
+
+    def add(self, game_id, stamp):
+        self.current[game_id] = stamp
+        self.stamps.append(stamp)
+        self.game_ids.append(game_id)
+
+    def remove(self, game_id):
+        del self.current[game_id]
+        if len(self.stamps) > 2 * len(self.current) + 64:
+            self._compact()
+
+    def _compact(self):
+        live = [(stamp, game_id) for stamp, game_id in zip(self.stamps, self.game_ids)
+                if self.current.get(game_id) == stamp]
+        self.stamps = [stamp for stamp, _ in live]
+        self.game_ids = [game_id for _, game_id in live]
+
+    def iter_after(self, cursor):
+        """
+        Yield live (stamp, game_id) entries with stamp > cursor, in order.
+        """
+        stamps, game_ids, current = self.stamps, self.game_ids, self.current
+        for index in range(bisect.bisect_right(stamps, cursor), len(stamps)):
+            game_id = game_ids[index]
+            if current.get(game_id) == stamps[index]:
+                yield stamps[index], game_id
+
+class LobbyIndex:
+    def __init__(self):
+        """
+        Secondary index of game rooms for the lobby listing. Rooms are
+        bucketed by (difficulty, open, unsolved), so host/join/leave/solve
+        updates are O(1) and a filtered page only touches matching buckets.
+        Every time a room enters a bucket it gets a new global stamp; pages
+        are in stamp order and the cursor is the last stamp returned.
+        """
+        self.lock = threading.Lock()
+        self.buckets = {}       # (difficulty, is_open, is_unsolved) -> _Bucket
+        self.room_keys = {}     # game_id -> bucket key
+        self.stamps = itertools.count(1)
+
+    def update(self, room):
+        """
+        Re-index a room after it was created or its players/solved state changed.
+        """
+        key = (room.difficulty, not room.is_full(), not room.puzzle_solved_flag)
+        with self.lock:
+            old_key = self.room_keys.get(room.game_id)
+            if old_key == key:
+                return
+            if old_key is not None:
+                self.buckets[old_key].remove(room.game_id)
+            self.room_keys[room.game_id] = key
+            self.buckets.setdefault(key, _Bucket()).add(room.game_id, next(self.stamps))
+
+    def remove(self, game_id):
+        """
+        Drop a deleted room from the index.
+        """
+        with self.lock:
+            key = self.room_keys.pop(game_id, None)
+            if key is not None:
+                self.buckets[key].remove(game_id)
+
+    def list_games(self, game_rooms, difficulty=None, not_full=False, not_solved=False,
+                   cursor=0, limit=LIST_GAMES_DEFAULT_LIMIT):
+        """
+        Return (summaries, next_cursor) for one page of rooms matching the
+        filters. next_cursor is None when there are no more pages.
+        """
+        limit = max(1, min(int(limit), LIST_GAMES_MAX_LIMIT))
+        with self.lock:
+            iterators = [bucket.iter_after(cursor) for (bucket_difficulty, is_open, is_unsolved), bucket
+                         in self.buckets.items()
+                         if (difficulty is None or bucket_difficulty == difficulty)
+                         and (is_open or not not_full) and (is_unsolved or not not_solved)]
+
+            # One extra entry tells whether there is a next page
+            page = list(itertools.islice(heapq.merge(*iterators), limit + 1))
+
+        has_more = len(page) > limit
+        page = page[:limit]
+        rooms = [game_rooms.get(game_id) for _, game_id in page]
+        summaries = [room.get_lobby_summary() for room in rooms if room is not None]
+        next_cursor = page[-1][0] if has_more else None
+        return summaries, next_cursor
@@ -2,10 +2,42 @@
 server_main.py
 """
 
+import argparse
+import os
+
 from server import Server
+from constants import RATE_LIMITS
+
+def parse_rate_limit(text):
+    """
+    CLASS=RATE/BURST, e.g. move=40/40. A rate of 0 turns the limit off.
+    """
+    try:
+        name, limit = text.split('=')
+        rate, burst = (float(value) for value in limit.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected CLASS=RATE/BURST, got {text!r}")
+    if name not in RATE_LIMITS or rate < 0 or burst < 1:
+        raise argparse.ArgumentTypeError(f"classes are {', '.join(RATE_LIMITS)}; rate >= 0, burst >= 1")
+    return name, (rate, burst)
 
 def main():
-    server = Server()
+    parser = argparse.ArgumentParser(description="Multiplayer jigsaw server")
+    parser.add_argument('--data-dir', help="persist game rooms in this directory and restore them on startup")
+    parser.add_argument('--port', type=int, default=5555, help="port to listen on (TCP, and UDP for the move channel)")
+    parser.add_argument('--spectator-rate', type=float, default=10.0,
+                        help="position updates per second sent to spectators")
+    parser.add_argument('--record', help="record every room event to this file (see replay.py)")
+    parser.add_argument('--profile-dir', default='.', help="where ADMIN_PROFILE writes profiles")
+    parser.add_argument('--rate-limit', type=parse_rate_limit, action='append', default=[], metavar='CLASS=RATE/BURST',
+                        help="per-connection message limit of a class (move, lock, other); repeatable")
+    parser.add_argument('--scatter-seed', type=int, help="seed for the initial piece scatter (reproducible rooms)")
+    args = parser.parse_args()
+
+    server = Server(data_dir=args.data_dir, record_path=args.record, port=args.port,
+                    spectator_rate=args.spectator_rate, admin_token=os.environ.get('JIGSAW_ADMIN_TOKEN'),
+                    profile_dir=args.profile_dir, rate_limits=dict(args.rate_limit),
+                    scatter_seed=args.scatter_seed)
     server.start()
 
 if __name__ == "__main__":
@@ -0,0 +1,29 @@
+import threading
+from collections import Counter
+
+class Metrics:
+    def __init__(self):
+        """
+        Server-wide counters plus gauges that are computed when read.
+        Returned to clients by GET_METRICS.
+        """
+        self.lock = threading.Lock()
+        self.counters = Counter()
+        self.gauges = {}        # name -> function returning the current value
+
+    def increment(self, name, amount=1):
+        with self.lock:
+            self.counters[name] += amount
+
+    def register_gauge(self, name, function):
+        self.gauges[name] = function
+
+    def snapshot(self):
+        """
+        Return every counter and gauge as a plain dict.
+        """
+        with self.lock:
+            values = dict(self.counters)
+        for name, function in self.gauges.items():
+            values[name] = function()
+        return values
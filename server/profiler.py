@@ -0,0 +1,263 @@
+import collections
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from constants import PROFILE_SAMPLE_INTERVAL
+
+PROFILE_MODES = ('sample', 'timing')
+
+# Server methods timed in 'timing' mode besides the message handlers
+TIMED_METHODS = ['process_message', 'process_batch', 'route_broadcast', 'broadcast_to_room', 'broadcast_to_clients',
+                 'send_spectator_updates', 'reap_idle_clients', 'expire_lock_leases', 'admit_message']
+
+# Serialization functions of the server module timed in 'timing' mode
+TIMED_FUNCTIONS = ['serialize', 'decode_frame']
+
+# Handlers that never return (thread loops) or that drive the profiler
+UNTIMED_HANDLERS = {'handle_client_connection', 'handle_admin_profile'}
+
+# Functions that are on top of a thread's stack while it waits (in recv,
+# accept, a queue get or a sleep) rather than works
+IDLE_FUNCTIONS = {'handle_client_connection', '_write_loop', 'accept', 'run_timers', 'run_udp',
+                  'run_spectator_updates', 'wait', '_bootstrap_inner'}
+
+# Functions listed in a sampling profile
+SAMPLE_REPORT_SIZE = 60
+
+class ServerProfiler:
+    def __init__(self, server, output_dir='.'):
+        """
+        Profiles a running Server for a bounded window, started and stopped
+        with ADMIN_PROFILE. 'sample' mode reads every thread's stack every
+        PROFILE_SAMPLE_INTERVAL seconds; 'timing' mode wraps the message
+        handlers, broadcasting and serialization with timers. Nothing is
+        installed while no profile runs. Results are written as JSON to
+        output_dir when the window ends or the profile is stopped.
+        """
+        self.server = server
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.mode = None
+        self.started = None
+        self.deadline = None
+        self.last_path = None
+
+        # 'timing' mode: name -> [calls, total seconds, max seconds]
+        self.timings = {}
+        self.timings_lock = threading.Lock()
+
+        # 'sample' mode
+        self.samples = 0            # thread stacks seen working
+        self.idle_samples = 0       # thread stacks seen waiting
+        self.self_samples = collections.Counter()
+        self.inclusive_samples = collections.Counter()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, mode, duration):
+        """
+        Start profiling for duration seconds. Returns an error message, or
+        None if profiling started.
+        """
+        if mode not in PROFILE_MODES:
+            return f"Unknown profile mode: {mode}"
+        with self.lock:
+            if self.is_running():
+                return f"A '{self.mode}' profile is already running"
+            self.mode = mode
+            self.started = time.time()
+            self.deadline = time.monotonic() + duration
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, args=(mode,))
+            self.thread.daemon = True
+            self.thread.start()
+        print(f"[PERF] Started '{mode}' profile for {duration:.0f} s")
+        return None
+
+    def stop(self):
+        """
+        Stop a running profile early and wait until its results are written.
+        """
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout=5.0)
+
+    def status(self):
+        running = self.is_running()
+        return {
+            'running': running,
+            'mode': self.mode if running else None,
+            'remaining': max(0.0, round(self.deadline - time.monotonic(), 1)) if running else 0.0,
+            'path': self.last_path
+        }
+
+    def _run(self, mode):
+        """
+        Thread function: profile until the deadline or stop(), then write the results.
+        """
+        if mode == 'timing':
+            self._install_timers()
+        else:
+            self._reset_samples()
+        try:
+            while not self.stop_event.is_set():
+                remaining = self.deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if mode == 'sample':
+                    self._take_sample()
+                    self.stop_event.wait(min(PROFILE_SAMPLE_INTERVAL, remaining))
+                else:
+                    self.stop_event.wait(remaining)
+        finally:
+            if mode == 'timing':
+                self._remove_timers()
+            self.last_path = self._write_results(mode)
+
+    # -------------------------------------------------------------------------
+    # Timing mode
+
+    def _install_timers(self):
+        """
+        Shadow the server's methods (and its module's serialization
+        functions) with timed wrappers. Every call site looks them up on
+        self or in the module globals, so calls made from now on are timed.
+        """
+        self.timings = {}
+        server = self.server
+        names = [name for name in dir(type(server))
+                 if name.startswith('handle_') and name not in UNTIMED_HANDLERS]
+        for name in names + TIMED_METHODS:
+            setattr(server, name, self._timed(name, getattr(server, name)))
+
+        module = sys.modules[type(server).__module__]
+        for name in TIMED_FUNCTIONS:
+            setattr(module, name, self._timed(name, getattr(module, name)))
+
+    def _remove_timers(self):
+        server = self.server
+        for name in list(vars(server)):
+            if name.startswith('handle_') or name in TIMED_METHODS:
+                delattr(server, name)
+
+        module = sys.modules[type(server).__module__]
+        for name in TIMED_FUNCTIONS:
+            setattr(module, name, getattr(module, name).__wrapped__)
+
+    def _timed(self, name, function):
+        stats = self.timings.setdefault(name, [0, 0.0, 0.0])
+        lock = self.timings_lock
+
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats[0] += 1
+                    stats[1] += elapsed
+                    if elapsed > stats[2]:
+                        stats[2] = elapsed
+        return timed
+
+    def _timing_results(self):
+        """
+        Per-function call counts and times (inclusive of what they call),
+        most total time first.
+        """
+        with self.timings_lock:
+            rows = [(name, calls, total, longest) for name, (calls, total, longest) in self.timings.items() if calls]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return [{
+            'function': name,
+            'calls': calls,
+            'total_ms': round(total * 1000, 3),
+            'mean_us': round(total / calls * 1e6, 1),
+            'max_us': round(longest * 1e6, 1)
+        } for name, calls, total, longest in rows]
+
+    # -------------------------------------------------------------------------
+    # Sampling mode
+
+    def _reset_samples(self):
+        self.samples = 0
+        self.idle_samples = 0
+        self.self_samples = collections.Counter()
+        self.inclusive_samples = collections.Counter()
+
+    def _take_sample(self):
+        """
+        Record the stack of every thread that is working (not waiting) right now.
+        """
+        own_ident = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            if frame.f_code.co_name in IDLE_FUNCTIONS:
+                self.idle_samples += 1
+                continue
+            self.samples += 1
+            self.self_samples[_frame_label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = _frame_label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self.inclusive_samples[label] += 1
+                frame = frame.f_back
+
+    def _sample_results(self):
+        """
+        Functions by share of working samples they were on the stack in
+        (inclusive) and on top of it (self).
+        """
+        if not self.samples:
+            return []
+        return [{
+            'function': label,
+            'inclusive_pct': round(100 * count / self.samples, 1),
+            'self_pct': round(100 * self.self_samples[label] / self.samples, 1)
+        } for label, count in self.inclusive_samples.most_common(SAMPLE_REPORT_SIZE)]
+
+    # -------------------------------------------------------------------------
+
+    def _write_results(self, mode):
+        """
+        Write the profile to a timestamped JSON file in output_dir and return its path.
+        """
+        elapsed = time.time() - self.started
+        result = {'mode': mode, 'started': self.started, 'seconds': round(elapsed, 3)}
+        if mode == 'timing':
+            result['functions'] = self._timing_results()
+        else:
+            result['interval'] = PROFILE_SAMPLE_INTERVAL
+            result['working_samples'] = self.samples
+            result['idle_samples'] = self.idle_samples
+            result['functions'] = self._sample_results()
+
+        name = time.strftime('profile-%Y%m%d-%H%M%S', time.localtime(self.started)) + f'-{mode}.json'
+        path = os.path.join(self.output_dir, name)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump(result, f, indent=2)
+        except OSError as e:
+            print(f"Failed to write profile: {e}")
+            return None
+        print(f"[PERF] '{mode}' profile of {elapsed:.1f} s written to {path}")
+        return path
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
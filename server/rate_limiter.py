@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import Counter
+import sys
+import os
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from protocol import *
+
+# Message class of every rate limited message type; the rest are 'other'
+MESSAGE_CLASSES = {
+    MSG_MOVE_LOCKED_OBJECT: 'move',
+    MSG_MOVE_GROUP: 'move',
+    MSG_LOCK_OBJECT: 'lock',
+    MSG_RELEASE_OBJECT: 'lock',
+    MSG_LOCK_GROUP: 'lock',
+    MSG_RELEASE_GROUP: 'lock',
+    MSG_PUZZLE_SOLVED: 'lock'
+}
+
+# What to do with a message (see ConnectionRateLimiter.admit)
+ADMITTED = 'admitted'
+COALESCED = 'coalesced'     # an over-limit move, kept until tokens are back unless a newer one supersedes it
+REJECTED = 'rejected'
+DISCONNECT = 'disconnect'   # out of strikes: close the connection
+DROPPED = 'dropped'         # the connection is being closed
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        """
+        Refills rate tokens per second up to burst, starting full.
+        """
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def take(self, now, amount=1):
+        """
+        Take amount tokens if at least one is left. The bucket may go into
+        debt (a large BATCH), which later messages then wait out.
+        """
+        if self.refill(now) < 1:
+            return False
+        self.tokens -= amount
+        return True
+
+class ConnectionRateLimiter:
+    def __init__(self, limits, strikes):
+        """
+        Rate limits of one connection: a token bucket per message class
+        (limits is {class: (per second, burst)}, a rate of 0 means no
+        limit) and a bucket of strikes (per second, burst) that every
+        over-limit message takes one from. Out of strikes means disconnect.
+        """
+        self.lock = threading.Lock()    # the connection's reader, the UDP thread and the timers
+        self.buckets = {name: TokenBucket(rate, burst) for name, (rate, burst) in limits.items() if rate}
+        self.strikes = TokenBucket(*strikes)
+        self.pending_moves = {}         # (msg_type, object_id) -> latest coalesced move
+        self.closed = False
+
+    def admit(self, message):
+        """
+        Charge a message to its bucket and say what to do with it: ADMITTED,
+        COALESCED (kept in pending_moves), REJECTED, DISCONNECT or DROPPED.
+        A BATCH is charged one token per operation to each class it uses.
+        """
+        msg_type = message.get('type')
+        payload = message.get('payload')
+        object_id = payload.get('object_id') if isinstance(payload, dict) else None
+        if not isinstance(object_id, str):
+            object_id = None
+        now = time.monotonic()
+
+        with self.lock:
+            if self.closed:
+                return DROPPED
+
+            if msg_type == MSG_BATCH:
+                admitted = self._take_batch(payload, now)
+                message_class = None
+            else:
+                message_class = MESSAGE_CLASSES.get(msg_type, 'other')
+                bucket = self.buckets.get(message_class)
+                admitted = bucket is None or bucket.take(now)
+
+            if admitted:
+                # A newer move or a release supersedes a coalesced move
+                if message_class in ('move', 'lock'):
+                    self.pending_moves.pop((MSG_MOVE_GROUP, object_id), None)
+                    self.pending_moves.pop((MSG_MOVE_LOCKED_OBJECT, object_id), None)
+                return ADMITTED
+
+            if not self.strikes.take(now):
+                self.closed = True
+                self.pending_moves.clear()
+                return DISCONNECT
+            if message_class == 'move':
+                self.pending_moves[(msg_type, object_id)] = message
+                return COALESCED
+            return REJECTED
+
+    def _take_batch(self, payload, now):
+        operations = payload.get('operations') if isinstance(payload, dict) else None
+        if not isinstance(operations, list):
+            operations = []
+        counts = Counter(MESSAGE_CLASSES.get(operation.get('type'), 'other') if isinstance(operation, dict)
+                         else 'other' for operation in operations)
+        buckets = [(self.buckets[name], count) for name, count in counts.items() if name in self.buckets]
+        if any(bucket.refill(now) < 1 for bucket, _ in buckets):
+            return False
+        for bucket, count in buckets:
+            bucket.take(now, count)
+        return True
+
+    def take_coalesced(self):
+        """
+        Remove and return the coalesced moves the move bucket has tokens for now.
+        """
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get('move')
+            moves = []
+            for key in list(self.pending_moves):
+                if bucket is not None and not bucket.take(now):
+                    break
+                moves.append(self.pending_moves.pop(key))
+            return moves
@@ -0,0 +1,79 @@
+import socket
+import struct
+import threading
+import time
+
+# Event types
+EVENT_HOST = 1
+EVENT_JOIN = 2
+EVENT_LEAVE = 3
+EVENT_LOCK = 4
+EVENT_MOVE = 5
+EVENT_RELEASE = 6
+EVENT_SOLVED = 7
+
+EVENT_NAMES = {
+    EVENT_HOST: 'HOST', EVENT_JOIN: 'JOIN', EVENT_LEAVE: 'LEAVE', EVENT_LOCK: 'LOCK',
+    EVENT_MOVE: 'MOVE', EVENT_RELEASE: 'RELEASE', EVENT_SOLVED: 'SOLVED'
+}
+
+# Flags
+FLAG_GROUP = 0x01           # LOCK/MOVE/RELEASE addressed a whole group
+
+# File header, then fixed-size records:
+# monotonic ns, event type, game_id, client IPv4 + port, piece index, x, y, flags
+FILE_MAGIC = b'JIGREC01'
+RECORD = struct.Struct('<QB6s4sHIiiB')
+
+# Buffered records are flushed at least this often (seconds), so a crash
+# loses at most this much of the recording
+FLUSH_INTERVAL = 1.0
+
+# HOST records store the difficulty as an index into this tuple
+DIFFICULTIES = ('easy', 'medium', 'hard')
+
+class RoomRecorder:
+    def __init__(self, path):
+        """
+        Record every room event to a compact binary file of fixed-size
+        records, so real traffic can be replayed later (see replay.py).
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = open(path, 'wb')
+        self.file.write(FILE_MAGIC)
+        self.count = 0
+        self.last_flush = time.monotonic()
+
+    def record(self, event, game_id, client_address, object_id=None, position=None, flags=0):
+        """
+        Append one event. object_id is a 'piece_<n>' id; position is {'x', 'y'}.
+        """
+        index = int(object_id.rsplit('_', 1)[1]) if object_id else 0
+        x, y = (int(position['x']), int(position['y'])) if position else (0, 0)
+        self._write(event, game_id, client_address, index, x, y, flags)
+
+    def record_host(self, room):
+        """
+        HOST carries max_players in the piece index field and the
+        difficulty in the flags field.
+        """
+        self._write(EVENT_HOST, room.game_id, room.host_address, room.max_players, 0, 0,
+                    DIFFICULTIES.index(room.difficulty))
+
+    def _write(self, event, game_id, client_address, index, x, y, flags):
+        game_id = game_id.encode('ascii')
+        ip = socket.inet_aton(client_address[0])
+        with self.lock:
+            # Timestamp under the lock so records are in time order on disk
+            now = time.monotonic_ns()
+            self.file.write(RECORD.pack(now, event, game_id, ip, client_address[1], index, x, y, flags))
+            self.count += 1
+            if now / 1e9 - self.last_flush >= FLUSH_INTERVAL:
+                self.file.flush()
+                self.last_flush = now / 1e9
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+        print(f"Recorded {self.count} events to {self.path}")
@@ -0,0 +1,214 @@
+"""
+replay.py
+
+Re-drive a recording made with `server/main.py --record <file>` into a
+running server, one TCP connection per recorded client:
+
+    python server/replay.py <file> [--host 127.0.0.1] [--port 5555] [--speed 1]
+    python server/replay.py <file> --speed 0      # as fast as possible
+    python server/replay.py <file> --summary      # event counts only
+"""
+
+import argparse
+import mmap
+import socket
+import sys
+import os
+import threading
+import time
+from collections import Counter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
+from protocol import *
+from constants import HEARTBEAT_INTERVAL
+from recorder import *
+
+HOST_ACK_TIMEOUT = 5.0
+
+class ReplayConnection:
+    def __init__(self, host, port):
+        """
+        One replayed client. A reader thread drains everything the server
+        sends (so it never blocks on a full socket) and picks out HOST acks.
+        """
+        self.socket = socket.create_connection((host, port))
+        self.hosted_game_id = None
+        self.hosted = threading.Event()
+        self.bytes_received = 0
+
+        self.reader_thread = threading.Thread(target=self._read_loop)
+        self.reader_thread.daemon = True
+        self.reader_thread.start()
+
+        # Keep idle replayed clients from being reaped
+        self.closed = threading.Event()
+        self.heartbeat_thread = threading.Thread(target=self._heartbeat_loop)
+        self.heartbeat_thread.daemon = True
+        self.heartbeat_thread.start()
+
+    def _heartbeat_loop(self):
+        while not self.closed.wait(HEARTBEAT_INTERVAL):
+            try:
+                self.send(MSG_PING, {})
+            except OSError:
+                break
+
+    def _read_loop(self):
+        reader = MessageReader()
+        try:
+            while True:
+                data = self.socket.recv(65536)
+                if not data:
+                    break
+                self.bytes_received += len(data)
+                for message_data in reader.feed(data):
+                    if self.hosted.is_set():
+                        continue
+                    message = deserialize(message_data)
+                    if message['type'] == MSG_HOST_GAME_ACK:
+                        self.hosted_game_id = message['payload'].get('game_id')
+                        self.hosted.set()
+        except OSError:
+            pass
+
+    def send(self, msg_type, payload):
+        self.socket.sendall(serialize(msg_type, payload))
+
+    def close(self):
+        self.closed.set()
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.socket.close()
+
+def iter_records(data):
+    """
+    Iterate the fixed-size records of a memory-mapped recording
+    (ignoring a partially written last record).
+    """
+    if data[:len(FILE_MAGIC)] != FILE_MAGIC:
+        raise ValueError("Not a room recording")
+    count = (len(data) - len(FILE_MAGIC)) // RECORD.size
+    end = len(FILE_MAGIC) + count * RECORD.size
+    with memoryview(data) as view:
+        yield from RECORD.iter_unpack(view[len(FILE_MAGIC):end])
+
+def summarize(data):
+    """
+    Print event counts, duration and peak events per second.
+    """
+    counts = Counter()
+    per_second = Counter()
+    first = last = None
+    for timestamp, event, *_ in iter_records(data):
+        first = timestamp if first is None else first
+        last = timestamp
+        counts[EVENT_NAMES.get(event, event)] += 1
+        per_second[(timestamp - first) // 1_000_000_000] += 1
+
+    if first is None:
+        print("Empty recording")
+        return
+    print(f"{sum(counts.values())} events over {(last - first) / 1e9:.1f} s "
+          f"(peak {max(per_second.values())} events/s)")
+    for name, count in counts.most_common():
+        print(f"  {name:8} {count}")
+
+def replay(data, host, port, speed, image_url):
+    """
+    Send every recorded event to the server. speed 1.0 keeps the recorded
+    timing, 2.0 is twice as fast, 0 sends as fast as possible.
+    """
+    connections = {}        # recorded (ip, port) -> ReplayConnection
+    game_ids = {}           # recorded game_id -> replayed game_id
+    sent = Counter()
+    skipped = 0
+
+    first_timestamp = None
+    start_time = time.perf_counter()
+
+    for timestamp, event, game_id, ip, client_port, index, x, y, flags in iter_records(data):
+        # Pace events to the recorded timing
+        if first_timestamp is None:
+            first_timestamp = timestamp
+        if speed > 0:
+            delay = (timestamp - first_timestamp) / 1e9 / speed - (time.perf_counter() - start_time)
+            if delay > 0:
+                time.sleep(delay)
+
+        client = (socket.inet_ntoa(ip), client_port)
+        game_id = game_id.decode('ascii')
+        grouped = flags & FLAG_GROUP
+        object_id = f'piece_{index}'
+        position = {'x': x, 'y': y}
+
+        if event == EVENT_HOST:
+            connection = connections[client] = ReplayConnection(host, port)
+            connection.send(MSG_HOST_GAME, {
+                'game_name': f'replay {game_id}', 'max_players': index,
+                'image_url': image_url, 'difficulty': DIFFICULTIES[flags]
+            })
+            # Joins need the new game id, so wait for this one
+            if connection.hosted.wait(HOST_ACK_TIMEOUT) and connection.hosted_game_id:
+                game_ids[game_id] = connection.hosted_game_id
+            sent['HOST'] += 1
+            continue
+
+        if game_id not in game_ids:
+            skipped += 1
+            continue
+
+        if event == EVENT_JOIN:
+            connection = connections[client] = ReplayConnection(host, port)
+            connection.send(MSG_JOIN_GAME, {'game_id': game_ids[game_id]})
+        elif event == EVENT_SOLVED:
+            # The server decides completion itself; nothing to send
+            continue
+        elif client not in connections:
+            skipped += 1
+            continue
+        elif event == EVENT_LEAVE:
+            connections.pop(client).send(MSG_LEAVE_GAME, {})
+        elif event == EVENT_LOCK:
+            connections[client].send(MSG_LOCK_GROUP if grouped else MSG_LOCK_OBJECT, {'object_id': object_id})
+        elif event == EVENT_MOVE:
+            connections[client].send(MSG_MOVE_GROUP if grouped else MSG_MOVE_LOCKED_OBJECT,
+                                     {'object_id': object_id, 'position': position})
+        elif event == EVENT_RELEASE:
+            connections[client].send(MSG_RELEASE_GROUP if grouped else MSG_RELEASE_OBJECT,
+                                     {'object_id': object_id, 'position': position})
+        sent[EVENT_NAMES[event]] += 1
+
+    elapsed = time.perf_counter() - start_time
+    total = sum(sent.values())
+    recorded = (timestamp - first_timestamp) / 1e9 if first_timestamp is not None else 0
+    print(f"Replayed {total} events in {elapsed:.2f} s ({total / max(elapsed, 1e-9):.0f} events/s, "
+          f"recorded over {recorded:.2f} s), skipped {skipped}")
+    for name, count in sent.most_common():
+        print(f"  {name:8} {count}")
+
+    # Let the server drain before disconnecting everyone
+    time.sleep(0.5)
+    for connection in connections.values():
+        connection.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded room event file into a server")
+    parser.add_argument('recording')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5555)
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed multiplier, 0 = as fast as possible")
+    parser.add_argument('--image-url', default='', help="image URL used for replayed rooms")
+    parser.add_argument('--summary', action='store_true', help="print event counts instead of replaying")
+    args = parser.parse_args()
+
+    with open(args.recording, 'rb') as recording_file, \
+            mmap.mmap(recording_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if args.summary:
+            summarize(data)
+        else:
+            replay(data, args.host, args.port, args.speed, args.image_url)
+
+if __name__ == '__main__':
+    main()
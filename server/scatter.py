@@ -0,0 +1,59 @@
+import math
+import random
+
+try:
+    import numpy as np
+except ImportError:     # optional: positions are drawn one by one instead
+    np = None
+
+def grid_shape(count, width, height):
+    """
+    Columns and rows of the grid of most nearly square cells, at least
+    count of them, that covers a width x height area.
+    """
+    cols = max(1, min(count, round(math.sqrt(count * width / height))))
+    return cols, math.ceil(count / cols)
+
+def jittered_grid(count, width, height, piece_size, margin=0, seed=None, use_numpy=True):
+    """
+    Top-left positions for count pieces of piece_size spread over a width x
+    height play area, keeping margin from its edges. The area is cut into a
+    grid of near-square cells, count cells are picked at random and every
+    piece lands at a random spot inside its own cell: while cells are
+    larger than a piece no two pieces overlap, and past that neighbours
+    overlap evenly instead of piling up. The same seed gives the same
+    positions (NumPy and the pure-Python fallback draw different ones).
+    Returns a list of (x, y) ints.
+    """
+    if count <= 0:
+        return []
+    inner_width = max(piece_size, width - 2 * margin)
+    inner_height = max(piece_size, height - 2 * margin)
+    cols, rows = grid_shape(count, inner_width, inner_height)
+    cell_width = inner_width / cols
+    cell_height = inner_height / rows
+
+    # Room to move inside a cell; a negative one centers the piece on it
+    free_x = cell_width - piece_size
+    free_y = cell_height - piece_size
+    max_x = margin + inner_width - piece_size
+    max_y = margin + inner_height - piece_size
+
+    if use_numpy and np is not None:
+        rng = np.random.default_rng(seed)
+        cells = rng.choice(cols * rows, size=count, replace=False)
+        jitter = rng.random((2, count))
+        xs = margin + cells % cols * cell_width + (jitter[0] * free_x if free_x > 0 else free_x / 2)
+        ys = margin + cells // cols * cell_height + (jitter[1] * free_y if free_y > 0 else free_y / 2)
+        xs = np.clip(np.rint(xs), margin, max_x).astype(int)
+        ys = np.clip(np.rint(ys), margin, max_y).astype(int)
+        return list(zip(xs.tolist(), ys.tolist()))
+
+    rng = random.Random(seed)
+    positions = []
+    for cell in rng.sample(range(cols * rows), count):
+        row, col = divmod(cell, cols)
+        x = margin + col * cell_width + (rng.random() * free_x if free_x > 0 else free_x / 2)
+        y = margin + row * cell_height + (rng.random() * free_y if free_y > 0 else free_y / 2)
+        positions.append((min(max(round(x), margin), max_x), min(max(round(y), margin), max_y)))
+    return positions
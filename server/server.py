@@ -1,51 +1,160 @@
+import contextlib
+import hmac
+import math
+import random
+import secrets
 import socket
 import threading
+import time
 import sys
 import os
 
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'shared'))
 from protocol import *
+from constants import (HEARTBEAT_TIMEOUT, HEARTBEAT_TICK, SPECTATOR_UPDATE_RATE,
+                       ADMIN_PROFILE_DEFAULT_SECONDS, ADMIN_PROFILE_MAX_SECONDS, RATE_LIMITS, RATE_LIMIT_STRIKES,
+                       MAX_ROOM_PLAYERS, DIFFICULTY_SETTINGS, MAX_COORDINATE)
 from game_room import GameRoom
+from journal import RoomJournal
+from recorder import *
+from lobby import LobbyIndex, LIST_GAMES_DEFAULT_LIMIT
+from timing_wheel import TimingWheel
+from metrics import Metrics
+from connection import ClientConnection
+from profiler import ServerProfiler
+from rate_limiter import ConnectionRateLimiter, ADMITTED, COALESCED, REJECTED, DISCONNECT
 
 HOST = '0.0.0.0'
 PORT = 5555
 BUFFER_SIZE = 4096
 
+# Messages that change the puzzle, which spectators may not send
+PLAYER_ONLY_MESSAGES = {
+    MSG_LOCK_OBJECT, MSG_RELEASE_OBJECT, MSG_MOVE_LOCKED_OBJECT, MSG_PUZZLE_SOLVED,
+    MSG_LOCK_GROUP, MSG_MOVE_GROUP, MSG_RELEASE_GROUP
+}
+
 class Server:
-    def __init__(self):
+    def __init__(self, data_dir=None, record_path=None, host=HOST, port=PORT,
+                 spectator_rate=SPECTATOR_UPDATE_RATE, admin_token=None, profile_dir='.', rate_limits=None,
+                 scatter_seed=None):
         """
-        Initialize the TCP server
+        Initialize the TCP server.
+        If data_dir is given, rooms are journaled there and restored on startup.
+        If record_path is given, every room event is recorded there for replay.
+        spectator_rate is how many position updates per second spectators get.
+        admin_token enables ADMIN_PROFILE for clients that present it; the
+        profiles are written to profile_dir.
+        rate_limits overrides entries of RATE_LIMITS ({class: (per second, burst)}).
+        scatter_seed makes the initial piece scatter of new rooms reproducible.
         """
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.server_socket.bind((HOST, PORT))
-        self.server_socket.listen(5)
+        self.server_socket.bind((host, port))
+        self.server_socket.listen(128)
+        self.port = self.server_socket.getsockname()[1]   # the real port if 0 was given
         self.is_running = False
 
-        self.clients = []           # (client_socket, client_address)
+        # Optional companion UDP channel for moves, on the same port number
+        self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.udp_socket.bind((host, self.port))
+        self.udp_sessions = {}      # token -> client_address (see handle_open_udp)
+
+        # Room directory. Each GameRoom serializes its own state with
+        # room.lock; directory_lock only covers compound updates of these
+        # dicts (registering/removing rooms and clients). Lock order is
+        # always room.lock -> directory_lock, never the reverse.
+        self.directory_lock = threading.Lock()
+        self.clients = {}           # client_address -> ClientConnection
         self.game_rooms = {}        # game_id -> GameRoom
         self.client_rooms = {}      # client_address -> game_id
+        self.lobby = LobbyIndex()   # open/solved/difficulty index for LIST_GAMES
+
+        # Per-connection token buckets, checked before dispatch
+        self.rate_limits = {**RATE_LIMITS, **(rate_limits or {})}
+        self.rate_limiters = {}     # client_address -> ConnectionRateLimiter
+
+        # Seeds of the rooms' piece scatters: a fixed sequence if seeded
+        self.scatter_seeds = random.Random(scatter_seed)
+
+        # Per-connection heartbeat deadlines; any received data resets them
+        self.heartbeats = TimingWheel(HEARTBEAT_TICK, slots=2 * int(HEARTBEAT_TIMEOUT / HEARTBEAT_TICK))
+
+        # Rooms holding at least one lock lease (the only ones the timer visits)
+        self.leased_rooms = set()
+
+        # Rooms with spectators (the only ones the spectator updates visit)
+        self.spectated_rooms = set()
+        self.spectator_rate = spectator_rate
+
+        self.metrics = Metrics()
+        self.metrics.register_gauge('connections', lambda: len(self.clients))
+        self.metrics.register_gauge('game_rooms', lambda: len(self.game_rooms))
+        self.metrics.register_gauge('lock_leases_active', self.get_active_lease_count)
+        self.metrics.register_gauge('udp_sessions', lambda: len(self.udp_sessions))
+        self.metrics.register_gauge('spectators', self.get_spectator_count)
+
+        # Runtime profiling, started and stopped with ADMIN_PROFILE
+        self.admin_token = admin_token
+        self.profiler = ServerProfiler(self, profile_dir)
+
+        # Optional persistence
+        self.journal = None
+        if data_dir:
+            self.journal = RoomJournal(data_dir)
+            self.restore_rooms()
+
+        # Optional event recording (see replay.py)
+        self.recorder = RoomRecorder(record_path) if record_path else None
+
+    def restore_rooms(self):
+        """
+        Restore every room from the journal's snapshot + replay
+        """
+        start_time = time.perf_counter()
+        for state in self.journal.recover():
+            room = GameRoom.from_state(state)
+            self.game_rooms[room.game_id] = room
+            self.lobby.update(room)
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        print(f"Restored {len(self.game_rooms)} game rooms in {elapsed_ms:.0f} ms")
 
     def start(self):
         """
         Start the server and begin accepting client connections
         """
-        print(f"Server listening on port {PORT}")
-        print(f"Local connection: localhost:{PORT}")
-        print(f"LAN connection: {self.get_local_ip_address()}:{PORT}")
+        print(f"Server listening on port {self.port}")
+        print(f"Local connection: localhost:{self.port}")
+        print(f"LAN connection: {self.get_local_ip_address()}:{self.port}")
         print("Waiting for client connections...")
 
         self.is_running = True
 
+        timer_thread = threading.Thread(target=self.run_timers)
+        timer_thread.daemon = True
+        timer_thread.start()
+
+        udp_thread = threading.Thread(target=self.run_udp)
+        udp_thread.daemon = True
+        udp_thread.start()
+
+        spectator_thread = threading.Thread(target=self.run_spectator_updates)
+        spectator_thread.daemon = True
+        spectator_thread.start()
+
         try:
             while self.is_running:
                 client_socket, client_address = self.server_socket.accept()
-                self.clients.append((client_socket, client_address))
+                connection = ClientConnection(client_socket, client_address, self.metrics)
+                with self.directory_lock:
+                    self.clients[client_address] = connection
+                    self.rate_limiters[client_address] = ConnectionRateLimiter(self.rate_limits, RATE_LIMIT_STRIKES)
+                self.heartbeats.schedule(client_address, HEARTBEAT_TIMEOUT)
 
                 # Handle each client in a separate thread
                 client_thread = threading.Thread(
                     target=self.handle_client_connection, 
-                    args=(client_socket, client_address)
+                    args=(connection,)
                 )
 
                 client_thread.daemon = True
@@ -62,6 +171,11 @@ class Server:
         """
         self.is_running = False
         self.server_socket.close()
+        self.udp_socket.close()
+        if self.journal:
+            self.journal.close()
+        if self.recorder:
+            self.recorder.close()
         print("Server successfully shutdown")
 
     def get_local_ip_address(self):
@@ -79,56 +193,205 @@ class Server:
 
     # -------------------------------------------------------------------------
     
-    def handle_client_connection(self, client_socket, client_address):
+    def handle_client_connection(self, connection):
         """
         Main thread function to handle communication with a single client
         """
+        client_address = connection.address
         print('\n')
         print(f"New connection established from {client_address}")
 
+        reader = MessageReader()
+
         try:
             while self.is_running:
-                received_data = client_socket.recv(BUFFER_SIZE)
+                received_data = connection.socket.recv(BUFFER_SIZE)
                 if not received_data:
                     break
+                self.heartbeats.schedule(client_address, HEARTBEAT_TIMEOUT)
+
+                for message_data in reader.feed(received_data):
+                    try:
+                        # Deserialize message JSON data 
+                        message = deserialize(message_data)
+                        self.process_message(message, connection)
 
-                try:
-                    # Deserialize message JSON data 
-                    message = deserialize(received_data)
-
-                    # Pass it to handler to that returns response to send back
-                    # and broadcast to send to other connected clients
-                    response, broadcast = self.handle_message(message, client_address)
-                    if response:
-                        client_socket.send(response)
-                    if broadcast:
-                        # Determine the type of broadcast and send to the correct room
-                        broadcast_data = json.loads(broadcast.decode('utf-8'))
-                        brod_type = broadcast_data['type']
-                        # For leave game, use the game_id in the payload
-                        if brod_type == MSG_PLAYER_LEFT_BROD:
-                            game_id = broadcast_data['payload']['game_id']
-                            self.broadcast_to_room(broadcast, game_id, exclude=client_socket)
-                        # For all *_BROD messages, broadcast to the sender's room
-                        elif brod_type.endswith('_BROD'):
-                            if client_address in self.client_rooms:
-                                game_id = self.client_rooms[client_address]
-                                self.broadcast_to_room(broadcast, game_id, exclude=client_socket)
-                        else:
-                            # Fallback: broadcast to all clients in the same room
-                            self.broadcast_to_clients(broadcast, client_address, exclude=client_socket)
-
-                except json.JSONDecodeError:
-                    message_str = received_data.decode('utf-8')
-                    print(f"Legacy message from {client_address}: {message_str}")
-                    client_socket.send(received_data)
+                    except json.JSONDecodeError:
+                        print(f"Malformed message from {client_address}: {message_data[:80]!r}")
 
         except ConnectionResetError:
             print(f"Client {client_address} disconnected unexpectedly")
         except Exception as error:
             print(f"Error handling client {client_address}: {error}")
         finally:
-            self.handle_cleanup_client(client_socket, client_address)
+            self.handle_cleanup_client(connection)
+
+    def process_message(self, message, connection, rate_limited=True):
+        """
+        Handle one message and send its response and broadcast, unless the
+        connection's rate limits hold it back (see admit_message).
+        A message that acts on a room runs under that room's lock, including
+        queueing the response and broadcast, so every room applies and fans
+        out its changes in one order. Different rooms never contend.
+        """
+        client_address = connection.address
+        limiter = self.rate_limiters.get(client_address) if rate_limited else None
+        if limiter and not self.admit_message(limiter, message, connection):
+            return
+
+        room = self.get_message_room(message, client_address)
+        with (room.lock if room else contextlib.nullcontext()):
+            if message.get('type') == MSG_BATCH:
+                self.process_batch(message.get('payload') or {}, connection)
+                return
+
+            # Pass it to handler to that returns response to send back
+            # and broadcast to send to other connected clients
+            response, broadcast = self.handle_message(message, client_address)
+            if response:
+                connection.send(response)
+            if broadcast:
+                self.route_broadcast(broadcast, client_address)
+
+    def admit_message(self, limiter, message, connection):
+        """
+        Enforce a connection's rate limits before dispatch, so one flooding
+        client cannot multiply its load across its room. Returns True if
+        the message may be handled now. An over-limit move is coalesced
+        (see flush_coalesced_moves), anything else over the limit is refused,
+        and a client that keeps exceeding its limits is disconnected.
+        """
+        verdict = limiter.admit(message)
+        if verdict == ADMITTED:
+            return True
+        if verdict == COALESCED:
+            self.metrics.increment('rate_limited_moves')
+        elif verdict == REJECTED:
+            self.metrics.increment('rate_limited_messages')
+            connection.send(serialize(MSG_ERROR, {'message': f"Rate limit exceeded for {message.get('type')}"}))
+        elif verdict == DISCONNECT:
+            self.metrics.increment('rate_limit_disconnects')
+            print(f"Client {connection.address} keeps exceeding its rate limits, closing connection")
+            connection.shutdown()
+        return False
+
+    def process_batch(self, payload, connection):
+        """
+        Apply a BATCH's operations in order. process_message holds the
+        sender's room lock for the whole batch, so no other message to the
+        room interleaves with them. An operation that fails does not stop
+        the ones after it; its ERROR is among the responses. All responses
+        go back in one BATCH_ACK and every recipient gets the broadcasts
+        meant for it in one BATCH_BROD, so a batch costs one frame per
+        connection however many operations it carries.
+        """
+        client_address = connection.address
+        operations = payload.get('operations')
+        if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BATCH_OPERATIONS:
+            message = f'A batch carries 1 to {MAX_BATCH_OPERATIONS} operations'
+            connection.send(serialize(MSG_ERROR, {'message': message}))
+            return
+        room = self.game_rooms.get(self.client_rooms.get(client_address))
+        if room is None:
+            connection.send(serialize(MSG_ERROR, {'message': 'Not in any game room'}))
+            return
+        print(f"Received BATCH of {len(operations)} operations from {client_address}")
+
+        # The handlers' serialized messages are spliced into the combined
+        # ones as they are, without decoding and encoding them again
+        responses = []
+        broadcasts = []             # body of every broadcast of the batch, in order
+        recipients = {}             # client_address -> indexes into broadcasts
+        for operation in operations:
+            msg_type = operation.get('type') if isinstance(operation, dict) else None
+            if msg_type not in BATCHABLE_TYPES:
+                error = serialize(MSG_ERROR, {'message': f'Cannot batch {msg_type}'})
+                responses.append(error[FRAME_HEADER.size:])
+                continue
+            response, broadcast = self.handle_message(operation, client_address)
+            if response:
+                responses.extend(split_frames(response))
+            if broadcast:
+                for body in split_frames(broadcast):
+                    brod_type = peek_type(body)
+                    for addr in self.get_batch_recipients(room, brod_type, client_address):
+                        recipients.setdefault(addr, []).append(len(broadcasts))
+                    broadcasts.append(body)
+
+        if responses:
+            connection.send(serialize_bodies(MSG_BATCH_ACK, 'responses', responses))
+
+        # Recipients that get the same broadcasts share one encoded frame
+        frames = {}
+        for addr, indexes in recipients.items():
+            recipient = self.clients.get(addr)
+            if recipient is None:
+                continue
+            key = tuple(indexes)
+            if key not in frames:
+                frames[key] = serialize_bodies(MSG_BATCH_BROD, 'messages', [broadcasts[i] for i in key])
+            recipient.send(frames[key])
+
+        self.metrics.increment('batches')
+        self.metrics.increment('batched_operations', len(operations))
+
+    def get_batch_recipients(self, room, brod_type, client_address):
+        """
+        Who gets a broadcast made by a batched operation, as route_broadcast
+        and broadcast_to_room would send it: the other players (for moves,
+        only those whose viewport it touches) and the spectators (except for
+        moves, which reach them through send_spectator_updates).
+        Must be called right after the operation (it reads last_move_bounds).
+        """
+        interest = room.last_move_bounds if brod_type in INTEREST_FILTERED_TYPES else None
+        recipients = []
+        for addr in room.players:
+            if addr == client_address:
+                continue
+            if interest and not room.is_in_view(addr, interest):
+                self.metrics.increment('moves_filtered')
+                continue
+            recipients.append(addr)
+        if brod_type not in UDP_BROADCAST_TYPES:
+            recipients.extend(room.spectators)
+        return recipients
+
+    def get_message_room(self, message, client_address):
+        """
+        The room a message acts on: the sender's room, or for JOIN_GAME and
+        SPECTATE_GAME the room being entered. None if there is no such room.
+        """
+        game_id = self.client_rooms.get(client_address)
+        if game_id is None and message.get('type') in (MSG_JOIN_GAME, MSG_SPECTATE_GAME):
+            payload = message.get('payload')
+            game_id = payload.get('game_id') if isinstance(payload, dict) else None
+        if not isinstance(game_id, str):
+            return None
+        return self.game_rooms.get(game_id)
+
+    def route_broadcast(self, broadcast, client_address):
+        """
+        Determine the type of broadcast and send it to the correct room
+        """
+        broadcast_data = decode_frame(broadcast)
+        brod_type = broadcast_data['type']
+        # For leave game, use the game_id in the payload
+        if brod_type == MSG_PLAYER_LEFT_BROD:
+            game_id = broadcast_data['payload']['game_id']
+            self.broadcast_to_room(broadcast, game_id, exclude=client_address)
+        # For all *_BROD messages, broadcast to the sender's room
+        # (moves go over the UDP channel of players that have one, and only
+        # to players whose viewport the moving group touches)
+        elif brod_type.endswith('_BROD'):
+            if client_address in self.client_rooms:
+                game_id = self.client_rooms[client_address]
+                room = self.game_rooms.get(game_id)
+                interest = room.last_move_bounds if room and brod_type in INTEREST_FILTERED_TYPES else None
+                self.broadcast_to_room(broadcast, game_id, exclude=client_address,
+                                       unreliable=brod_type in UDP_BROADCAST_TYPES, interest=interest)
+        else:
+            # Fallback: broadcast to all clients in the same room
+            self.broadcast_to_clients(broadcast, client_address, exclude=client_address)
 
     def handle_message(self, message, client_address):
         """
@@ -141,10 +404,14 @@ class Server:
         response = None
         broadcast = None
 
-        if msg_type == MSG_HOST_GAME:
+        if msg_type in PLAYER_ONLY_MESSAGES and self.is_spectator(client_address):
+            response = serialize(MSG_ERROR, {'message': 'Spectators cannot change the puzzle'})
+        elif msg_type == MSG_HOST_GAME:
             response, broadcast = self.handle_host_game(payload, client_address)
         elif msg_type == MSG_JOIN_GAME:
             response, broadcast = self.handle_join_game(payload, client_address)
+        elif msg_type == MSG_SPECTATE_GAME:
+            response, broadcast = self.handle_spectate_game(payload, client_address)
         elif msg_type == MSG_LEAVE_GAME:
             response, broadcast = self.handle_leave_game(client_address)
         elif msg_type == MSG_LOCK_OBJECT:
@@ -155,6 +422,26 @@ class Server:
             response, broadcast = self.handle_move_locked_object(payload, client_address)
         elif msg_type == MSG_PUZZLE_SOLVED:
             response, broadcast = self.handle_puzzle_solved(payload, client_address)
+        elif msg_type == MSG_LOCK_GROUP:
+            response, broadcast = self.handle_lock_group(payload, client_address)
+        elif msg_type == MSG_MOVE_GROUP:
+            response, broadcast = self.handle_move_group(payload, client_address)
+        elif msg_type == MSG_RELEASE_GROUP:
+            response, broadcast = self.handle_release_group(payload, client_address)
+        elif msg_type == MSG_LIST_GAMES:
+            response, broadcast = self.handle_list_games(payload, client_address)
+        elif msg_type == MSG_PING:
+            response = serialize(MSG_PONG, payload)
+        elif msg_type == MSG_GET_METRICS:
+            response = serialize(MSG_GET_METRICS_ACK, {'success': True, 'metrics': self.metrics.snapshot()})
+        elif msg_type == MSG_OPEN_UDP:
+            response, broadcast = self.handle_open_udp(payload, client_address)
+        elif msg_type == MSG_SET_COMPRESSION:
+            response, broadcast = self.handle_set_compression(payload, client_address)
+        elif msg_type == MSG_SET_VIEWPORT:
+            response, broadcast = self.handle_set_viewport(payload, client_address)
+        elif msg_type == MSG_ADMIN_PROFILE:
+            response, broadcast = self.handle_admin_profile(payload, client_address)
         else:
             response = serialize(MSG_ERROR, {'message': f'Unknown message type: {msg_type}'})
 
@@ -172,33 +459,413 @@ class Server:
         else:
             print(f"Client {client_address} is not in any room for broadcasting")
 
-    def broadcast_to_room(self, message_bytes, game_id, exclude=None):
+    def broadcast_to_room(self, message_bytes, game_id, exclude=None, unreliable=False, interest=None):
         """
         Broadcast message to all clients in a specific game room 
-        except the excluded client.
+        except the excluded client address. Callers hold the room's lock.
+        An unreliable message goes as a datagram to players with a UDP channel.
+        If interest (left, top, right, bottom) is given, players whose
+        viewport does not overlap it are skipped.
+        Spectators get every message but unreliable ones (moves), whose
+        positions reach them through send_spectator_updates instead.
         """
-        if game_id not in self.game_rooms:
+        room = self.game_rooms.get(game_id)
+        if room is None:
             return
+        body = message_bytes[FRAME_HEADER.size:]
         
-        room = self.game_rooms[game_id]
-        
-        # Find client sockets for players in this room
-        for sock, addr in self.clients:
-            if addr in room.players and sock != exclude:
-                try:
-                    sock.send(message_bytes)
-                except Exception as e:
-                    print(f"Failed to send to {addr}: {e}")
-
-    def handle_cleanup_client(self, client_socket, client_address):
+        # Queue on the connection of every player in this room
+        for addr in room.players:
+            if addr != exclude:
+                if interest and not room.is_in_view(addr, interest):
+                    self.metrics.increment('moves_filtered')
+                    continue
+                connection = self.clients.get(addr)
+                if not connection:
+                    continue
+                if unreliable and connection.send_datagram(self.udp_socket, body):
+                    continue
+                connection.send(message_bytes)
+
+        if not unreliable:
+            for addr in room.spectators:
+                connection = self.clients.get(addr)
+                if connection:
+                    connection.send(message_bytes)
+
+    def handle_cleanup_client(self, connection):
         """
-        Post cleanup for client after disconnection from server
-        Later this will involve removing the client from game room alongside.
+        Post cleanup for client after disconnection from server.
+        A client that disconnects (or is reaped) while in a room leaves it
+        exactly as if it had sent LEAVE_GAME, so its seat and locks are freed.
         """
-        self.clients = [(sock, addr) for sock, addr in self.clients if sock != client_socket]
-        client_socket.close()
+        client_address = connection.address
+        self.heartbeats.cancel(client_address)
+        with self.directory_lock:
+            self.clients.pop(client_address, None)
+            self.rate_limiters.pop(client_address, None)
+            self.udp_sessions.pop(connection.udp_token, None)
+
+        room = self.get_message_room({}, client_address)
+        if room:
+            with room.lock:
+                _, broadcast = self.handle_leave_game(client_address)
+                if broadcast:
+                    self.broadcast_to_room(broadcast, room.game_id, exclude=client_address)
+
+        connection.close()
         print(f"Connection with {client_address} closed")
 
+    # -------------------------------------------------------------------------
+    # Spectators
+
+    def is_spectator(self, client_address):
+        room = self.game_rooms.get(self.client_rooms.get(client_address))
+        return room is not None and client_address in room.spectators
+
+    def run_spectator_updates(self):
+        """
+        Thread function: send spectators their position updates spectator_rate times a second.
+        """
+        interval = 1.0 / self.spectator_rate
+        next_update = time.monotonic()
+        while self.is_running:
+            next_update += interval
+            time.sleep(max(0.0, next_update - time.monotonic()))
+            self.send_spectator_updates()
+
+    def send_spectator_updates(self):
+        """
+        For every room with spectators, send the latest position of each group
+        moved since the last update. The message is encoded once per room and
+        the same bytes are queued for every spectator, however many moves the
+        players made in between.
+        """
+        with self.directory_lock:
+            spectated_rooms = list(self.spectated_rooms)
+
+        for game_id in spectated_rooms:
+            room = self.game_rooms.get(game_id)
+            if room is None:
+                with self.directory_lock:
+                    self.spectated_rooms.discard(game_id)
+                continue
+
+            with room.lock:
+                moves = room.take_spectator_moves()
+                if not moves:
+                    continue
+                message = serialize(MSG_SPECTATOR_MOVES_BROD, {'moves': moves, 'sent_at': time.perf_counter()})
+                for addr in room.spectators:
+                    connection = self.clients.get(addr)
+                    if connection:
+                        connection.send(message)
+                self.metrics.increment('spectator_updates_sent', len(room.spectators))
+
+    def get_spectator_count(self):
+        with self.directory_lock:
+            spectated_rooms = list(self.spectated_rooms)
+        return sum(len(self.game_rooms[game_id].spectators)
+                   for game_id in spectated_rooms if game_id in self.game_rooms)
+
+    def evict_spectators(self, room):
+        """
+        Tell the spectators of a room being deleted and unregister them.
+        """
+        broadcast_payload = {
+            'game_id': room.game_id,
+            'player': None,
+            'current_players': 0,
+            'players': [],
+            'host_changed': False,
+            'host': None,
+            'room_closed': True
+        }
+        message = serialize(MSG_PLAYER_LEFT_BROD, broadcast_payload)
+        with self.directory_lock:
+            for addr in room.spectators:
+                self.client_rooms.pop(addr, None)
+                connection = self.clients.get(addr)
+                if connection:
+                    connection.send(message)
+            self.spectated_rooms.discard(room.game_id)
+        room.spectators.clear()
+
+    # -------------------------------------------------------------------------
+    # Interest Management
+
+    def handle_set_viewport(self, payload, client_address):
+        """
+        Handle a player reporting the world area it has on screen. From now
+        on it only gets moves of groups that touch that area. Groups being
+        dragged inside it may be out of date on the client (their moves were
+        filtered out), so their positions are sent back in a VIEWPORT_SYNC.
+        Note: No acknowledgement otherwise, no broadcast
+        """
+        room = self.game_rooms.get(self.client_rooms.get(client_address))
+        if room is None:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+
+        try:
+            viewport = tuple(float(payload[key]) for key in ('left', 'top', 'right', 'bottom'))
+        except (KeyError, TypeError, ValueError):
+            return serialize(MSG_ERROR, {'message': 'Invalid viewport'}), None
+        if not room.set_viewport(client_address, viewport):
+            return serialize(MSG_ERROR, {'message': 'Only players have a viewport'}), None
+
+        positions = room.get_dragged_in_view(client_address)
+        if not positions:
+            return None, None
+        return serialize(MSG_VIEWPORT_SYNC, {'positions': positions}), None
+
+    # -------------------------------------------------------------------------
+    # Admin
+
+    def handle_admin_profile(self, payload, client_address):
+        """
+        Handle an admin request to start ('sample' or 'timing' mode, for at
+        most ADMIN_PROFILE_MAX_SECONDS), stop or query a server profile.
+        Only accepted with the server's admin token.
+        Note: No broadcast
+        """
+        token = payload.get('token')
+        if (not self.admin_token or not isinstance(token, str) or
+                not hmac.compare_digest(token.encode('utf-8'), self.admin_token.encode('utf-8'))):
+            self.metrics.increment('admin_auth_failures')
+            print(f"[RESPONSE] Client {client_address}: Rejected ADMIN_PROFILE (bad token)")
+            return serialize(MSG_ADMIN_PROFILE_ACK, {'success': False, 'message': 'Not authorized'}), None
+
+        action = payload.get('action')
+        error = None
+        if action == 'start':
+            duration = payload.get('duration', ADMIN_PROFILE_DEFAULT_SECONDS)
+            if not isinstance(duration, (int, float)) or duration <= 0:
+                error = 'Invalid duration'
+            else:
+                error = self.profiler.start(payload.get('mode', 'sample'), min(duration, ADMIN_PROFILE_MAX_SECONDS))
+        elif action == 'stop':
+            self.profiler.stop()
+        elif action != 'status':
+            error = f'Unknown profile action: {action}'
+
+        response_payload = {'success': error is None, **self.profiler.status()}
+        if error:
+            response_payload['message'] = error
+        print(f"[RESPONSE] Client {client_address}: ADMIN_PROFILE {action} -> {error or 'ok'}")
+        return serialize(MSG_ADMIN_PROFILE_ACK, response_payload), None
+
+    # -------------------------------------------------------------------------
+    # Compression
+
+    def handle_set_compression(self, payload, client_address):
+        """
+        Handle a client's compression offer. If it supports our algorithm,
+        every later frame of at least COMPRESSION_THRESHOLD bytes sent to it
+        is compressed. Note: No broadcast
+        """
+        connection = self.clients.get(client_address)
+        if connection is None:
+            return serialize(MSG_ERROR, {'message': 'Not connected'}), None
+
+        if COMPRESSION_ALGORITHM not in payload.get('algorithms', []):
+            response_payload = {'success': False, 'message': 'No supported compression algorithm'}
+            return serialize(MSG_SET_COMPRESSION_ACK, response_payload), None
+
+        connection.compression = True
+        response_payload = {
+            'success': True,
+            'algorithm': COMPRESSION_ALGORITHM,
+            'threshold': COMPRESSION_THRESHOLD
+        }
+        print(f"[RESPONSE] Client {client_address}: Compression enabled ({COMPRESSION_ALGORITHM})")
+        return serialize(MSG_SET_COMPRESSION_ACK, response_payload), None
+
+    # -------------------------------------------------------------------------
+    # UDP channel
+
+    def handle_open_udp(self, payload, client_address):
+        """
+        Handle a request for a UDP channel. The client gets a random session
+        token; datagrams carrying it are accepted as coming from this client,
+        and the address of the latest one is where its datagrams are sent.
+        """
+        connection = self.clients.get(client_address)
+        if connection is None:
+            return serialize(MSG_ERROR, {'message': 'Not connected'}), None
+
+        token = secrets.token_bytes(UDP_TOKEN_SIZE)
+        with self.directory_lock:
+            self.udp_sessions.pop(connection.udp_token, None)
+            connection.udp_token = token
+            connection.udp_address = None
+            connection.udp_last_seq = 0
+            connection.udp_fence_seq = 0
+            self.udp_sessions[token] = client_address
+
+        response_payload = {
+            'success': True,
+            'token': token.hex(),
+            'port': self.port,
+            'message_types': sorted(UDP_MESSAGE_TYPES)
+        }
+        print(f"[RESPONSE] Client {client_address}: UDP channel offered on port {self.port}")
+        return serialize(MSG_OPEN_UDP_ACK, response_payload), None
+
+    def run_udp(self):
+        """
+        Thread function: receive datagrams on the UDP channel.
+        """
+        while self.is_running:
+            try:
+                data, udp_address = self.udp_socket.recvfrom(MAX_DATAGRAM_SIZE)
+            except OSError:
+                break
+            # A bad datagram is dropped; it must not stop the only UDP thread
+            try:
+                self.handle_datagram(data, udp_address)
+            except (ValueError, struct.error) as error:
+                self.metrics.increment('udp_rejected')
+                print(f"Malformed datagram from {udp_address}: {error}")
+            except Exception as error:
+                self.metrics.increment('udp_rejected')
+                print(f"Error handling datagram from {udp_address}: {error}")
+
+    def handle_datagram(self, data, udp_address):
+        """
+        Authenticate a datagram by its token, drop it if it is older than one
+        already received or than the client's latest lock or release (see
+        _fence_datagrams), and process it like the same message over TCP.
+        """
+        token, seq, message = deserialize_datagram(data, UDP_TOKEN_SIZE)
+        client_address = self.udp_sessions.get(token)
+        connection = self.clients.get(client_address)
+        if connection is None:
+            self.metrics.increment('udp_rejected')
+            return
+        self.heartbeats.schedule(client_address, HEARTBEAT_TIMEOUT)
+
+        # The latest authenticated source is the return address (NAT rebinding)
+        connection.udp_address = udp_address
+        msg_type = message.get('type')
+        if msg_type == MSG_UDP_HELLO:
+            self.udp_socket.sendto(serialize_datagram(seq, MSG_UDP_HELLO_ACK, {}), udp_address)
+            return
+
+        if seq <= connection.udp_last_seq:
+            self.metrics.increment('udp_stale_dropped')
+            return
+        connection.udp_last_seq = seq
+
+        # Only superseded updates may skip the reliable stream
+        if msg_type not in UDP_MESSAGE_TYPES:
+            self.metrics.increment('udp_rejected')
+            return
+        self.metrics.increment('udp_datagrams_received')
+
+        # Checked under the room lock, so a lock or release handled after the
+        # check cannot let a move sent before it through
+        room = self.get_message_room(message, client_address)
+        with (room.lock if room else contextlib.nullcontext()):
+            if seq <= connection.udp_fence_seq:
+                self.metrics.increment('udp_stale_dropped')
+                return
+            self.process_message(message, connection)
+
+    # -------------------------------------------------------------------------
+    # Timers
+
+    def run_timers(self):
+        """
+        Thread function: advance the heartbeat and lock lease wheels every tick.
+        """
+        while self.is_running:
+            time.sleep(HEARTBEAT_TICK)
+            self.reap_idle_clients()
+            self.expire_lock_leases()
+            self.flush_coalesced_moves()
+
+    def reap_idle_clients(self):
+        """
+        Drop connections whose heartbeat deadline passed. Shutting the socket
+        down wakes its handler thread, which then runs handle_cleanup_client.
+        """
+        for client_address in self.heartbeats.advance():
+            connection = self.clients.get(client_address)
+            if connection:
+                print(f"Client {client_address} missed its heartbeat, closing connection")
+                self.metrics.increment('connections_reaped')
+                connection.shutdown()
+
+    def expire_lock_leases(self):
+        """
+        Release locks whose lease ran out in rooms that hold leases.
+        """
+        with self.directory_lock:
+            leased_rooms = list(self.leased_rooms)
+
+        for game_id in leased_rooms:
+            room = self.game_rooms.get(game_id)
+            if room is None:
+                with self.directory_lock:
+                    self.leased_rooms.discard(game_id)
+                continue
+
+            with room.lock:
+                for object_id, holder, object_lock in room.expire_leases():
+                    self._expire_lock(room, object_id, holder, object_lock)
+
+                if room.get_lease_count() == 0:
+                    with self.directory_lock:
+                        self.leased_rooms.discard(game_id)
+
+    def _expire_lock(self, room, object_id, holder, object_lock):
+        """
+        Release an expired lock where its piece or group last was, through
+        the same path as a release by its holder (snapping, journal, recorder,
+        solved check), and tell every room member, the holder included, with
+        the broadcast matching the lock kind.
+        """
+        position = dict(room.piece_positions[object_id])
+        success, info = self._release(room, object_id, holder, position, group=not object_lock)
+        if not success:
+            return
+        self.metrics.increment('lock_leases_expired')
+        info['message'] = f'Lock on {object_id} expired'
+        info['expired'] = True
+
+        broadcast_payload = {
+            'object_id': object_id,
+            'position': info['position'],
+            'merged': info['merged'],
+            'player': {"ip": holder[0], "port": holder[1]},
+            'info': info
+        }
+        brod_type = MSG_RELEASE_OBJECT_BROD if object_lock else MSG_RELEASE_GROUP_BROD
+        _, broadcast = self._append_solved_broadcast(room, holder, b'', serialize(brod_type, broadcast_payload))
+        print(f"[BROADCAST] Lock lease on '{object_id}' in room {room.game_id} expired, released for all players")
+        self.broadcast_to_room(broadcast, room.game_id)
+
+    def flush_coalesced_moves(self):
+        """
+        Apply moves coalesced by the rate limiter once their connection has
+        tokens again, so the last position of a burst still reaches the room
+        even if no newer move or release supersedes it.
+        """
+        for client_address, limiter in list(self.rate_limiters.items()):
+            if not limiter.pending_moves:
+                continue
+            connection = self.clients.get(client_address)
+            if connection is None:
+                continue
+            for message in limiter.take_coalesced():
+                self.process_message(message, connection, rate_limited=False)
+
+    def get_active_lease_count(self):
+        with self.directory_lock:
+            leased_rooms = list(self.leased_rooms)
+        return sum(self.game_rooms[game_id].get_lease_count()
+                   for game_id in leased_rooms if game_id in self.game_rooms)
+
     # -------------------------------------------------------------------------
 
     def handle_host_game(self, payload, client_address):
@@ -210,23 +877,43 @@ class Server:
         if client_address in self.client_rooms:
             return serialize(MSG_ERROR, {'message': 'Already in a game room'}), None
 
-        # Extract and validate payload
+        # Extract and validate payload. These end up in binary journal and
+        # recording records, so anything that would not encode is refused here
         game_name = payload.get('game_name', 'Unnamed Room')
         max_players = payload.get('max_players', 4)
         image_url = payload.get('image_url', '')
         difficulty = payload.get('difficulty', 'easy')
+        if not isinstance(game_name, str) or not isinstance(image_url, str):
+            return serialize(MSG_ERROR, {'message': 'Game name and image URL must be strings'}), None
+        try:
+            max_players = int(max_players)
+        except (TypeError, ValueError):
+            return serialize(MSG_ERROR, {'message': 'Invalid max_players'}), None
+        if not 1 <= max_players <= MAX_ROOM_PLAYERS:
+            return serialize(MSG_ERROR, {'message': f'max_players must be 1 to {MAX_ROOM_PLAYERS}'}), None
+        if not isinstance(difficulty, str) or difficulty not in DIFFICULTY_SETTINGS:
+            return serialize(MSG_ERROR, {'message': f'Unknown difficulty: {difficulty}'}), None
 
         # Create GameRoom
-        room = GameRoom(game_name, max_players, client_address, image_url, difficulty)
-        while room.game_id in self.game_rooms:
-            room = GameRoom(game_name, max_players, client_address, image_url, difficulty)
-        
-        # Register room and client
-        self.game_rooms[room.game_id] = room
-        self.client_rooms[client_address] = room.game_id
+        room = GameRoom(game_name, max_players, client_address, image_url, difficulty,
+                        scatter_seed=self.scatter_seeds.getrandbits(64))
+
+        # Register room and client. The new room is locked until it is fully
+        # registered and journaled, so a joiner can never get ahead of it.
+        with room.lock:
+            with self.directory_lock:
+                while room.game_id in self.game_rooms:
+                    room.game_id = room._generate_game_id()
+                self.game_rooms[room.game_id] = room
+                self.client_rooms[client_address] = room.game_id
+            self.lobby.update(room)
+            if self.journal:
+                self.journal.log_host(room)
+            if self.recorder:
+                self.recorder.record_host(room)
         
-        # Get the updated room state
-        room_state = room.get_game_room_state()
+            # Get the updated room state
+            room_state = room.get_game_room_state()
     
         # Return response with complete room state
         response_payload = {
@@ -259,6 +946,8 @@ class Server:
             return serialize(MSG_ERROR, {'message': 'Game room not found'}), None
 
         room = self.game_rooms[game_id]
+        if room.closed:
+            return serialize(MSG_ERROR, {'message': 'Game room not found'}), None
 
         # Check if room is full
         if room.is_full():
@@ -269,7 +958,13 @@ class Server:
             return serialize(MSG_ERROR, {'message': 'Failed to join game room'}), None
 
         # Register client
-        self.client_rooms[client_address] = game_id
+        with self.directory_lock:
+            self.client_rooms[client_address] = game_id
+        self.lobby.update(room)
+        if self.journal:
+            self.journal.log_join(game_id, client_address)
+        if self.recorder:
+            self.recorder.record(EVENT_JOIN, game_id, client_address)
 
         # Get the updated room state
         room_state = room.get_game_room_state()
@@ -296,6 +991,39 @@ class Server:
         broadcast = serialize(MSG_PLAYER_JOINED_BROD, broadcast_payload)
         return (response, broadcast)
 
+    def handle_spectate_game(self, payload, client_address):
+        """
+        Handle client request to watch a game room without taking a player slot.
+        Note: No broadcast
+        """
+        game_id = payload.get('game_id')
+        if not game_id:
+            return serialize(MSG_ERROR, {'message': 'Game ID is required'}), None
+
+        if client_address in self.client_rooms:
+            return serialize(MSG_ERROR, {'message': 'Already in a game room'}), None
+
+        room = self.game_rooms.get(game_id)
+        if room is None or room.closed:
+            return serialize(MSG_ERROR, {'message': 'Game room not found'}), None
+
+        if not room.add_spectator(client_address):
+            return serialize(MSG_ERROR, {'message': 'Game room has too many spectators'}), None
+
+        with self.directory_lock:
+            self.client_rooms[client_address] = game_id
+            self.spectated_rooms.add(game_id)
+
+        response_payload = {
+            'success': True,
+            **room.get_game_room_state(),
+            'update_interval': 1.0 / self.spectator_rate,
+            'message': f'Spectating game: {room.game_name}'
+        }
+
+        print(f"[RESPONSE] Client {client_address}: Spectating game '{room.game_name}' (Game Id: {game_id})")
+        return serialize(MSG_SPECTATE_GAME_ACK, response_payload), None
+
     def handle_leave_game(self, client_address):
         """
         Handle client request to leave their current game room.
@@ -309,18 +1037,41 @@ class Server:
         if not room:
             return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
 
+        # Spectators leave silently
+        if client_address in room.spectators:
+            room.remove_spectator(client_address)
+            with self.directory_lock:
+                del self.client_rooms[client_address]
+                if not room.spectators:
+                    self.spectated_rooms.discard(game_id)
+            print(f"[RESPONSE] Client {client_address}: Stopped spectating '{room.game_name}' (ID: {game_id})")
+            response_payload = {'success': True, 'message': 'Successfully left game room'}
+            return serialize(MSG_LEAVE_GAME_ACK, response_payload), None
+
         # Remove player and check for host change
         host_changed = room.remove_player(client_address)
-        del self.client_rooms[client_address]
+        with self.directory_lock:
+            del self.client_rooms[client_address]
+        if self.journal:
+            self.journal.log_leave(game_id, client_address)
+        if self.recorder:
+            self.recorder.record(EVENT_LEAVE, game_id, client_address)
 
         # Handle empty room
         if room.is_empty():
-            del self.game_rooms[game_id]
+            room.closed = True
+            if room.spectators:
+                self.evict_spectators(room)
+            with self.directory_lock:
+                del self.game_rooms[game_id]
+            self.lobby.remove(game_id)
             print(f"[RESPONSE] Client {client_address}: Left game and room '{room.game_name}' (ID: {game_id}) deleted")
             
             response_payload = {'success': True, 'message': 'Successfully left game room'}
             return serialize(MSG_LEAVE_GAME_ACK, response_payload), None
 
+        self.lobby.update(room)
+
         # Get the updated room state
         room_state = room.get_game_room_state()
 
@@ -364,7 +1115,14 @@ class Server:
 
         # Lock object
         object_id = payload.get('object_id')
+        self._fence_datagrams(payload, client_address)
         success, info = room.lock_object(object_id, client_address)
+        if success:
+            with self.directory_lock:
+                self.leased_rooms.add(game_id)
+            self.metrics.increment('lock_leases_granted')
+        if success and self.recorder:
+            self.recorder.record(EVENT_LOCK, game_id, client_address, object_id)
         
         # Respond with all locked objects
         response_payload = {
@@ -408,8 +1166,11 @@ class Server:
 
         # Release object
         object_id = payload.get('object_id')
-        position = payload.get('position')
-        success, info = room.release_object(object_id, client_address, position)
+        position = self._parse_position(payload.get('position'))
+        if position is None:
+            return serialize(MSG_ERROR, {'message': 'Invalid position'}), None
+        self._fence_datagrams(payload, client_address)
+        success, info = self._release(room, object_id, client_address, position, group=False)
         
         # Respond with all locked objects
         response_payload = {
@@ -421,12 +1182,13 @@ class Server:
 
         response = serialize(MSG_RELEASE_OBJECT_ACK, response_payload)
 
-        # Prepare broadcast only if successful
+        # Prepare broadcast only if successful (with the server-snapped position)
         broadcast = None
         if success:
             broadcast_payload = {
                 'object_id': object_id,
-                'position': position,
+                'position': info['position'],
+                'merged': info['merged'],
                 'player': {"ip": client_address[0], "port": client_address[1]},
                 'info': info
             }
@@ -437,7 +1199,7 @@ class Server:
             print(f"[BROADCAST] Object released sent to other players in room")
         print(f"="*80)
 
-        return (response, broadcast)
+        return self._append_solved_broadcast(room, client_address, response, broadcast)
     
     def handle_move_locked_object(self, payload, client_address):
         """
@@ -454,8 +1216,14 @@ class Server:
             return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
 
         object_id = payload.get('object_id')
-        position = payload.get('position')
+        position = self._parse_position(payload.get('position'))
+        if position is None:
+            return serialize(MSG_ERROR, {'message': 'Invalid position'}), None
         success, info = room.move_locked_object(object_id, client_address, position)
+        if success:
+            self.metrics.increment('lock_leases_renewed')
+        if success and self.recorder:
+            self.recorder.record(EVENT_MOVE, game_id, client_address, object_id, position)
 
         response = None
 
@@ -468,6 +1236,8 @@ class Server:
                 'player': {"ip": client_address[0], "port": client_address[1]},
                 'info': info
             }
+            if 'sent_at' in payload:
+                broadcast_payload['sent_at'] = payload['sent_at']
             broadcast = serialize(MSG_MOVE_LOCKED_OBJECT_BROD, broadcast_payload)
 
         if success:
@@ -490,6 +1260,8 @@ class Server:
 
         # Set the puzzle solved to true
         success, info = room.puzzle_solved(client_address)
+        if success:
+            self.lobby.update(room)
         
         # Respond with success
         response_payload = {
@@ -512,4 +1284,253 @@ class Server:
         if success:
             print(f"[BROADCAST] Puzzle completion notification sent to all players in room")
 
-        return (response, broadcast)
\ No newline at end of file
+        return (response, broadcast)
+
+    def handle_list_games(self, payload, client_address):
+        """
+        Handle a lobby request for one page of game rooms.
+        Filters: difficulty, not_full, not_solved. Pass the returned
+        next_cursor back as cursor to get the following page.
+        Note: No broadcast
+        """
+        try:
+            cursor = int(payload.get('cursor') or 0)
+            limit = int(payload.get('limit') or LIST_GAMES_DEFAULT_LIMIT)
+        except (TypeError, ValueError):
+            return serialize(MSG_ERROR, {'message': 'Invalid cursor or limit'}), None
+
+        games, next_cursor = self.lobby.list_games(
+            self.game_rooms,
+            difficulty=payload.get('difficulty'),
+            not_full=bool(payload.get('not_full')),
+            not_solved=bool(payload.get('not_solved')),
+            cursor=cursor,
+            limit=limit
+        )
+
+        response_payload = {
+            'success': True,
+            'games': games,
+            'next_cursor': next_cursor
+        }
+
+        print(f"[RESPONSE] Client {client_address}: Listed {len(games)} game rooms")
+
+        response = serialize(MSG_LIST_GAMES_ACK, response_payload)
+        broadcast = None
+        return (response, broadcast)
+
+    # -------------------------------------------------------------------------
+    # Piece Groups
+
+    def handle_lock_group(self, payload, client_address):
+        """
+        Handle a request to lock a whole group of snapped pieces.
+        """
+        # Validate client is in a room
+        if client_address not in self.client_rooms:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+        
+        game_id = self.client_rooms[client_address]
+        room = self.game_rooms.get(game_id)
+        if not room:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+
+        # Lock group
+        object_id = payload.get('object_id')
+        self._fence_datagrams(payload, client_address)
+        success, info = room.lock_group(object_id, client_address)
+        if success:
+            with self.directory_lock:
+                self.leased_rooms.add(game_id)
+            self.metrics.increment('lock_leases_granted')
+        if success and self.recorder:
+            self.recorder.record(EVENT_LOCK, game_id, client_address, object_id, flags=FLAG_GROUP)
+
+        response_payload = {
+            'success': success,
+            'info': info,
+            'object_id': object_id
+        }
+
+        response = serialize(MSG_LOCK_GROUP_ACK, response_payload)
+
+        # Prepare broadcast only if successful. Receivers resolve the members
+        # from their own copy of the groups, so the message size is constant.
+        broadcast = None
+        if success:
+            broadcast_payload = {
+                'object_id': object_id,
+                'player': {"ip": client_address[0], "port": client_address[1]},
+                'info': info
+            }
+            broadcast = serialize(MSG_LOCK_GROUP_BROD, broadcast_payload)
+
+        print(f"[RESPONSE] Client {client_address}: Group of '{object_id}' lock {'successful' if success else 'failed'}")
+        if success:
+            print(f"[BROADCAST] Group locked sent to other players in room")
+        print(f"="*80)
+
+        return (response, broadcast)
+
+    def handle_move_group(self, payload, client_address):
+        """
+        Handle a request to move a locked group.
+        Note: No acknowledgement
+        """
+        # Validate client is in a room
+        if client_address not in self.client_rooms:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+        
+        game_id = self.client_rooms[client_address]
+        room = self.game_rooms.get(game_id)
+        if not room:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+
+        object_id = payload.get('object_id')
+        position = self._parse_position(payload.get('position'))
+        if position is None:
+            return serialize(MSG_ERROR, {'message': 'Invalid position'}), None
+        success, info = room.move_group(object_id, client_address, position)
+        if success:
+            self.metrics.increment('lock_leases_renewed')
+        if success and self.recorder:
+            self.recorder.record(EVENT_MOVE, game_id, client_address, object_id, position, FLAG_GROUP)
+
+        response = None
+
+        # Prepare broadcast only if successful
+        broadcast = None
+        if success:
+            broadcast_payload = {
+                'object_id': object_id,
+                'position': position,
+                'player': {"ip": client_address[0], "port": client_address[1]}
+            }
+            # The sender's clock, so receivers can space out bursty updates
+            if 'sent_at' in payload:
+                broadcast_payload['sent_at'] = payload['sent_at']
+            broadcast = serialize(MSG_MOVE_GROUP_BROD, broadcast_payload)
+
+        return (response, broadcast)
+
+    def handle_release_group(self, payload, client_address):
+        """
+        Handle a request to release a locked group, merging it with the
+        groups it was snapped against.
+        """
+        # Validate client is in a room
+        if client_address not in self.client_rooms:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+        
+        game_id = self.client_rooms[client_address]
+        room = self.game_rooms.get(game_id)
+        if not room:
+            return serialize(MSG_ERROR, {'message': 'Not in any game room'}), None
+
+        # Release group
+        object_id = payload.get('object_id')
+        position = self._parse_position(payload.get('position'))
+        if position is None:
+            return serialize(MSG_ERROR, {'message': 'Invalid position'}), None
+        self._fence_datagrams(payload, client_address)
+        success, info = self._release(room, object_id, client_address, position, group=True)
+
+        response_payload = {
+            'success': success,
+            'info': info,
+            'object_id': object_id
+        }
+
+        response = serialize(MSG_RELEASE_GROUP_ACK, response_payload)
+
+        # Prepare broadcast only if successful (with the server-snapped position)
+        broadcast = None
+        if success:
+            broadcast_payload = {
+                'object_id': object_id,
+                'position': info['position'],
+                'merged': info['merged'],
+                'player': {"ip": client_address[0], "port": client_address[1]},
+                'info': info
+            }
+            broadcast = serialize(MSG_RELEASE_GROUP_BROD, broadcast_payload)
+
+        print(f"[RESPONSE] Client {client_address}: Group of '{object_id}' release {'successful' if success else 'failed'}")
+        if success:
+            print(f"[BROADCAST] Group released sent to other players in room")
+        print(f"="*80)
+
+        return self._append_solved_broadcast(room, client_address, response, broadcast)
+
+    def _fence_datagrams(self, payload, client_address):
+        """
+        Locks and releases carry udp_seq, the sequence number of the last move
+        datagram the client sent before them. Datagrams up to it predate this
+        lock or release and are dropped if they arrive later (a move delayed
+        past a release and re-lock would otherwise drag the piece back).
+        Runs under the room lock, like the datagram check in handle_datagram.
+        """
+        udp_seq = payload.get('udp_seq')
+        connection = self.clients.get(client_address)
+        if connection is None or isinstance(udp_seq, bool) or not isinstance(udp_seq, int):
+            return
+        connection.udp_fence_seq = max(connection.udp_fence_seq, udp_seq)
+
+    def _release(self, room, object_id, client_address, position, group):
+        """
+        Release a lock (a group lock if group, else a lock_object lock) held
+        by client_address at position, and journal and record the release.
+        Shared by the release handlers and lease expiry. Returns (success, info)
+        from the room.
+        """
+        if group:
+            success, info = room.release_group(object_id, client_address, position)
+        else:
+            success, info = room.release_object(object_id, client_address, position)
+        if success and self.journal:
+            self.journal.log_release(room, object_id, info['merged'])
+        if success and self.recorder:
+            self.recorder.record(EVENT_RELEASE, room.game_id, client_address, object_id, position,
+                                 FLAG_GROUP if group else 0)
+        return success, info
+
+    def _parse_position(self, position):
+        """
+        A client-sent position as {'x': int, 'y': int}, or None unless it is
+        a dict of finite numbers within MAX_COORDINATE. Checked before the
+        room, the journal or the recorder see it.
+        """
+        if not isinstance(position, dict):
+            return None
+        x, y = position.get('x'), position.get('y')
+        for value in (x, y):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return None
+            if abs(value) > MAX_COORDINATE or not math.isfinite(value):
+                return None
+        return {'x': round(x), 'y': round(y)}
+
+    def _append_solved_broadcast(self, room, client_address, response, broadcast):
+        """
+        If a release just completed the puzzle, the server announces it itself:
+        the SOLVED broadcast is framed after both the releasing client's
+        response and the room broadcast, so every member receives it.
+        """
+        if not room.check_solved():
+            return (response, broadcast)
+        self.lobby.update(room)
+        if self.journal:
+            self.journal.log_solved(room.game_id)
+        if self.recorder:
+            self.recorder.record(EVENT_SOLVED, room.game_id, client_address)
+
+        solved_payload = {
+            'player': {"ip": client_address[0], "port": client_address[1]},
+            'info': {'message': 'Puzzle solved!'}
+        }
+        solved = serialize(MSG_PUZZLE_SOLVED_BROD, solved_payload)
+
+        print(f"[BROADCAST] Puzzle in room {room.game_id} completed, notification sent to all players in room")
+
+        return (response + solved, (broadcast or b'') + solved)
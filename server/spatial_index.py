@@ -0,0 +1,64 @@
+class SpatialHash:
+    def __init__(self, cell_size):
+        """
+        Uniform grid over the world for "what is in this rectangle" queries.
+        Every item is filed under the cell holding its (x, y) point, so
+        moving an item is O(1) (and free while it stays in its cell) and a
+        query visits only the cells the rectangle overlaps.
+        """
+        self.cell_size = cell_size
+        self.cells = {}         # (col, row) -> set of items
+        self.item_cells = {}    # item -> (col, row)
+
+    def _cell(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def insert(self, item, x, y):
+        """
+        Add item at (x, y), or move it there if it is already indexed.
+        """
+        cell = self._cell(x, y)
+        old_cell = self.item_cells.get(item)
+        if old_cell == cell:
+            return
+        if old_cell is not None:
+            self._discard(item, old_cell)
+        self.cells.setdefault(cell, set()).add(item)
+        self.item_cells[item] = cell
+
+    def remove(self, item):
+        cell = self.item_cells.pop(item, None)
+        if cell is not None:
+            self._discard(item, cell)
+
+    def _discard(self, item, cell):
+        items = self.cells[cell]
+        items.discard(item)
+        if not items:
+            del self.cells[cell]
+
+    def query(self, left, top, right, bottom):
+        """
+        Return every item in the cells the rectangle overlaps. This can
+        include items up to one cell outside it; callers check exact
+        positions where that matters.
+        """
+        first_col, first_row = self._cell(left, top)
+        last_col, last_row = self._cell(right, bottom)
+
+        # A huge rectangle over a sparse grid: walk the occupied cells instead
+        if (last_col - first_col + 1) * (last_row - first_row + 1) > len(self.cells):
+            return {item for (col, row), items in self.cells.items()
+                    if first_col <= col <= last_col and first_row <= row <= last_row
+                    for item in items}
+
+        found = set()
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                items = self.cells.get((col, row))
+                if items:
+                    found |= items
+        return found
+
+    def __len__(self):
+        return len(self.item_cells)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+class TimingWheel:
+    def __init__(self, tick, slots):
+        """
+        Hashed timing wheel for per-connection deadlines.
+        A deadline lands in slot (deadline_tick % slots); advancing the
+        wheel visits only the slots of the ticks that elapsed, so with
+        deadlines shorter than one revolution (tick * slots) expiry costs
+        O(expired) per tick however many keys are scheduled.
+        Rescheduling a key is O(1) (move it between two slot dicts).
+        """
+        self.tick = tick
+        self.slots = [{} for _ in range(slots)]     # key -> deadline tick
+        self.key_slots = {}                         # key -> slot index
+        self.lock = threading.Lock()
+        self.start_time = time.monotonic()
+        self.current_tick = 0
+
+    def _now_tick(self):
+        return int((time.monotonic() - self.start_time) / self.tick)
+
+    def schedule(self, key, delay):
+        """
+        Set (or push back) key's deadline to delay seconds from now.
+        """
+        deadline = self._now_tick() + max(1, int(delay / self.tick + 0.999))
+        slot = deadline % len(self.slots)
+        with self.lock:
+            old_slot = self.key_slots.get(key)
+            if old_slot is not None:
+                # Most resets land in the same tick; skip the move then
+                if self.slots[old_slot].get(key) == deadline:
+                    return
+                del self.slots[old_slot][key]
+            self.slots[slot][key] = deadline
+            self.key_slots[key] = slot
+
+    def cancel(self, key):
+        with self.lock:
+            slot = self.key_slots.pop(key, None)
+            if slot is not None:
+                del self.slots[slot][key]
+
+    def advance(self):
+        """
+        Move the wheel up to now and return the keys whose deadline passed.
+        Deadlines further away than one revolution stay in their slot
+        until a later revolution reaches them.
+        """
+        expired = []
+        now_tick = self._now_tick()
+        with self.lock:
+            while self.current_tick < now_tick:
+                self.current_tick += 1
+                slot = self.slots[self.current_tick % len(self.slots)]
+                due = [key for key, deadline in slot.items() if deadline <= self.current_tick]
+                for key in due:
+                    del slot[key]
+                    del self.key_slots[key]
+                expired.extend(due)
+        return expired
+
+    def __len__(self):
+        return len(self.key_slots)
@@ -1,6 +1,64 @@
 # Window
 WINDOW_WIDTH = 800
 WINDOW_HEIGHT = 800
+MAX_COORDINATE = 1000000        # largest |x| / |y| a client may move a piece to
+
+# Server persistence
+JOURNAL_SNAPSHOT_EVERY = 5000   # journal records between snapshots
+
+# Heartbeats
+HEARTBEAT_INTERVAL = 5.0        # seconds between client PINGs
+HEARTBEAT_TIMEOUT = 15.0        # silence (seconds) after which the server drops a connection
+HEARTBEAT_TICK = 0.5            # server timing wheel resolution (seconds)
+
+# Per-client outbox
+OUTBOX_MAX_BYTES = 8 * 1024 * 1024  # unsent bytes queued for a client before it is disconnected
+
+# Lock leases
+LOCK_LEASE_TTL = 10.0           # a lock not renewed by a move for this long (seconds) is released
+LOCK_LEASE_TICK = 0.5           # per-room lease timing wheel resolution (seconds)
+
+# Optional UDP channel for moves
+UDP_HELLO_INTERVAL = 0.2        # seconds between UDP_HELLOs until the server answers
+UDP_HELLO_ATTEMPTS = 10         # moves stay on TCP if none of these is answered
+
+# Spectators
+SPECTATOR_UPDATE_RATE = 10      # coalesced position updates per second sent to spectators
+MAX_SPECTATORS = 256            # per room; spectators take no player slot
+
+# Rate limiting (per connection token buckets, see server/rate_limiter.py)
+RATE_LIMITS = {                 # message class -> (messages per second, burst)
+    'move': (40, 40),           # MOVE_GROUP / MOVE_LOCKED_OBJECT; clients send 20/s while dragging
+    'lock': (20, 20),           # locks, releases, PUZZLE_SOLVED
+    'other': (30, 60)           # everything else
+}
+RATE_LIMIT_STRIKES = (10, 200)  # over-limit messages tolerated (per second, burst) before disconnecting
+
+# Admin profiling (ADMIN_PROFILE)
+ADMIN_PROFILE_DEFAULT_SECONDS = 30  # profiling window when the request gives none
+ADMIN_PROFILE_MAX_SECONDS = 600     # longest profiling window a request may ask for
+PROFILE_SAMPLE_INTERVAL = 0.005     # seconds between stack samples in 'sample' mode
+
+# Interest management
+VIEWPORT_MARGIN = 0.5           # reported viewport extends this fraction of the screen past each edge
+INTEREST_CELL_PIECES = 4        # server spatial index cell size, in pieces
+
+# Remote movement
+MOVE_SEND_INTERVAL = 0.05       # min seconds between MOVE_GROUP sends while dragging
+INTERPOLATION_DELAY = 0.1       # remote drags are shown this far (seconds) behind real time
+MAX_EXTRAPOLATION = 0.1         # how far (seconds) a late remote drag is predicted ahead
+
+# Camera
+CAMERA_ZOOM_LEVELS = (0.25, 0.35, 0.5, 0.7, 1.0, 1.4, 2.0)
+MIPMAP_BUILDS_PER_FRAME = 250
+
+# Frame profiler (F3 overlay, --frame-log dump)
+FRAME_PROFILE_WINDOW = 300      # frames the rolling percentiles cover (5 s at 60 fps)
+FRAME_LOG_MAX_FRAMES = 36000    # most recent frames kept for the dump (10 min at 60 fps)
+PROFILER_OVERLAY_REFRESH = 0.25 # seconds between overlay text updates
+
+# HUD
+HUD_MAX_OVERLAYS = 16           # overlay surfaces (per size and color) kept built
 
 # Colors
 COLOR_WHITE = (255, 255, 255)
@@ -16,6 +74,13 @@ COLOR_ORANGE = (255, 165, 0)
 
 # Puzzle
 DEFAULT_DIFFICULTY = 'easy'
+MAX_ROOM_PLAYERS = 1024     # most players a HOST_GAME may ask for
+SNAP_TOLERANCE = 30         # max distance (px) for a piece to count as correctly placed
+PREVIEW_DOWNSCALE = 4       # placeholder pieces are decoded at 1/N of the board size
+SLICE_POOL = 'thread'       # 'serial', 'thread' or 'process'
+SLICE_WORKERS = None        # None = one worker per CPU
+PARALLEL_SLICE_MIN_PIECES = 64
+SCATTER_MARGIN = 80         # px kept free around the initial piece scatter
 DIFFICULTY_SETTINGS = {
     'easy': {
         'grid': (3, 3), 
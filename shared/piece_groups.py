@@ -0,0 +1,76 @@
+class PieceGroups:
+    def __init__(self, piece_ids=()):
+        """
+        Union-find over piece ids. Pieces that have been snapped together
+        share a root, and the root keeps the member list so a whole group
+        can be enumerated without scanning every piece.
+        """
+        self.parent = {}
+        self.members = {}       # root -> [piece_id, ...]
+        for piece_id in piece_ids:
+            self.add(piece_id)
+
+    def add(self, piece_id):
+        """
+        Add a piece as its own single-member group.
+        """
+        if piece_id not in self.parent:
+            self.parent[piece_id] = piece_id
+            self.members[piece_id] = [piece_id]
+
+    def find(self, piece_id):
+        """
+        Return the root of the group containing piece_id.
+        """
+        parent = self.parent
+        while parent[piece_id] != piece_id:
+            # Path halving
+            parent[piece_id] = parent[parent[piece_id]]
+            piece_id = parent[piece_id]
+        return piece_id
+
+    def union(self, piece_a, piece_b):
+        """
+        Merge the groups containing piece_a and piece_b.
+        Returns the new root, or None if they were already in the same group.
+        """
+        root_a = self.find(piece_a)
+        root_b = self.find(piece_b)
+        if root_a == root_b:
+            return None
+
+        # Union by size: the smaller member list is folded into the larger
+        if len(self.members[root_a]) < len(self.members[root_b]):
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.members[root_a].extend(self.members.pop(root_b))
+        return root_a
+
+    def get_members(self, piece_id):
+        """
+        Return the pieces in the same group as piece_id (including itself).
+        """
+        if piece_id not in self.parent:
+            return []
+        return self.members[self.find(piece_id)]
+
+    def is_grouped(self, piece_id):
+        """
+        Return True if piece_id has been snapped to at least one other piece.
+        """
+        return len(self.get_members(piece_id)) > 1
+
+    def get_groups(self):
+        """
+        Return the member lists of all multi-piece groups (for state transfer).
+        """
+        return [list(members) for members in self.members.values() if len(members) > 1]
+
+    def load_groups(self, groups):
+        """
+        Merge in groups received as member lists (see get_groups).
+        """
+        for members in groups or []:
+            for piece_id in members[1:]:
+                if members[0] in self.parent and piece_id in self.parent:
+                    self.union(members[0], piece_id)
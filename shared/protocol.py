@@ -1,4 +1,8 @@
 import json
+import queue
+import socket
+import struct
+import zlib
 
 # Client to Server
 MSG_HOST_GAME = 'HOST_GAME'
@@ -8,6 +12,19 @@ MSG_LOCK_OBJECT = 'LOCK_OBJECT'
 MSG_RELEASE_OBJECT = 'RELEASE_OBJECT'
 MSG_MOVE_LOCKED_OBJECT = 'MOVE_LOCKED_OBJECT'
 MSG_PUZZLE_SOLVED = 'PUZZLE_SOLVED'
+MSG_LOCK_GROUP = 'LOCK_GROUP'
+MSG_MOVE_GROUP = 'MOVE_GROUP'
+MSG_RELEASE_GROUP = 'RELEASE_GROUP'
+MSG_LIST_GAMES = 'LIST_GAMES'
+MSG_PING = 'PING'
+MSG_GET_METRICS = 'GET_METRICS'
+MSG_OPEN_UDP = 'OPEN_UDP'
+MSG_SPECTATE_GAME = 'SPECTATE_GAME'
+MSG_SET_COMPRESSION = 'SET_COMPRESSION'
+MSG_SET_VIEWPORT = 'SET_VIEWPORT'
+MSG_ADMIN_PROFILE = 'ADMIN_PROFILE'
+MSG_BATCH = 'BATCH'
+MSG_UDP_HELLO = 'UDP_HELLO'         # datagram only
 
 # Server to Client ACKs
 MSG_HOST_GAME_ACK = 'HOST_GAME_ACK'
@@ -16,6 +33,18 @@ MSG_LEAVE_GAME_ACK = 'LEAVE_GAME_ACK'
 MSG_LOCK_OBJECT_ACK = 'LOCK_OBJECT_ACK'
 MSG_RELEASE_OBJECT_ACK = 'RELEASE_OBJECT_ACK'
 MSG_PUZZLE_SOLVED_ACK = 'PUZZLE_SOLVED_ACK'
+MSG_LOCK_GROUP_ACK = 'LOCK_GROUP_ACK'
+MSG_RELEASE_GROUP_ACK = 'RELEASE_GROUP_ACK'
+MSG_LIST_GAMES_ACK = 'LIST_GAMES_ACK'
+MSG_PONG = 'PONG'
+MSG_GET_METRICS_ACK = 'GET_METRICS_ACK'
+MSG_OPEN_UDP_ACK = 'OPEN_UDP_ACK'
+MSG_SPECTATE_GAME_ACK = 'SPECTATE_GAME_ACK'
+MSG_SET_COMPRESSION_ACK = 'SET_COMPRESSION_ACK'
+MSG_ADMIN_PROFILE_ACK = 'ADMIN_PROFILE_ACK'
+MSG_BATCH_ACK = 'BATCH_ACK'         # the responses of a BATCH's operations, if any
+MSG_VIEWPORT_SYNC = 'VIEWPORT_SYNC' # answers SET_VIEWPORT only if something in view is stale
+MSG_UDP_HELLO_ACK = 'UDP_HELLO_ACK' # datagram only
 
 # Server to Client Broadcasts 
 MSG_PLAYER_JOINED_BROD = 'PLAYER_JOINED_BROD'
@@ -24,19 +53,259 @@ MSG_LOCK_OBJECT_BROD = 'LOCK_OBJECT_BROD'
 MSG_RELEASE_OBJECT_BROD = 'RELEASE_OBJECT_BROD'
 MSG_MOVE_LOCKED_OBJECT_BROD = 'MOVE_LOCKED_OBJECT_BROD'
 MSG_PUZZLE_SOLVED_BROD = 'PUZZLE_SOLVED_BROD'
+MSG_LOCK_GROUP_BROD = 'LOCK_GROUP_BROD'
+MSG_MOVE_GROUP_BROD = 'MOVE_GROUP_BROD'
+MSG_RELEASE_GROUP_BROD = 'RELEASE_GROUP_BROD'
+MSG_SPECTATOR_MOVES_BROD = 'SPECTATOR_MOVES_BROD'
+MSG_BATCH_BROD = 'BATCH_BROD'       # a BATCH's broadcasts meant for one recipient
 
 # Error
 MSG_ERROR = 'ERROR'
 
+# Framing: every message is a 4-byte big-endian body length followed by the
+# JSON body, so several messages can share one send/recv. If the high bit of
+# the length is set the body is deflate-compressed (see compress_frame).
+FRAME_HEADER = struct.Struct('!I')
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+COMPRESSED_FLAG = 0x80000000
+
+# Compression is negotiated per connection with SET_COMPRESSION. Only frames
+# of at least COMPRESSION_THRESHOLD bytes are compressed, so the small
+# hot-path messages (moves, locks) are never touched.
+COMPRESSION_ALGORITHM = 'deflate-dict-1'
+COMPRESSION_THRESHOLD = 512
+COMPRESSION_LEVEL = 6
+
 def serialize(msg_type: str, payload: dict) -> bytes:
     """
-    Serializes a message dictionary into bytes for network transmission
+    Serializes a message dictionary into a framed message for network transmission
     """
     message = {'type': msg_type, 'payload': payload}
-    return json.dumps(message).encode('utf-8')
+    body = json.dumps(message).encode('utf-8')
+    return FRAME_HEADER.pack(len(body)) + body
 
 def deserialize(data: bytes) -> dict:
     """
-    Deserializes bytes from the network into a message dictionary
+    Deserializes a message body (without its frame header) into a message dictionary
+    """
+    return json.loads(data.decode('utf-8'))
+
+def decode_frame(frame: bytes) -> dict:
+    """
+    Deserializes the first message of serialized (framed) bytes
+    """
+    (length,) = FRAME_HEADER.unpack_from(frame)
+    body = frame[FRAME_HEADER.size:FRAME_HEADER.size + (length & ~COMPRESSED_FLAG)]
+    if length & COMPRESSED_FLAG:
+        body = decompress_body(body)
+    return deserialize(body)
+
+def split_frames(data: bytes) -> list:
+    """
+    Splits serialized (framed, uncompressed) bytes into the bodies of their messages
+    """
+    bodies = []
+    offset = 0
+    while offset < len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, offset)
+        offset += FRAME_HEADER.size
+        bodies.append(data[offset:offset + length])
+        offset += length
+    return bodies
+
+def split_serialized(data: bytes) -> list:
+    """
+    Splits serialized (framed, uncompressed) bytes into whole frames, headers included
+    """
+    frames = []
+    offset = 0
+    while offset < len(data):
+        (length,) = FRAME_HEADER.unpack_from(data, offset)
+        end = offset + FRAME_HEADER.size + length
+        frames.append(data[offset:end])
+        offset = end
+    return frames
+
+def peek_type(body: bytes) -> str:
+    """
+    The type of a serialized message body, read without decoding its
+    payload (serialize always writes the type first)
+    """
+    start = len('{"type": "')
+    return body[start:body.index(b'"', start)].decode('utf-8')
+
+def serialize_bodies(msg_type: str, key: str, bodies: list) -> bytes:
+    """
+    Serializes a message whose payload is {key: [messages]} from the
+    messages' serialized bodies, without decoding and encoding them again
+    """
+    body = b'{"type": "%s", "payload": {"%s": [%s]}}' % (msg_type.encode('utf-8'), key.encode('utf-8'),
+                                                        b', '.join(bodies))
+    return FRAME_HEADER.pack(len(body)) + body
+
+def _build_compression_dictionary() -> bytes:
+    """
+    Preset deflate dictionary made of what large messages contain: room state
+    keys, message types and piece position entries. Deflate can refer back
+    into it from the start of every message, so even the first occurrence
+    of each key is a short back-reference. The most frequent text (piece
+    entries) is last, closest to the data. Any change to it needs a new
+    COMPRESSION_ALGORITHM name.
+    """
+    message_types = [MSG_HOST_GAME_ACK, MSG_PLAYER_JOINED_BROD, MSG_PLAYER_LEFT_BROD, MSG_LIST_GAMES_ACK,
+                     MSG_GET_METRICS_ACK, MSG_SPECTATE_GAME_ACK, MSG_RELEASE_GROUP_BROD, MSG_JOIN_GAME_ACK]
+    sample = {
+        'success': True, 'game_id': 'ABC123', 'game_name': 'Puzzle', 'max_players': 4, 'current_players': 2,
+        'host': {'ip': '127.0.0.1', 'port': 50000},
+        'players': [{'ip': '192.168.1.10', 'port': 50000}, {'ip': '10.0.0.1', 'port': 60000}],
+        'spectators': 0, 'is_full': False, 'is_empty': False, 'image_url': 'https://', 'difficulty': 'medium',
+        'board': {'x': 200, 'y': 150, 'cols': 8, 'rows': 6, 'piece_width': 75, 'piece_height': 75},
+        'locked_objects': {'piece_0': {'ip': '127.0.0.1', 'port': 50000}},
+        'groups': [['piece_1', 'piece_2', 'piece_3']], 'puzzle_solved': False,
+        'message': 'Successfully joined game: ',
+        'piece_positions': {f'piece_{i}': {'x': 100 + 7 * i % 600, 'y': 100 + 13 * i % 600} for i in range(200)},
+    }
+    text = ' '.join(json.dumps({'type': msg_type, 'payload': {}}) for msg_type in message_types)
+    return (text + json.dumps({'type': MSG_JOIN_GAME_ACK, 'payload': sample})).encode('utf-8')
+
+COMPRESSION_DICTIONARY = _build_compression_dictionary()
+
+def compress_frame(frame: bytes, level: int = COMPRESSION_LEVEL) -> bytes:
+    """
+    Compress a single serialized frame (raw deflate with the preset
+    dictionary). Returns the frame unchanged if that does not make it smaller.
     """
-    return json.loads(data.decode('utf-8'))
\ No newline at end of file
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=COMPRESSION_DICTIONARY)
+    body = compressor.compress(frame[FRAME_HEADER.size:]) + compressor.flush()
+    if len(body) + FRAME_HEADER.size >= len(frame):
+        return frame
+    return FRAME_HEADER.pack(len(body) | COMPRESSED_FLAG) + body
+
+def decompress_body(body: bytes) -> bytes:
+    """
+    Decompress a compressed frame body, refusing to inflate past MAX_FRAME_SIZE
+    """
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS, zdict=COMPRESSION_DICTIONARY)
+    data = decompressor.decompress(body, MAX_FRAME_SIZE)
+    if decompressor.unconsumed_tail:
+        raise ValueError("Compressed frame inflates beyond maximum size")
+    return data
+
+# Optional UDP channel for superseded-within-milliseconds updates (moves).
+# A datagram is [16-byte session token, client to server only] + 4-byte
+# big-endian sequence number + the same JSON body as a frame.
+UDP_MESSAGE_TYPES = {MSG_MOVE_GROUP, MSG_MOVE_LOCKED_OBJECT}
+UDP_BROADCAST_TYPES = {MSG_MOVE_GROUP_BROD, MSG_MOVE_LOCKED_OBJECT_BROD}
+UDP_TOKEN_SIZE = 16
+DATAGRAM_HEADER = struct.Struct('!I')
+MAX_DATAGRAM_SIZE = 1400
+
+# Interest management: a player that reported its viewport with SET_VIEWPORT
+# only gets these for groups that touch it (the client adds a margin).
+# Locks, releases and final positions still go to everyone.
+INTEREST_FILTERED_TYPES = {MSG_MOVE_GROUP_BROD, MSG_MOVE_LOCKED_OBJECT_BROD}
+
+# Batches: a BATCH carries an ordered list of room operations that the
+# server applies under one hold of the room lock. Their responses come back
+# in one BATCH_ACK and their broadcasts in one BATCH_BROD per recipient.
+BATCHABLE_TYPES = {
+    MSG_LOCK_OBJECT, MSG_RELEASE_OBJECT, MSG_MOVE_LOCKED_OBJECT,
+    MSG_LOCK_GROUP, MSG_MOVE_GROUP, MSG_RELEASE_GROUP, MSG_SET_VIEWPORT
+}
+MAX_BATCH_OPERATIONS = 64
+
+def serialize_datagram(seq: int, msg_type: str, payload: dict, token: bytes = b'') -> bytes:
+    """
+    Serializes a message into a datagram with a sequence number (and token)
+    """
+    body = json.dumps({'type': msg_type, 'payload': payload}).encode('utf-8')
+    return token + DATAGRAM_HEADER.pack(seq) + body
+
+def deserialize_datagram(data: bytes, token_size: int = 0) -> tuple:
+    """
+    Splits a datagram into (token, seq, message dictionary)
+    """
+    token = data[:token_size]
+    (seq,) = DATAGRAM_HEADER.unpack_from(data, token_size)
+    return token, seq, deserialize(data[token_size + DATAGRAM_HEADER.size:])
+
+# Stream writes: a connection's writer takes every frame queued so far and
+# writes them with one scatter-gather sendmsg (plain sendall of the joined
+# frames where the platform has no sendmsg), resuming after partial writes.
+SEND_GATHER_MAX_FRAMES = 256    # frames per write, well below the usual IOV_MAX of 1024
+
+def configure_stream_socket(sock):
+    """
+    Send small frames (moves) at once instead of letting Nagle's algorithm
+    hold them until earlier data is acknowledged; the writers coalesce
+    frames themselves
+    """
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+def take_frames(outbox) -> list:
+    """
+    Block for the next queued frame, then take the frames queued behind it
+    (up to SEND_GATHER_MAX_FRAMES). A None (the writer should stop) ends
+    the list.
+    """
+    frames = [outbox.get()]
+    while frames[-1] is not None and len(frames) < SEND_GATHER_MAX_FRAMES:
+        try:
+            frames.append(outbox.get_nowait())
+        except queue.Empty:
+            break
+    return frames
+
+def send_frames(sock, frames: list) -> int:
+    """
+    Write frames to a blocking stream socket in as few syscalls as possible
+    and return how many were made. A partial write continues from the exact
+    byte where it stopped.
+    """
+    if not hasattr(sock, 'sendmsg'):
+        sock.sendall(b''.join(frames))
+        return 1
+    buffers = [memoryview(frame) for frame in frames]
+    calls = 0
+    while buffers:
+        sent = sock.sendmsg(buffers)
+        calls += 1
+        # Drop the buffers written completely and trim a partly written one
+        done = 0
+        while done < len(buffers) and sent >= len(buffers[done]):
+            sent -= len(buffers[done])
+            done += 1
+        del buffers[:done]
+        if sent:
+            buffers[0] = buffers[0][sent:]
+    return calls
+
+class MessageReader:
+    def __init__(self):
+        """
+        Reassembles message bodies from a stream of received bytes
+        """
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list:
+        """
+        Add received bytes and return the bodies of all complete messages
+        (compressed frames are returned decompressed)
+        """
+        self.buffer += data
+        bodies = []
+        offset = 0
+        while len(self.buffer) - offset >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self.buffer, offset)
+            compressed = length & COMPRESSED_FLAG
+            length &= ~COMPRESSED_FLAG
+            if length > MAX_FRAME_SIZE:
+                raise ValueError(f"Frame of {length} bytes exceeds maximum size")
+            end = offset + FRAME_HEADER.size + length
+            if end > len(self.buffer):
+                break
+            body = bytes(self.buffer[offset + FRAME_HEADER.size:end])
+            bodies.append(decompress_body(body) if compressed else body)
+            offset = end
+        del self.buffer[:offset]
+        return bodies